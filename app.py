@@ -1,40 +1,54 @@
 import streamlit as st
-import edge_tts
-import asyncio
 import os
 import uuid
+import functools
 import re
 import json
 import streamlit.components.v1 as components
 from streamlit_lottie import st_lottie
-import docx
-import mammoth
-import markdown
-import PyPDF2
-from striprtf.striprtf import rtf_to_text
-from langdetect import detect, LangDetectException
-import base64
 import nest_asyncio
-from pydub import AudioSegment
-import aiohttp  
-import ssl
-import certifi
-
-ssl._create_default_https_context = ssl._create_unverified_context  # Temporary workaround (not recommended for production)
+from tts.cache import ChunkCache, chunk_key
+from tts.client import BREAKER, OPEN, get_client
+from tts.chunker import FIRST_CHUNK_BYTES, iter_sentences
+from tts.extract import extract_text
+from tts.history import HistoryStore
+from tts.incremental import PlanStore, ReuseReport, plan_chunks
+from tts.jobs import CANCELLED, DONE, FAILED, QUEUED, JobQueue
+from tts.language import VoiceRouter, detect_language, voice_language
+from tts.formats import DEFAULT_FORMAT, FORMATS, get_format, join_audio
+from tts.pipeline import clean_text
+from tts.postprocess import PostprocessError, level_audio
+from tts.pronounce import apply_pronunciations
+from tts.streaming import StreamServer
+from tts.timing import build_index, words_path
+from tts.synth import (
+    DEFAULT_CONCURRENCY,
+    ChunkSynthesisError,
+    synthesize_chunks,
+)
+from tts.trace import Trace
+from tts.voices import DEFAULT_VOICE, load_catalog, rate_map, speed_map
 
 # Apply nest_asyncio to allow nested event loops
 nest_asyncio.apply()
 
 # Utility Functions
+@st.cache_data(show_spinner=False, max_entries=16)
+def read_json_file(file, mtime_ns):
+    # mtime_ns is only part of the cache key: an edited file is re-read.
+    with open(file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
 def load_json(file, default):
-    if os.path.exists(file):
-        try:
-            with open(file, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except Exception as e:
-            st.error(f"Failed to load {file}: {e}")
-            return default
-    return default
+    try:
+        mtime_ns = os.stat(file).st_mtime_ns
+    except FileNotFoundError:
+        return default
+    try:
+        return read_json_file(file, mtime_ns)
+    except Exception as e:
+        st.error(f"Failed to load {file}: {e}")
+        return default
 
 def save_json(file, data):
     try:
@@ -43,10 +57,159 @@ def save_json(file, data):
     except Exception as e:
         st.error(f"Failed to save {file}: {e}")
 
+@st.cache_resource
+def get_chunk_cache():
+    return ChunkCache()
+
+@st.cache_resource
+def get_history_store():
+    return HistoryStore()
+
+@st.cache_resource
+def get_voice_catalog():
+    # Read from the on-disk voice cache (or fetched once a day), not per rerun.
+    return load_catalog()
+
+@st.cache_resource
+def get_plan_store():
+    return PlanStore()
+
+@st.cache_resource
+def get_stream_server():
+    # None when the port is taken (e.g. a second app on the same host):
+    # results then fall back to Streamlit's own media delivery.
+    try:
+        return StreamServer()
+    except OSError:
+        return None
+
+@st.cache_resource
+def get_job_queue():
+    return JobQueue()
+
+def session_id():
+    # Jobs are owned by the browser session, so they survive reruns.
+    if "session_id" not in st.session_state:
+        st.session_state["session_id"] = uuid.uuid4().hex
+    return st.session_state["session_id"]
+
+def audio_player_html(src, autoplay=False, mime="audio/mpeg"):
+    return f"""
+    <audio id="tts-audio" controls {"autoplay" if autoplay else ""} style="width:100%;">
+        <source src="{src}" type="{mime}">
+        Your browser does not support the audio element.
+    </audio>
+    <div class="audio-controls" style="margin-top:8px;">
+        <button onclick="var a=document.getElementById('tts-audio'); if (!isNaN(a.currentTime)) a.currentTime=Math.max(0,a.currentTime-10);">⏪ 10s</button>
+        <button onclick="var a=document.getElementById('tts-audio'); if (!isNaN(a.currentTime) && !isNaN(a.duration)) a.currentTime=Math.min(a.duration,a.currentTime+10);">10s ⏩</button>
+    </div>
+    """
+
+SYNCED_PLAYER_HEIGHT = 420
+
+def synced_player_html(src, timing_index):
+    """Audio player with a transcript that follows the audio word by word.
+
+    The word start times are searched with a binary search on every frame
+    while playing; clicking a sentence seeks straight to its first word.
+    """
+    timing_json = json.dumps(timing_index.to_dict(), ensure_ascii=False).replace("</", "<\\/")
+    return f"""
+    <audio id="tts-audio" controls preload="auto" style="width:100%;" src="{src}"></audio>
+    <div class="audio-controls" style="margin:8px 0;">
+        <button onclick="seekBy(-10)">⏪ 10s</button>
+        <button onclick="seekSentence(-1)">⏮️ Sentence</button>
+        <button onclick="seekSentence(1)">Sentence ⏭️</button>
+        <button onclick="seekBy(10)">10s ⏩</button>
+    </div>
+    <div id="transcript"></div>
+    <style>
+    body {{ font-family: 'Segoe UI', sans-serif; }}
+    #transcript {{ position: relative; height: 300px; overflow-y: auto; line-height: 1.7; padding: 0 6px; }}
+    .sentence {{ cursor: pointer; margin: 0 0 8px; border-radius: 6px; }}
+    .sentence:hover {{ background-color: #f0f0f0; }}
+    .current {{ background-color: yellow; }}
+    .audio-controls button {{
+        background-color: #3b82f6; color: white; border: none; border-radius: 5px;
+        padding: 5px 15px; margin: 0 5px; cursor: pointer;
+    }}
+    </style>
+    <script>
+    const timing = {timing_json};
+    const audio = document.getElementById("tts-audio");
+    const box = document.getElementById("transcript");
+    const spans = [];
+    let current = -1;
+
+    // Number of entries in sorted arr that are <= x.
+    function upperBound(arr, x) {{
+        let lo = 0, hi = arr.length;
+        while (lo < hi) {{
+            const mid = (lo + hi) >> 1;
+            if (arr[mid] <= x) lo = mid + 1; else hi = mid;
+        }}
+        return lo;
+    }}
+
+    timing.sentences.forEach((first, s) => {{
+        const last = s + 1 < timing.sentences.length ? timing.sentences[s + 1] : timing.words.length;
+        const p = document.createElement("p");
+        p.className = "sentence";
+        p.onclick = () => playSentence(s);
+        for (let w = first; w < last; w++) {{
+            const span = document.createElement("span");
+            span.textContent = timing.words[w] + " ";
+            p.appendChild(span);
+            spans.push(span);
+        }}
+        box.appendChild(p);
+    }});
+
+    function highlight() {{
+        const w = upperBound(timing.starts, audio.currentTime * 1000) - 1;
+        if (w !== current) {{
+            if (current >= 0) spans[current].classList.remove("current");
+            if (w >= 0) {{
+                const span = spans[w];
+                span.classList.add("current");
+                if (span.offsetTop < box.scrollTop || span.offsetTop > box.scrollTop + box.clientHeight - 30) {{
+                    box.scrollTop = span.offsetTop - box.clientHeight / 3;
+                }}
+            }}
+            current = w;
+        }}
+        if (!audio.paused) requestAnimationFrame(highlight);
+    }}
+    audio.addEventListener("play", highlight);
+    audio.addEventListener("seeked", highlight);
+
+    function playSentence(s) {{
+        audio.currentTime = timing.starts[timing.sentences[s]] / 1000;
+        audio.play();
+    }}
+
+    function seekSentence(step) {{
+        const s = upperBound(timing.sentences, Math.max(current, 0)) - 1;
+        playSentence(Math.min(Math.max(s + step, 0), timing.sentences.length - 1));
+    }}
+
+    function seekBy(seconds) {{
+        if (isNaN(audio.currentTime)) return;
+        const end = isNaN(audio.duration) ? Infinity : audio.duration;
+        audio.currentTime = Math.min(end, Math.max(0, audio.currentTime + seconds));
+    }}
+    </script>
+    """
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def read_lottie(filepath, mtime_ns):
+    # Shared read-only across sessions; unlike cache_data it is not copied per rerun.
+    with open(filepath, "r") as f:
+        return json.load(f)
+
 def load_lottie(filepath):
     try:
-        with open(filepath, "r") as f:
-            return json.load(f)
+        return read_lottie(filepath, os.stat(filepath).st_mtime_ns)
     except Exception as e:
         st.error(f"Failed to load animation: {e}")
         return None
@@ -98,34 +261,60 @@ st.markdown(
     unsafe_allow_html=True,
 )
 
-# Voice and Speed Options
-voice_options = {
-    "DavisNeural - Male": "en-US-DavisNeural",
-    "MohanNeural - Male": "te-IN-MohanNeural",
-    "ShrutiNeural - Female": "te-IN-ShrutiNeural",
-    "AriaNeural - Female": "en-US-AriaNeural",
-    "SapnaNeural - Female": "kn-IN-SapnaNeural",
-    "GaganNeural - Male": "kn-IN-GaganNeural",
-}
-
-speed_map = {"Fast": "+25%", "Normal": "+0%", "Slow": "-25%"}
-rate_map = {"Fast": 1.25, "Normal": 1.0, "Slow": 0.75}
-
 # Sidebar Settings
 st.sidebar.header("🔧 Settings")
-voice = st.sidebar.selectbox("Select Voice", list(voice_options.keys()))
+voice_catalog = get_voice_catalog()
+voice_locales = voice_catalog.locales()
+default_voice = voice_catalog.get(DEFAULT_VOICE) or voice_catalog.voices[0]
+voice_locale = st.sidebar.selectbox(
+    "Voice Locale", voice_locales, index=voice_locales.index(default_voice.locale),
+    help=f"{len(voice_catalog)} voices (from the {voice_catalog.source})",
+)
+voice = st.sidebar.selectbox(
+    "Select Voice",
+    [v.name for v in voice_catalog.by_locale[voice_locale]],
+    format_func=lambda name: voice_catalog.get(name).label,
+)
 # Default index = 1 → "Normal" (assuming keys are ["Fast","Normal","Slow"])
 rate = st.sidebar.selectbox(
     "Select Speed", list(speed_map.keys()), index=list(speed_map.keys()).index("Normal")
 )
 # Browser voice options (for local browser-based playback if used)
 browser_voice_options = {
-    "English": "Microsoft Mark - English (United States)",
-    "Kannada": "Microsoft Kannada Voice",
-    "Telugu": "Microsoft Telugu Voice"
+    "en": "Microsoft Mark - English (United States)",
+    "kn": "Microsoft Kannada Voice",
+    "te": "Microsoft Telugu Voice"
 }
-default_browser_voice = browser_voice_options.get("English" if voice.startswith("English") else "Telugu", "")
+default_browser_voice = browser_voice_options.get(voice_language(voice), "")
 browser_voice = st.sidebar.text_input("Browser Voice Name (for Read Aloud)", value=default_browser_voice)
+stream_server = get_stream_server()
+progressive = st.sidebar.checkbox(
+    "▶️ Progressive playback", value=False, disabled=stream_server is None,
+    help="Start playing the first sentence while the rest is still being generated",
+) and stream_server is not None
+concurrency = st.sidebar.slider(
+    "Parallel Requests", min_value=1, max_value=16, value=DEFAULT_CONCURRENCY,
+    help="How many chunks are synthesized at the same time",
+)
+output_format = st.sidebar.selectbox(
+    "🎚️ Output Format", list(FORMATS), index=list(FORMATS).index(DEFAULT_FORMAT),
+    format_func=lambda fmt: FORMATS[fmt].label,
+    help="Requested from the TTS service directly; Opus files are about a third the size of MP3",
+)
+level_audio_output = st.sidebar.checkbox(
+    "🎛️ Even out loudness and pauses", value=False, disabled=progressive,
+    help="Bring every chunk to the same loudness and shorten long silences where chunks meet "
+    "(re-encodes the audio with ffmpeg; not available with progressive playback)",
+)
+crossfade_ms = st.sidebar.slider(
+    "Crossfade at joins (ms)", min_value=0, max_value=100, value=0, step=10,
+    disabled=progressive or not level_audio_output,
+)
+auto_voice = st.sidebar.checkbox(
+    "🌐 Auto voice per language", value=False,
+    help="Speak each part of a mixed-language text with a voice matching its language; "
+    "the selected voice is used for its own language and as the fallback",
+)
 
 # Pronunciation Editor
 PRON_FILE = "pronunciations.json"
@@ -141,6 +330,9 @@ if st.sidebar.button("💾 Save Pronunciation"):
         save_json(PRON_FILE, pronunciations)
         st.sidebar.success(f"Saved pronunciation for '{custom_word}'")
 
+whole_words = st.sidebar.checkbox("Match whole words only", value=True)
+ignore_case = st.sidebar.checkbox("Ignore case", value=False)
+
 if pronunciations:
     st.sidebar.markdown("### 📌 Stored Pronunciations")
     for word, pron in pronunciations.items():
@@ -149,50 +341,56 @@ if pronunciations:
 # File Text Extraction
 def extract_text_from_file(uploaded_file, file_type):
     try:
-        if file_type == "txt":
-            return uploaded_file.read().decode("utf-8")
-        elif file_type == "pdf":
-            reader = PyPDF2.PdfReader(uploaded_file)
-            return "\n".join(
-                page.extract_text() for page in reader.pages if page.extract_text()
-            )
-        elif file_type == "docx":
-            document_obj = docx.Document(uploaded_file)
-            return "\n".join([para.text for para in document_obj.paragraphs])
-        elif personally_type == "doc":
-            result = mammoth.convert_to_markdown(uploaded_file)
-            return result.value
-        elif file_type == "md":
-            raw_md = uploaded_file.read().decode("utf-8")
-            return markdown.markdown(raw_md)
-        elif file_type == "rtf":
-            raw_rtf = uploaded_file.read().decode("utf-8")
-            return rtf_to_text(raw_rtf)
-        return ""
+        return extract_text(uploaded_file, file_type)
     except Exception as e:
         st.error(f"Error processing file: {e}")
         return ""
 
 # History Management
-HISTORY_FILE = "history.json"
-history = load_json(HISTORY_FILE, [])
+HISTORY_PAGE_SIZE = 20
+history = get_history_store()
+
+def audio_is_cached(entry):
+    audio = entry["audio"]
+    cache = get_chunk_cache()
+    extension = get_format(audio.get("format") if audio else None).extension
+    return bool(audio) and all(cache.get(key, extension, count=False) for key in audio["chunks"])
 
 st.sidebar.subheader("📝 History of Texts")
-if history:
+if history.count():
+    history_query = st.sidebar.text_input("🔍 Search history")
+    matches = history.count(history_query)
+    pages = max(1, -(-matches // HISTORY_PAGE_SIZE))
+    page = st.sidebar.number_input("Page", min_value=1, max_value=pages, value=1) if pages > 1 else 1
+    entries = {
+        entry["id"]: entry
+        for entry in history.list(history_query, HISTORY_PAGE_SIZE, (page - 1) * HISTORY_PAGE_SIZE)
+    }
     selected_history = st.sidebar.selectbox(
-        "Pick a saved text", ["Select a text..."] + history
+        f"Pick a saved text ({matches} found)",
+        [None] + list(entries),
+        format_func=lambda entry_id: "Select a text..." if entry_id is None else (
+            f"{'🔊 ' if entries[entry_id]['audio'] else ''}{entries[entry_id]['title']}"
+            f" ({entries[entry_id]['chars']:,} chars)"
+        ),
     )
-    if (
-        selected_history != "Select a text..."
-        and st.sidebar.button("🔄 Load from History")
-    ):
-        st.session_state["loaded_text"] = selected_history
+    if selected_history:
+        entry = entries[selected_history]
+        st.sidebar.caption(entry["preview"])
+        if audio_is_cached(entry):
+            st.sidebar.caption(
+                f"🔊 Audio cached for {entry['audio']['voice']} at {entry['audio']['rate']}"
+                f" ({get_format(entry['audio'].get('format')).label}):"
+                " converting with these settings is instant"
+            )
+    if selected_history and st.sidebar.button("🔄 Load from History"):
+        # Only the picked entry's full text is read from the store.
+        st.session_state["loaded_text"] = history.text(selected_history)
         st.sidebar.success("Loaded from history!")
 
     # Clear History Button
     if st.sidebar.button("🗑️ Clear History"):
         history.clear()
-        save_json(HISTORY_FILE, [])
         st.session_state.pop("loaded_text", None)
         st.sidebar.success("History cleared!")
 else:
@@ -204,8 +402,13 @@ if "loaded_text" in st.session_state and st.sidebar.button("🧹 Clear Loaded Te
     st.sidebar.success("Loaded text cleared!")
 
 # Input Handling
+# One trace per script run; the timing panel below shows its stages.
+trace = Trace()
 input_mode = st.radio("Choose Input Type", ["Type Text", "Upload File"])
 user_text = ""
+# Key under which the chunk layout is kept, so re-converting an edited
+# version of the same document only synthesizes the changed chunks.
+document_key = f"{session_id()}:text"
 
 if input_mode == "Type Text":
     user_text = st.text_area("Enter Text to Convert to Speech", height=200)
@@ -215,7 +418,11 @@ else:
     )
     if uploaded_file is not None:
         file_type = uploaded_file.name.split(".")[-1].lower()
-        user_text = extract_text_from_file(uploaded_file, file_type)
+        with trace.span("extract", bytes_in=uploaded_file.size) as span:
+            user_text = extract_text_from_file(uploaded_file, file_type)
+            span["bytes_out"] = len(user_text.encode("utf-8"))
+        # Per session: other users may upload a different file of the same name.
+        document_key = f"{session_id()}:file:{uploaded_file.name}"
 
 # Load from session state if available
 if "loaded_text" in st.session_state and st.session_state["loaded_text"]:
@@ -223,150 +430,338 @@ if "loaded_text" in st.session_state and st.session_state["loaded_text"]:
 
 # Save to history
 if user_text and st.button("📌 Save to History"):
-    if user_text not in history:
-        history.append(user_text)
-        save_json(HISTORY_FILE, history)
+    _, created = history.add(user_text)
+    if created:
         st.success("✅ Text saved to history")
 
 # Language Detection and Voice Validation
 def validate_language_and_voice(text, selected_voice):
-    try:
-        lang = detect(text)
-        st.sidebar.markdown(f"🌍 Detected Language: **{lang.upper()}**")
-        if lang == "te" and not selected_voice.startswith("Telugu"):
-            st.warning("⚠️ Telugu text detected. Consider selecting a Telugu voice.")
-        elif lang == "en" and not selected_voice.startswith("English"):
-            st.warning("⚠️ English text detected. Consider selecting an English voice.")
-        return lang
-    except LangDetectException:
+    # Sampled and memoized, so reruns don't re-scan the whole text.
+    lang = detect_language(text)
+    if lang is None:
         st.sidebar.warning("⚠️ Could not detect language")
         return None
+    st.sidebar.markdown(f"🌍 Detected Language: **{lang.upper()}**")
+    if auto_voice:
+        return lang  # each chunk gets a matching voice anyway
+    if lang != voice_language(selected_voice):
+        suggestion = voice_catalog.voice_for_language(lang)
+        if suggestion:
+            st.warning(
+                f"⚠️ {lang.upper()} text detected, but {selected_voice} speaks"
+                f" {voice_language(selected_voice).upper()}. Consider {suggestion} or another {lang.upper()} voice."
+            )
+        else:
+            st.warning(f"⚠️ {lang.upper()} text detected, and no voice for it is available.")
+    return lang
 
-# Apply pronunciations once
-def apply_pronunciations(text, pronunciations):
-    for word, pron in pronunciations.items():
-        text = text.replace(word, pron)
-    return text
-
-def clean_text(text):
-    # Keep letters, numbers, spaces, basic punctuation, and specific symbols (-, +)
-    # Remove #, *, and other unwanted symbols
-    text = re.sub(r'[#*]', '', text)
-    return text
-
-# Async TTS Generation for a single chunk
-async def generate_speech_chunk(text, voice, rate, output_file, retries=3):
-    for attempt in range(retries):
+# Background Conversion Jobs
+def conversion_job(job_queue, planned, voice_name, rate_value, concurrency, router, stream, trace, history, text,
+                   fmt=DEFAULT_FORMAT, registry=None, document=None, crossfade=None):
+    """Coroutine for the job queue. It runs on the queue's thread, so it
+    reports through the job object instead of calling Streamlit. The
+    finished audio is served from disk through ``registry`` (see
+    ``tts.streaming``) and deleted with the job after its TTL; without a
+    registry it is left for Streamlit's media delivery. ``planned``
+    comes from ``tts.incremental.plan_chunks``; the layout is saved under
+    ``document`` so the next conversion of an edited text reuses it.
+    Unless ``crossfade`` is None, the joined (non-progressive) output is
+    levelled and its pauses capped by ``tts.postprocess``. Word timings are
+    only requested when the audio is served, as the synced player needs a
+    URL to play."""
+    extension = get_format(fmt).extension
+    timing = bool(stream or registry)
+    chunks = [chunk.text for chunk in planned]
+    report = ReuseReport()
+
+    async def work(job):
+        temp_files = []
+        timing_index = None
+
+        def temp_path(i):
+            temp_file = os.path.join(job.dir, f"{i:05d}.{extension}")
+            temp_files.append(temp_file)
+            return temp_file
+
+        def report_progress(done, total, index):
+            if stream:
+                stream.publish(index, temp_files[index])
+            job.progress(done, total)
+
+        def report_retry(attempt, retries, error):
+            job.log(f"⚠️ Retrying chunk ({attempt}/{retries}) due to: {error}")
+
+        def report_source(index, chunk, source):
+            report.record(chunk, source, planned[index].reused)
+
+        job.progress(0, len(chunks))
         try:
-            communicate = edge_tts.Communicate(text=text, voice=voice, rate=rate)
-            await communicate.save(output_file)
-            return True
-        except Exception as e:
-            if attempt < retries - 1:
-                await asyncio.sleep(3)
-                st.warning(f"⚠️ Retrying chunk ({attempt+1}/{retries}) due to: {e}")
+            with trace.span("synthesize", chunks=len(chunks)):
+                await synthesize_chunks(
+                    chunks,
+                    voice_name,
+                    rate_value,
+                    temp_path,
+                    concurrency=concurrency,
+                    on_progress=report_progress,
+                    on_retry=report_retry,
+                    cache=get_chunk_cache(),
+                    trace=trace,
+                    voice_for=router,
+                    timing=timing,
+                    limiter=lambda chunk_voice: job_queue.slot(job, chunk_voice),
+                    fmt=fmt,
+                    on_source=report_source,
+                )
+            if timing and (stream or crossfade is None):
+                with trace.span("timing_index", chunks=len(chunks)) as span:
+                    timing_index = build_index(chunks, temp_files, fmt)
+                    span["words"] = len(timing_index)
+        except BaseException as e:
+            if stream:
+                stream.finish(error=e)
+            trace.export()
+            raise
+
+        # Concatenate all temp files
+        served = stream
+        if stream:
+            stream.finish()
+            output_file = stream.path
+        else:
+            output_file = os.path.join(job.dir, f"converted_speech.{extension}")
+            offsets = None
+            if crossfade is not None:
+                with trace.span("level", chunks=len(chunks)) as span:
+                    try:
+                        placements = level_audio(temp_files, output_file, fmt, crossfade=crossfade, work_dir=job.dir)
+                    except PostprocessError as e:
+                        job.log(f"⚠️ Loudness levelling skipped: {e}")
+                    else:
+                        offsets = [placement.offset_ms for placement in placements]
+                        span["trimmed_ms"] = sum(placement.trimmed_ms for placement in placements)
+                        span["bytes_out"] = os.path.getsize(output_file)
+                if timing:
+                    with trace.span("timing_index", chunks=len(chunks)) as span:
+                        timing_index = build_index(chunks, temp_files, fmt, offsets)
+                        span["words"] = len(timing_index)
+            if offsets is None:
+                with trace.span("concat") as span:
+                    join_audio(temp_files, output_file, fmt)
+                    span["bytes_out"] = os.path.getsize(output_file)
+            served = registry.add(output_file, fmt) if registry else None
+        for temp in temp_files + [words_path(t) for t in temp_files]:
+            if os.path.exists(temp):
+                os.remove(temp)
+        trace.export()
+        if document:
+            get_plan_store().put(document, [chunk.sentences for chunk in planned])
+        if text in history:
+            history.link_audio(text, voice_name, rate_value, [
+                chunk_key(chunk, router.voice_for(chunk) if router else voice_name, rate_value, fmt)
+                for chunk in chunks
+            ], fmt)
+        return {
+            "output": output_file,
+            "stream": served,
+            "timing": timing_index,
+            "trace": trace,
+            "voices": dict(router.routed) if router else None,
+            "format": fmt,
+            "reuse": report,
+        }
+    return work
+
+def read_audio(path):
+    with open(path, "rb") as audio_file:
+        return audio_file.read()
+
+def audio_download_button(label, path, audio_format, key):
+    # The file is read only when the button is clicked, not on every rerun.
+    st.download_button(
+        label=label,
+        data=functools.partial(read_audio, path),
+        file_name=f"converted_speech.{audio_format.extension}",
+        mime=audio_format.mime,
+        key=key,
+    )
+
+@st.fragment(run_every=1.0)
+def show_job_progress():
+    job_queue = get_job_queue()
+    jobs = [job for job in job_queue.jobs(owner=session_id()) if job.active]
+    if not jobs:
+        st.rerun()  # a job just finished: redraw the page with its result
+    for job in jobs:
+        status, cancel = st.columns([5, 1])
+        if job.status == QUEUED:
+            status.progress(0.0, text=f"⏳ {job.label}: waiting for a free worker")
+        else:
+            status.progress(job.fraction, text=f"{job.label}: synthesizing {job.done}/{job.total} chunks")
+        if cancel.button("✖️ Cancel", key=f"cancel-{job.id}"):
+            job_queue.cancel(job.id)
+        for message in job.messages[-3:]:
+            st.caption(message)
+
+def show_job_result(job):
+    if job.status == CANCELLED:
+        st.info(f"🛑 Conversion cancelled: {job.label}")
+        return
+    if job.status == FAILED:
+        error = job.error
+        if isinstance(error, ChunkSynthesisError):
+            st.error(f"❌ Failed to generate audio chunk: {error.cause}")
+            st.code(f"Voice: {error.voice}\nRate: {error.rate}\nText: {error.text[:200]}")
+        else:
+            st.error(f"❌ Conversion failed: {error}")
+        return
+    result = job.result
+    output_file = result["output"]
+    if not os.path.exists(output_file):
+        st.warning("⚠️ This conversion has expired; please convert it again.")
+        return
+    st.success("✅ Conversion Complete!")
+    cache_stats = get_chunk_cache().stats()
+    st.caption(f"♻️ Chunk cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses")
+    if result["reuse"].unchanged:
+        st.caption(f"✏️ Incremental: {result['reuse'].summary()}")
+    if result["voices"]:
+        st.caption("🌐 Voices: " + ", ".join(
+            f"{name} × {count}" for name, count in result["voices"].items()
+        ))
+    timing_index = result["timing"]
+    audio_format = get_format(result["format"])
+    file_name = f"converted_speech.{audio_format.extension}"
+    if result["stream"]:
+        # Audio is served from disk by the stream server (range requests, so
+        # the player can seek); nothing is read into the page.
+        server = get_stream_server()
+        audio_url = server.url(result["stream"])
+        if not job.meta.get("stream"):
+            if len(timing_index):
+                components.html(synced_player_html(audio_url, timing_index), height=SYNCED_PLAYER_HEIGHT)
             else:
-                st.error(f"❌ Failed to generate audio chunk: {e}")
-                st.code(f"Voice: {voice}\nRate: {rate}\nText: {text[:200]}")
-                return False
-
-# Helper function to run async code safely in Streamlit
-def run_async(coro):
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    try:
-        return loop.run_until_complete(coro)
-    finally:
-        loop.close()
-
-# Split text into chunks (e.g., by sentences, aiming for ~5000 chars per chunk to avoid limits)
-def split_text_into_chunks(text, max_chars=5000):
-    chunks = []
-    current_chunk = ""
-    sentences = re.split(r'(?<=[.!?]) +', text)
-    for sentence in sentences:
-        if len(current_chunk) + len(sentence) > max_chars:
-            if current_chunk:
-                chunks.append(current_chunk.strip())
-            current_chunk = sentence
+                st.markdown(audio_player_html(audio_url, mime=audio_format.mime), unsafe_allow_html=True)
         else:
-            current_chunk += " " + sentence
-    if current_chunk:
-        chunks.append(current_chunk.strip())
-    return chunks
+            st.markdown(audio_player_html(audio_url, mime=audio_format.mime), unsafe_allow_html=True)
+            if len(timing_index):
+                with st.expander("📖 Follow along"):
+                    components.html(synced_player_html(audio_url, timing_index), height=SYNCED_PLAYER_HEIGHT)
+        st.link_button("📥 Download Audio", server.url(result["stream"], download=file_name), key=f"download-{job.id}")
+    else:
+        # The stream server could not start: Streamlit delivers the audio.
+        st.audio(output_file, format=audio_format.mime)
+        audio_download_button("📥 Download Audio", output_file, audio_format, key=f"download-{job.id}")
+    with st.expander("⏱️ Timing breakdown"):
+        st.dataframe(result["trace"].summary(), hide_index=True)
+        network = get_client(get_job_queue().loop).stats()
+        st.caption(
+            f"📡 TTS service: {network['attempts']} requests over {network['connections']} connections"
+            f" ({network['reuse_rate']:.0%} reused, {network['connect_p50_s'] * 1000:.0f} ms median setup),"
+            f" {network['retry_rate']:.1%} retried, {network['throttled']} throttled"
+        )
+        st.download_button(
+            label="📈 Download Trace (chrome://tracing)",
+            data=result["trace"].chrome_json(),
+            file_name=f"tts-trace-{result['trace'].job_id[:8]}.json",
+            mime="application/json",
+            key=f"trace-{job.id}",
+        )
+
+# Derived text is memoized per input, so reruns triggered by unrelated
+# widgets don't redo the work.
+@st.cache_data(show_spinner=False, max_entries=16)
+def prepare_text(text, pronunciations, whole_words, ignore_case):
+    return clean_text(
+        apply_pronunciations(text, pronunciations, whole_words=whole_words, ignore_case=ignore_case)
+    )
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def split_sentences(text):
+    return re.split(r"(?<=[.!?]) +", clean_text(text).replace("\n", " "))
 
 # Process and generate speech
 if user_text:
     # Validate language
-    validate_language_and_voice(user_text, voice)
+    with trace.span("detect_language", bytes_in=len(user_text.encode("utf-8"))):
+        validate_language_and_voice(user_text, voice)
     
-    # Apply pronunciations
-    processed_text = apply_pronunciations(user_text, pronunciations)
-    cleaned_text = clean_text(processed_text)
+    # Apply pronunciations and clean (memoized per text and settings)
+    with trace.span("prepare", bytes_in=len(user_text.encode("utf-8"))) as span:
+        cleaned_text = prepare_text(user_text, pronunciations, whole_words, ignore_case)
+        span["bytes_out"] = len(cleaned_text.encode("utf-8"))
 
+    if BREAKER.state == OPEN:
+        st.warning(
+            f"⚠️ The TTS service has been failing; new requests resume in {BREAKER.retry_in():.0f}s."
+        )
     if st.button("🎧 Convert to Speech"):
-        output_file = f"{uuid.uuid4().hex}.mp3"
-        temp_files = []
-        try:
-            with st.spinner("Generating audio... Please wait ⏳"):
-                chunks = split_text_into_chunks(cleaned_text)
-                for i, chunk in enumerate(chunks):
-                    temp_file = f"temp_{i}_{uuid.uuid4().hex}.mp3"
-                    success = run_async(
-                        generate_speech_chunk(chunk, voice_options[voice], speed_map[rate], temp_file)
+        with trace.span("chunk", bytes_in=len(cleaned_text.encode("utf-8"))) as span:
+            planned = list(plan_chunks(
+                iter_sentences(cleaned_text),
+                get_plan_store().get(document_key),
+                first_chunk_bytes=FIRST_CHUNK_BYTES if progressive else None,
+            ))
+            span["chunks"] = len(planned)
+            span["reused"] = sum(chunk.reused for chunk in planned)
+        # Start the player right away; it plays chunks as they are appended.
+        stream = stream_server.registry.create(output_format) if progressive else None
+        job_queue = get_job_queue()
+        job = job_queue.submit(
+            conversion_job(
+                job_queue,
+                planned,
+                voice,
+                speed_map[rate],
+                concurrency,
+                VoiceRouter(voice, voice_catalog.defaults.values()) if auto_voice else None,
+                stream,
+                trace,
+                history,
+                user_text,
+                output_format,
+                stream_server.registry if stream_server else None,
+                document_key,
+                crossfade_ms / 1000 if level_audio_output and not progressive else None,
+            ),
+            owner=session_id(),
+            label=" ".join(user_text[:60].split()) or "Untitled",
+            stream=stream,
+        )
+        st.session_state["current_job"] = job.id
+
+# Conversion Jobs
+session_jobs = get_job_queue().jobs(owner=session_id())
+if session_jobs:
+    st.subheader("🎛️ Conversions")
+    latest = session_jobs[0]
+    if latest.active and latest.meta.get("stream"):
+        st.markdown(
+            audio_player_html(
+                stream_server.url(latest.meta["stream"]), autoplay=True,
+                mime=latest.meta["stream"].format.mime,
+            ),
+            unsafe_allow_html=True,
+        )
+    if any(job.active for job in session_jobs):
+        show_job_progress()
+    if not latest.active:
+        show_job_result(latest)
+    earlier = [job for job in session_jobs[1:] if job.status == DONE]
+    if earlier:
+        with st.expander(f"🗂️ Earlier conversions ({len(earlier)})"):
+            for job in earlier:
+                audio_format = get_format(job.result["format"])
+                if job.result["stream"]:
+                    st.link_button(
+                        f"📥 {job.label}",
+                        stream_server.url(
+                            job.result["stream"], download=f"converted_speech.{audio_format.extension}"
+                        ),
+                        key=f"download-{job.id}",
                     )
-                    if success:
-                        temp_files.append(temp_file)
-                    else:
-                        raise Exception("Failed to generate one or more audio chunks")
-
-                # Concatenate all temp files
-                if temp_files:
-                    combined = AudioSegment.empty()
-                    for temp in temp_files:
-                        combined += AudioSegment.from_mp3(temp)
-                    combined.export(output_file, format="mp3")
-
-            if os.path.exists(output_file):
-                st.success("✅ Conversion Complete!")
-                try:
-                    with open(output_file, "rb") as audio_file:
-                        audio_bytes = audio_file.read()
-                        audio_base64 = base64.b64encode(audio_bytes).decode()
-                        st.markdown(
-                            f"""
-                            <audio id="tts-audio" controls style="width:100%;">
-                                <source src="data:audio/mp3;base64,{audio_base64}" type="audio/mp3">
-                                Your browser does not support the audio element.
-                            </audio>
-                            <div class="audio-controls" style="margin-top:8px;">
-                                <button onclick="var a=document.getElementById('tts-audio'); if (!isNaN(a.currentTime)) a.currentTime=Math.max(0,a.currentTime-10);">⏪ 10s</button>
-                                <button onclick="var a=document.getElementById('tts-audio'); if (!isNaN(a.currentTime) && !isNaN(a.duration)) a.currentTime=Math.min(a.duration,a.currentTime+10);">10s ⏩</button>
-                            </div>
-                            """,
-                            unsafe_allow_html=True,
-                        )
-                        st.download_button(
-                            label="📥 Download Audio",
-                            data=audio_bytes,
-                            file_name="converted_speech.mp3",
-                            mime="audio/mp3",
-                        )
-                except Exception as e:
-                    st.error(f"Error reading audio file: {e}")
-        finally:
-            # Clean up temp files
-            for temp in temp_files:
-                if os.path.exists(temp):
-                    try:
-                        os.remove(temp)
-                    except Exception as e:
-                        st.warning(f"Failed to clean up temp file: {e}")
-            if os.path.exists(output_file):
-                try:
-                    os.remove(output_file)
-                except Exception as e:
-                    st.warning(f"Failed to clean up audio file: {e}")
+                else:
+                    audio_download_button(f"📥 {job.label}", job.result["output"], audio_format, key=f"download-{job.id}")
 
 # Browser-based TTS
 if user_text and st.button("🗣️ Read Aloud in Browser"):
@@ -473,116 +868,174 @@ if user_text and st.button("🗣️ Read Aloud in Browser"):
     components.html(html_code)
 
 # Sentence-by-Sentence Reading
-if user_text:
-    cleaned_text = clean_text(user_text)
-    escaped_sentences = re.split(r"(?<=[.!?]) +", cleaned_text.replace("\n", " "))
-    js_sentence_click = """
-    <div id="sentence-text" style="line-height: 2; padding: 10px; max-height: 300px; overflow-y: auto;">
-    """
-    for sentence in escaped_sentences:
-        clean_sent = sentence.strip().replace('"', '\\"')
-        js_sentence_click += (
-            f"<span class='sentence' onclick='speakSentence(\"{clean_sent}\")' style='cursor:pointer; display:block; padding:5px; margin-bottom:8px; border:1px solid #ccc; border-radius:6px;'>"
-            + sentence
-            + "</span>"
-        )
-    js_sentence_click += "</div>"
+READER_PAGE_SIZE = 1000
+READER_HEIGHT = 300
 
-    actual_voice_name = voice_options[voice]
-    js_sentence_click += f"""
+def sentence_reader_html(sentences, first_id, voice_name, rate_value):
+    """Virtualized reader for one page of sentences.
+
+    Only the rows in (or near) the visible window exist in the DOM; row
+    heights are measured as rows are shown and kept in an array of offsets.
+    Sentences are addressed by their index in the document, and reading
+    aloud queues one utterance per sentence, advancing on each ``onend``.
+    """
+    sentences_json = json.dumps(sentences, ensure_ascii=False).replace("</", "<\\/")
+    return f"""
+<div id="reader" style="position: relative; height: {READER_HEIGHT}px; overflow-y: auto; padding: 0 10px;">
+    <div id="reader-spacer" style="position: relative;"></div>
+</div>
+<div class="audio-controls" style="margin-top:1px;">
+    <button onclick="skipSentence(-1)">⏪ Prev</button>
+    <button onclick="togglePauseResume()">⏯️ Pause/Resume</button>
+    <button onclick="skipSentence(1)">Next ⏩</button>
+</div>
+<style>
+.sentence {{
+    position: absolute; left: 0; right: 0; box-sizing: border-box; cursor: pointer;
+    padding: 5px; line-height: 2; border: 1px solid #ccc; border-radius: 6px;
+}}
+.sentence:hover {{ background-color: #f0f0f0; }}
+.sentence.current {{ background-color: yellow; }}
+.audio-controls button {{
+    background-color: #3b82f6; color: white; border: none; border-radius: 5px;
+    padding: 5px 15px; margin: 0 5px; cursor: pointer;
+}}
+</style>
 <script>
-let synth = window.speechSynthesis;
-let sentenceUtterance = null;
-let voicesLoaded = false;
-let cachedVoices = [];
-
-function loadVoices() {{
-    return new Promise(resolve => {{
-        let voices = synth.getVoices();
-        if (voices.length !== 0) {{
-            voicesLoaded = true;
-            cachedVoices = voices;
-            resolve(voices);
-        }} else {{
-            synth.onvoiceschanged = () => {{
-                voicesLoaded = true;
-                cachedVoices = synth.getVoices();
-                resolve(cachedVoices);
-            }};
-        }}
-    }});
+const sentences = {sentences_json};
+const firstId = {first_id};  // document index of sentences[0]
+const voiceName = {json.dumps(voice_name)};
+const GAP = 8, ESTIMATE = 48, OVERSCAN = 300;
+const reader = document.getElementById("reader");
+const spacer = document.getElementById("reader-spacer");
+const heights = new Float64Array(sentences.length).fill(ESTIMATE);
+const offsets = new Float64Array(sentences.length + 1);
+const rows = new Map();  // sentence index -> rendered row
+let current = -1;
+let speaking = false;
+// Bumped by every speakFrom: cancel() fires the old utterance's end event in
+// some browsers, and only the latest run may advance to the next sentence.
+let generation = 0;
+
+function layout() {{
+    for (let i = 0; i < sentences.length; i++) offsets[i + 1] = offsets[i] + heights[i] + GAP;
+    spacer.style.height = offsets[sentences.length] + "px";
 }}
 
-function speakSentence(sentence) {{
-    if (!voicesLoaded) {{
-        loadVoices().then(() => speakSentence(sentence));
-        return;
+// First index whose row ends below y.
+function rowAt(y) {{
+    let lo = 0, hi = sentences.length;
+    while (lo < hi) {{
+        const mid = (lo + hi) >> 1;
+        if (offsets[mid + 1] <= y) lo = mid + 1; else hi = mid;
     }}
+    return lo;
+}}
 
-    synth.cancel();
-
-    let allSpans = Array.from(document.querySelectorAll('.sentence'));
-    let startIndex = allSpans.findIndex(el => el.textContent.trim() === sentence.trim());
-    if (startIndex === -1) return;
+function render() {{
+    const top = reader.scrollTop - OVERSCAN, bottom = reader.scrollTop + reader.clientHeight + OVERSCAN;
+    const first = rowAt(Math.max(0, top));
+    const wanted = new Set();
+    for (let i = first; i < sentences.length && offsets[i] < bottom; i++) wanted.add(i);
+    for (const [i, row] of rows) if (!wanted.has(i)) {{ row.remove(); rows.delete(i); }}
+    let resized = false;
+    for (const i of wanted) {{
+        let row = rows.get(i);
+        if (!row) {{
+            row = document.createElement("div");
+            row.className = "sentence" + (i === current ? " current" : "");
+            row.textContent = sentences[i];
+            row.dataset.id = firstId + i;
+            row.onclick = () => speakFrom(i);
+            spacer.appendChild(row);
+            rows.set(i, row);
+        }}
+        row.style.top = offsets[i] + "px";
+        const height = row.offsetHeight;
+        if (height !== heights[i]) {{ heights[i] = height; resized = true; }}
+    }}
+    if (resized) {{
+        layout();
+        for (const [i, row] of rows) row.style.top = offsets[i] + "px";
+    }}
+}}
 
-    let remainingSentences = allSpans.slice(startIndex).map(el => el.textContent).join(' ');
-    sentenceUtterance = new SpeechSynthesisUtterance(remainingSentences);
+function scrollToSentence(i) {{
+    if (offsets[i] < reader.scrollTop || offsets[i + 1] > reader.scrollTop + reader.clientHeight) {{
+        reader.scrollTop = Math.max(0, offsets[i] - reader.clientHeight / 3);
+    }}
+    render();
+}}
 
-    const preferredVoiceName = "{browser_voice}";
-    const matched = cachedVoices.find(v => v.name === preferredVoiceName) || cachedVoices[0];
-    sentenceUtterance.voice = matched;
-    sentenceUtterance.lang = matched.lang;
-    sentenceUtterance.rate = {rate_map[rate]};
+function setCurrent(i) {{
+    if (rows.has(current)) rows.get(current).classList.remove("current");
+    current = i;
+    if (i >= 0) scrollToSentence(i);
+    if (rows.has(i)) rows.get(i).classList.add("current");
+}}
 
-    allSpans.forEach(el => el.style.background = '');
-    if (allSpans[startIndex]) {{
-        allSpans[startIndex].style.background = 'yellow';
-        allSpans[startIndex].scrollIntoView({{ behavior: 'smooth', block: 'center' }});
-    }}
+let voices = [];
+function withVoices(callback) {{
+    voices = speechSynthesis.getVoices();
+    if (voices.length) return callback();
+    speechSynthesis.onvoiceschanged = () => {{ voices = speechSynthesis.getVoices(); callback(); }};
+}}
 
-    sentenceUtterance.onend = () => {{
-        allSpans.forEach(el => el.style.background = '');
-        sentenceUtterance = null;
-    }};
+// One utterance per sentence; the next one is queued when this one ends.
+function speakFrom(i) {{
+    withVoices(() => {{
+        const run = ++generation;
+        speechSynthesis.cancel();
+        speaking = true;
+        speakSentence(i, run);
+    }});
+}}
 
-    synth.speak(sentenceUtterance);
+function speakSentence(i, run) {{
+    if (!speaking || i >= sentences.length) {{ speaking = false; setCurrent(-1); return; }}
+    setCurrent(i);
+    const utterance = new SpeechSynthesisUtterance(sentences[i]);
+    const matched = voices.find(v => v.name === voiceName) || voices[0];
+    if (matched) {{ utterance.voice = matched; utterance.lang = matched.lang; }}
+    utterance.rate = {rate_value};
+    utterance.onend = () => {{ if (run === generation) speakSentence(i + 1, run); }};
+    speechSynthesis.speak(utterance);
 }}
 
 function togglePauseResume() {{
-    if (!window.speechSynthesis || !sentenceUtterance) return;
-    if (synth.speaking && !synth.paused) {{
-        synth.pause();
-    }} else if (synth.paused) {{
-        synth.resume();
-    }}
+    if (speechSynthesis.speaking && !speechSynthesis.paused) speechSynthesis.pause();
+    else if (speechSynthesis.paused) speechSynthesis.resume();
 }}
 
-function skipSentence(forward) {{
-    let sentences = Array.from(document.querySelectorAll('.sentence'));
-    let current = sentences.findIndex(el => el.style.background === 'yellow');
-    let next = forward ? Math.min(sentences.length-1, current+1) : Math.max(0, current-1);
-    if (next !== -1 && next !== current) {{
-        sentences[next].click();
-    }}
+function skipSentence(step) {{
+    const next = Math.min(sentences.length - 1, Math.max(0, current + step));
+    speakFrom(next);
 }}
 
+layout();
+reader.addEventListener("scroll", () => requestAnimationFrame(render));
+render();
 </script>
-
-<div class="audio-controls" style="margin-top:1px;">
-    <button onclick="skipSentence(false)">⏪ Prev</button>
-    <button onclick="togglePauseResume()">⏯️ Pause/Resume</button>
-    <button onclick="skipSentence(true)">Next ⏩</button>
-</div>
-
-<style>
-.sentence:hover {{
-    background-color: #f0f0f0;
-}}
-</style>
 """
 
+if user_text:
+    sentences = split_sentences(user_text)
     st.markdown("### 📌 Click a sentence to read it aloud")
-    components.html(js_sentence_click, height=350)
+    page_start = 0
+    if len(sentences) > READER_PAGE_SIZE:
+        # Only one page of sentences is sent to the browser per rerun.
+        page = st.number_input(
+            f"Reader page ({len(sentences):,} sentences)", min_value=1,
+            max_value=-(-len(sentences) // READER_PAGE_SIZE), value=1,
+        )
+        page_start = (page - 1) * READER_PAGE_SIZE
+    components.html(
+        sentence_reader_html(
+            sentences[page_start:page_start + READER_PAGE_SIZE], page_start,
+            browser_voice, rate_map[rate],
+        ),
+        height=READER_HEIGHT + 50,
+    )
 
 st.markdown("---")
 st.caption("🔊 Built with ❤️ by Sudarshan using Edge-TTS and Streamlit")
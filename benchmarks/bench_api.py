@@ -0,0 +1,143 @@
+"""Load test for the local synthesis API (tts.api) against the mock TTS server.
+
+Starts the offline mock Edge-TTS server and the API in this process, then
+runs closed-loop clients: each submits a short unique text, fetches the
+finished audio (``/audio?wait=``) and starts over until the duration is up.
+Rejected submissions (429/503) are retried after their ``Retry-After``.
+Reports completed requests per second, end-to-end latency percentiles,
+rejections and the batch sizes the dispatcher formed, once per batch size
+and client count:
+
+    python benchmarks/bench_api.py --clients 1 8 32 --batch-size 1 8
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_pipeline import start_mock  # noqa: E402
+from tts.api import ApiServer  # noqa: E402
+
+TEXT = "Request {n} from client {client}: the quick brown fox reads the weather report aloud. "
+
+
+def client_loop(base_url, client, chars, deadline, latencies, rejected):
+    n = 0
+    while time.perf_counter() < deadline:
+        n += 1
+        text = TEXT.format(n=n, client=client) * max(1, chars // len(TEXT))
+        body = json.dumps({"text": text}).encode("utf-8")
+        request = urllib.request.Request(
+            base_url + "/v1/synthesize", data=body, method="POST",
+            headers={"Content-Type": "application/json", "X-Client-Id": f"client-{client}"},
+        )
+        start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request) as response:
+                job = json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            if e.code not in (429, 503):
+                raise
+            rejected.append(e.code)
+            time.sleep(float(e.headers.get("Retry-After", "1")))
+            continue
+        with urllib.request.urlopen(f"{base_url}/v1/jobs/{job['id']}/audio?wait=60") as response:
+            if response.status != 200:
+                raise RuntimeError(f"job {job['id']} did not finish: {response.read()!r}")
+            response.read()
+        latencies.append(time.perf_counter() - start)
+
+
+def run_case(args, clients, batch_size):
+    with tempfile.TemporaryDirectory() as work:
+        server = ApiServer(
+            "127.0.0.1", 0, workers=args.workers, directory=os.path.join(work, "api"),
+            pronunciations=os.path.join(work, "pronunciations.json"),
+            batch_size=batch_size, max_queued=args.max_queued, cache_dir=os.path.join(work, "cache"),
+        )
+        try:
+            latencies = []
+            rejected = []
+            start = time.perf_counter()
+            deadline = start + args.duration
+            threads = [
+                threading.Thread(
+                    target=client_loop,
+                    args=(server.url, client, args.chars, deadline, latencies, rejected),
+                )
+                for client in range(clients)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+            with urllib.request.urlopen(server.url + "/v1/health") as response:
+                health = json.loads(response.read())
+        finally:
+            server.shutdown()
+    latencies.sort()
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000 if latencies else 0.0
+
+    return {
+        "clients": clients,
+        "batch_size": batch_size,
+        "requests": len(latencies),
+        "rps": len(latencies) / elapsed,
+        "p50_ms": percentile(0.5),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+        "rejected": len(rejected),
+        "batches": health["batch_sizes"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--batch-size", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--max-queued", type=int, default=256)
+    parser.add_argument("--chars", type=int, default=400, help="text length per request")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per case")
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--realtime-factor", type=float, default=0.005)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--max-connections", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--port", type=int, default=8902)
+    args = parser.parse_args()
+
+    mock, url = start_mock(args)
+    # Worker processes are spawned and pick the endpoint up from the environment.
+    os.environ["TTS_ENDPOINT"] = url
+    try:
+        print(f"{'clients':>7} {'batch':>5} {'requests':>8} {'req/s':>7} {'p50 ms':>8}"
+              f" {'p95 ms':>8} {'p99 ms':>8} {'rejected':>8}  batches formed")
+        for batch_size in args.batch_size:
+            for clients in args.clients:
+                result = run_case(args, clients, batch_size)
+                batches = ", ".join(f"{size}x{count}" for size, count in result["batches"].items())
+                print(f"{clients:>7} {batch_size:>5} {result['requests']:>8} {result['rps']:>7.1f}"
+                      f" {result['p50_ms']:>8.0f} {result['p95_ms']:>8.0f} {result['p99_ms']:>8.0f}"
+                      f" {result['rejected']:>8}  {batches}")
+    finally:
+        mock.terminate()
+        mock.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Peak heap while delivering a finished audio file to the browser.
+
+Compares the old inline delivery (read the file, base64 it into a data
+URI, pass the bytes again to a download button) with serving it from disk
+through tts.streaming.StreamServer, for several audio lengths. Heap is
+measured with tracemalloc around one full download.
+
+Usage: python benchmarks/bench_delivery.py [minutes ...]
+"""
+
+import base64
+import os
+import sys
+import tempfile
+import tracemalloc
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tts.streaming import StreamServer  # noqa: E402
+
+BYTES_PER_MINUTE = 48_000 // 8 * 60  # default 48 kbps MP3
+
+
+def inline(path):
+    with open(path, "rb") as f:
+        audio_bytes = f.read()
+    page = f'<audio src="data:audio/mpeg;base64,{base64.b64encode(audio_bytes).decode()}">'
+    download = audio_bytes
+    return len(page) + len(download)
+
+
+def served(server, path):
+    stream = server.registry.add(path)
+    received = 0
+    with urllib.request.urlopen(server.url(stream, download="speech.mp3")) as response:
+        while True:
+            block = response.read(64 * 1024)
+            if not block:
+                return received
+            received += len(block)
+
+
+def peak_mb(function, *args):
+    tracemalloc.start()
+    try:
+        function(*args)
+        return tracemalloc.get_traced_memory()[1] / 1e6
+    finally:
+        tracemalloc.stop()
+
+
+def main(minutes):
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["TTS_STREAM_DIR"] = tmp
+        server = StreamServer(host="127.0.0.1", port=0, base_url="http://127.0.0.1")
+        server.base_url = f"http://127.0.0.1:{server.httpd.server_address[1]}"
+        print(f"{'audio min':>9} {'file MB':>8} {'inline peak MB':>15} {'served peak MB':>15}")
+        try:
+            for length in minutes:
+                path = os.path.join(tmp, f"{length}.mp3")
+                with open(path, "wb") as f:
+                    for _ in range(length):
+                        f.write(os.urandom(BYTES_PER_MINUTE))
+                size = os.path.getsize(path) / 1e6
+                print(f"{length:>9} {size:>8.1f} {peak_mb(inline, path):>15.1f} {peak_mb(served, server, path):>15.2f}")
+        finally:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10, 60, 240])
@@ -0,0 +1,84 @@
+"""First-page latency, total time and peak RSS for PDF extraction.
+
+Generates a text-only PDF (500 pages by default) and extracts it with
+tts.extract.iter_pdf, sequentially and across a process pool.
+
+Usage: python benchmarks/bench_extract.py [pages]
+"""
+
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tts.extract import iter_pdf  # noqa: E402
+
+LINES_PER_PAGE = 40
+LINE = "The quick brown fox jumps over the lazy dog while the speech engine reads along."
+
+
+def write_pdf(path, pages):
+    """Write a minimal PDF with ``pages`` pages of Helvetica text."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page in range(pages):
+        lines = [f"({LINE} Page {page + 1} line {n + 1}.) Tj T*" for n in range(LINES_PER_PAGE)]
+        stream = ("BT /F1 10 Tf 14 TL 40 760 Td " + " ".join(lines) + " ET").encode()
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (len(objects))
+        )
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % kid for kid in kids), pages)
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, 1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b"%010d 00000 n \n" % offset)
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+                % (len(objects) + 1, xref))
+
+
+def peak_rss_mb():
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return usage / 1024, children / 1024
+
+
+def measure(path, workers):
+    start = time.perf_counter()
+    first = None
+    chars = 0
+    for text in iter_pdf(path, workers=workers):
+        if first is None:
+            first = time.perf_counter() - start
+        chars += len(text)
+    return first, time.perf_counter() - start, chars
+
+
+def main(pages):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.pdf")
+        write_pdf(path, pages)
+        print(f"{pages} pages, {os.path.getsize(path) / 1e6:.1f} MB")
+        print(f"{'workers':>8} {'first page (s)':>15} {'total (s)':>10} {'chars':>10}")
+        for workers in (1, os.cpu_count() or 1):
+            first, total, chars = measure(path, workers)
+            print(f"{workers:>8} {first:>15.3f} {total:>10.2f} {chars:>10}")
+        own, children = peak_rss_mb()
+        print(f"peak RSS: {own:.0f} MB (main), {children:.0f} MB (largest worker)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
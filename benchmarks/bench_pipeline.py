@@ -0,0 +1,165 @@
+"""End-to-end pipeline benchmark against the offline mock Edge-TTS server.
+
+For every document size and concurrency level this converts a generated
+text file through tts.pipeline.convert_document and records time to first
+audio, total job latency, throughput, peak Python heap and the TTS
+client's connection and retry counts. Results are written as JSON so two
+runs can be compared:
+
+    python benchmarks/bench_pipeline.py --out before.json
+    python benchmarks/bench_pipeline.py --compare before.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tts.pipeline import convert_document  # noqa: E402
+from tts.client import get_client, use_endpoint  # noqa: E402
+
+SENTENCE = "The quick brown fox reads chapter {n} aloud while the kettle boils. "
+
+
+def make_document(path, chars):
+    with open(path, "w", encoding="utf-8") as f:
+        written = n = 0
+        while written < chars:
+            sentence = SENTENCE.format(n=n)
+            f.write(sentence)
+            written += len(sentence)
+            n += 1
+
+
+def start_mock(args):
+    command = [
+        sys.executable, "-m", "tts.mockserver", "--port", str(args.port),
+        "--latency", str(args.latency), "--jitter", str(args.jitter),
+        "--realtime-factor", str(args.realtime_factor),
+        "--failure-rate", str(args.failure_rate), "--seed", str(args.seed),
+    ]
+    if args.max_connections:
+        command += ["--max-connections", str(args.max_connections)]
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    process = subprocess.Popen(command, cwd=root, stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if "listening" not in line:
+        process.kill()
+        raise RuntimeError(f"mock server failed to start: {line!r}")
+    return process, line.rsplit(" ", 1)[-1].strip()
+
+
+async def run_case(source, concurrency, work):
+    first_audio = None
+    start = time.perf_counter()
+
+    def progress(done, total, index):
+        nonlocal first_audio
+        if index == 0:
+            first_audio = time.perf_counter() - start
+
+    tracemalloc.start()
+    stats = await convert_document(
+        source, "txt", os.path.join(work, "out.mp3"), "en-US-AriaNeural", "+0%",
+        os.path.join(work, "chunks"), concurrency=concurrency, on_progress=progress,
+    )
+    total = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    client = get_client()
+    network = client.stats()
+    await client.close()
+    return {
+        "chars": stats["chars"],
+        "chunks": stats["chunks"],
+        "concurrency": concurrency,
+        "ttfa_s": round(first_audio, 4),
+        "total_s": round(total, 4),
+        "chars_per_s": round(stats["chars"] / total, 1),
+        "audio_min_per_min": round(stats["seconds"] / total, 2),
+        "peak_heap_mb": round(peak / 1e6, 2),
+        "connections": network["connections"],
+        "connect_p50_ms": round(network["connect_p50_s"] * 1000, 2),
+        "retry_rate": round(network["retry_rate"], 4),
+        "throttled": network["throttled"],
+    }
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {(r["chars"], r["concurrency"]): r for r in json.load(f)["results"]}
+    print(f"\nvs {baseline_path} (ratio new/old, lower is better for time):")
+    for result in results:
+        old = baseline.get((result["chars"], result["concurrency"]))
+        if old:
+            print(
+                f"{result['chars']:>9} c={result['concurrency']:<3}"
+                f" ttfa {result['ttfa_s'] / old['ttfa_s']:.2f}x"
+                f"  total {result['total_s'] / old['total_s']:.2f}x"
+                f"  heap {result['peak_heap_mb'] / max(old['peak_heap_mb'], 1e-9):.2f}x"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2_000, 20_000, 200_000])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--latency", type=float, default=0.25)
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--realtime-factor", type=float, default=0.005)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--max-connections", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--port", type=int, default=8901)
+    parser.add_argument("--out", help="JSON results file (default: benchmarks/results/pipeline-<time>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    mock, url = start_mock(args)
+    use_endpoint(url)
+    results = []
+    try:
+        print(f"{'chars':>9} {'conc':>5} {'chunks':>7} {'ttfa s':>8} {'total s':>8}"
+              f" {'chars/s':>9} {'aud min/min':>11} {'heap MB':>8} {'conns':>6} {'retry %':>8}")
+        for size in args.sizes:
+            for concurrency in args.concurrency:
+                with tempfile.TemporaryDirectory() as work:
+                    source = os.path.join(work, "doc.txt")
+                    make_document(source, size)
+                    result = asyncio.run(run_case(source, concurrency, work))
+                results.append(result)
+                print(f"{result['chars']:>9} {concurrency:>5} {result['chunks']:>7}"
+                      f" {result['ttfa_s']:>8.3f} {result['total_s']:>8.3f}"
+                      f" {result['chars_per_s']:>9.0f} {result['audio_min_per_min']:>11.1f}"
+                      f" {result['peak_heap_mb']:>8.2f} {result['connections']:>6}"
+                      f" {result['retry_rate']:>8.1%}")
+    finally:
+        mock.terminate()
+        mock.wait()
+
+    out = args.out or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "results",
+        time.strftime("pipeline-%Y%m%d-%H%M%S.json"),
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    meta = {key: getattr(args, key) for key in
+            ("latency", "jitter", "realtime_factor", "failure_rate", "max_connections", "seed")}
+    meta.update(python=platform.python_version(), machine=platform.machine(),
+                cpus=os.cpu_count(), timestamp=time.strftime("%Y-%m-%dT%H:%M:%S"))
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump({"meta": meta, "results": results}, f, indent=2)
+    print(f"\nResults written to {out}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Time and peak heap of levelling and trimming joined chunks.
+
+Writes synthetic speech-like chunks (bursts of noise at a different level
+per chunk, with 0.3-1.5 s of silence at both ends) as 24 kHz WAV files and
+runs the same work two ways: tts.postprocess (NumPy, block by block) and
+pydub AudioSegment operations (load, detect_leading_silence, slice,
+apply_gain, append with crossfade, export). WAV keeps ffmpeg out of the
+measurement. Heap is measured with tracemalloc.
+
+Usage: python benchmarks/bench_postprocess.py [minutes ...]
+"""
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+import wave
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from tts.postprocess import (  # noqa: E402
+    MAX_SILENCE,
+    PEAK_CEILING_DB,
+    SILENCE_DB,
+    TARGET_DB,
+    open_encoder,
+    process_chunks,
+)
+
+RATE = 24_000
+CHUNK_SECONDS = 60
+CROSSFADE = 0.02
+
+
+def write_chunk(path, seconds, level_db, rng):
+    """Speech-like bursts between silences, scaled to about ``level_db``."""
+    lead, trail = rng.uniform(0.3, 1.5, 2)
+    samples = np.zeros(int((lead + seconds + trail) * RATE), dtype=np.float32)
+    position = int(lead * RATE)
+    end = int((lead + seconds) * RATE)
+    while position < end:
+        length = min(int(rng.uniform(0.15, 0.4) * RATE), end - position)
+        envelope = np.sin(np.linspace(0, np.pi, length, dtype=np.float32))
+        samples[position:position + length] = rng.standard_normal(length).astype(np.float32) * envelope
+        position += length + int(rng.uniform(0.05, 0.4) * RATE)
+    samples *= 32768 * 10 ** (level_db / 20)
+    with wave.open(path, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(RATE)
+        f.writeframes(np.clip(samples, -32768, 32767).astype("<i2").tobytes())
+
+
+def with_numpy(paths, output):
+    encoder = open_encoder(output, RATE)
+    try:
+        process_chunks(paths, encoder, RATE, crossfade=CROSSFADE)
+    finally:
+        encoder.close()
+
+
+def with_pydub(paths, output):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        from pydub import AudioSegment
+        from pydub.silence import detect_leading_silence
+
+    keep = MAX_SILENCE * 1000
+    combined = None
+    for path in paths:
+        segment = AudioSegment.from_wav(path)
+        lead = detect_leading_silence(segment, SILENCE_DB, 10)
+        trail = detect_leading_silence(segment.reverse(), SILENCE_DB, 10)
+        segment = segment[max(0, lead - keep):len(segment) - max(0, trail - keep)]
+        segment = segment.apply_gain(min(TARGET_DB - segment.dBFS, PEAK_CEILING_DB - segment.max_dBFS))
+        combined = segment if combined is None else combined.append(segment, crossfade=CROSSFADE * 1000)
+    combined.export(output, format="wav")
+
+
+def measure(function, paths, output):
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        function(paths, output)
+        return time.perf_counter() - start, tracemalloc.get_traced_memory()[1] / 1e6
+    finally:
+        tracemalloc.stop()
+
+
+def main(minutes):
+    rng = np.random.default_rng(7)
+    print(f"{'audio min':>9} {'chunks':>6} {'numpy s':>8} {'numpy MB':>9} {'pydub s':>8} {'pydub MB':>9} {'out min':>13}")
+    for length in minutes:
+        with tempfile.TemporaryDirectory() as tmp:
+            paths = []
+            for index in range(max(1, length * 60 // CHUNK_SECONDS)):
+                path = os.path.join(tmp, f"{index:05d}.wav")
+                write_chunk(path, CHUNK_SECONDS, rng.uniform(-34, -14), rng)
+                paths.append(path)
+            results = []
+            out_minutes = []
+            for function in (with_numpy, with_pydub):
+                output = os.path.join(tmp, f"{function.__name__}.wav")
+                results.extend(measure(function, paths, output))
+                with wave.open(output, "rb") as f:
+                    out_minutes.append(f"{f.getnframes() / f.getframerate() / 60:.1f}")
+            print(
+                f"{length:>9} {len(paths):>6} {results[0]:>8.2f} {results[1]:>9.1f}"
+                f" {results[2]:>8.2f} {results[3]:>9.1f} {' / '.join(out_minutes):>13}"
+            )
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10, 60])
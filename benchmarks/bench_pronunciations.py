@@ -0,0 +1,61 @@
+"""Compare the compiled pronunciation lexicon with the old str.replace loop.
+
+Usage: python benchmarks/bench_pronunciations.py [entries ...]
+"""
+
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tts.pronounce import apply_pronunciations, compile_lexicon  # noqa: E402
+
+TEXT_WORDS = 200_000
+
+
+def replace_loop(text, pronunciations):
+    for word, pron in pronunciations.items():
+        text = text.replace(word, pron)
+    return text
+
+
+def make_lexicon(entries, rng):
+    words = set()
+    while len(words) < entries:
+        words.add("".join(rng.choices(string.ascii_letters, k=rng.randint(3, 10))))
+    return {word: word.upper() for word in words}
+
+
+def make_text(lexicon, rng):
+    vocabulary = list(lexicon) + ["the", "a", "of", "speech", "text", "audio"] * 50
+    return " ".join(rng.choice(vocabulary) for _ in range(TEXT_WORDS)) + "."
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def main(sizes):
+    rng = random.Random(42)
+    print(f"text: {TEXT_WORDS} words")
+    print(f"{'entries':>8} {'loop (s)':>10} {'compile (s)':>12} {'apply (s)':>10} {'speedup':>8}")
+    for entries in sizes:
+        lexicon = make_lexicon(entries, rng)
+        text = make_text(lexicon, rng)
+        loop = timed(replace_loop, text, lexicon)
+        compile_time = timed(compile_lexicon, lexicon)
+        # Second call hits the content-hash cache and measures the pass alone.
+        apply_time = timed(apply_pronunciations, text, lexicon)
+        print(
+            f"{entries:>8} {loop:>10.3f} {compile_time:>12.3f} {apply_time:>10.3f}"
+            f" {loop / apply_time:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10, 100, 1000, 5000])
@@ -0,0 +1,119 @@
+"""Cold-start and rerun timings of the Streamlit app.
+
+Runs app.py headlessly with streamlit.testing.AppTest in a fresh
+interpreter and reports the first script run (imports included), reruns
+with no input, reruns with a large typed text, and which heavy optional
+libraries ended up imported. Results are written as JSON:
+
+    python benchmarks/bench_startup.py --out before.json
+    python benchmarks/bench_startup.py --compare before.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = [
+    "PyPDF2", "docx", "mammoth", "markdown", "striprtf", "langdetect",
+    "pydub", "edge_tts", "aiohttp",
+]
+
+# Executed in a fresh interpreter so import costs are really paid.
+PROBE = r"""
+import json, statistics, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+streamlit_import = time.perf_counter() - start
+
+def timed(run):
+    start = time.perf_counter()
+    run()
+    return time.perf_counter() - start
+
+at = AppTest.from_file(sys.argv[1], default_timeout=120)
+cold = timed(at.run)
+loaded = [name for name in sys.argv[4:] if name in sys.modules]
+empty = [timed(at.run) for _ in range(int(sys.argv[2]))]
+with open(sys.argv[3], encoding="utf-8") as f:
+    at.text_area[0].input(f.read())
+first_text = timed(at.run)
+with_text = [timed(at.run) for _ in range(int(sys.argv[2]))]
+print(json.dumps({
+    "streamlit_import_s": streamlit_import,
+    "cold_run_s": cold,
+    "rerun_s": statistics.median(empty),
+    "first_text_run_s": first_text,
+    "text_rerun_s": statistics.median(with_text),
+    "heavy_modules_loaded": loaded,
+}))
+"""
+
+
+def make_text(chars):
+    sentence = "The committee met on Tuesday to review chapter {n} of the annual report. "
+    parts, size, n = [], 0, 0
+    while size < chars:
+        parts.append(sentence.format(n=n))
+        size += len(parts[-1])
+        n += 1
+    return "".join(parts)
+
+
+def run_probe(reruns, text):
+    with tempfile.TemporaryDirectory() as work:
+        env = dict(os.environ, TTS_HISTORY_DB=os.path.join(work, "history.db"))
+        text_file = os.path.join(work, "text.txt")
+        with open(text_file, "w", encoding="utf-8") as f:
+            f.write(text)
+        output = subprocess.run(
+            [sys.executable, "-c", PROBE, os.path.join(ROOT, "app.py"), str(reruns), text_file] + HEAVY_MODULES,
+            cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+        ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreters to start")
+    parser.add_argument("--reruns", type=int, default=5, help="reruns measured per interpreter")
+    parser.add_argument("--text-chars", type=int, default=100_000)
+    parser.add_argument("--out", help="JSON results file (default: benchmarks/results/startup-<time>.json)")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    text = make_text(args.text_chars)
+    runs = [run_probe(args.reruns, text) for _ in range(args.runs)]
+    result = {
+        key: round(statistics.median(run[key] for run in runs), 4)
+        for key in ("streamlit_import_s", "cold_run_s", "rerun_s", "first_text_run_s", "text_rerun_s")
+    }
+    result["heavy_modules_loaded"] = runs[-1]["heavy_modules_loaded"]
+    for key, value in result.items():
+        print(f"{key:<22} {value}")
+
+    out = args.out or os.path.join(ROOT, "benchmarks", "results", time.strftime("startup-%Y%m%d-%H%M%S.json"))
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    meta = {"runs": args.runs, "reruns": args.reruns, "text_chars": args.text_chars,
+            "python": platform.python_version(), "cpus": os.cpu_count(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump({"meta": meta, "result": result}, f, indent=2)
+    print(f"\nResults written to {out}")
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            old = json.load(f)["result"]
+        print(f"\nvs {args.compare} (ratio new/old, lower is better):")
+        for key, value in result.items():
+            if isinstance(value, float) and old.get(key):
+                print(f"{key:<22} {value / old[key]:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""Shared fixtures: an offline mock of the TTS service (``tts.mockserver``).
+
+Each mock runs on its own event loop in a daemon thread, so tests can
+drive the client with ``asyncio.run`` and the HTTP API from plain threads.
+"""
+
+import asyncio
+import contextlib
+import threading
+
+import pytest
+
+from tts.mockserver import MockTTSServer
+
+
+@contextlib.contextmanager
+def running_mock(**options):
+    """Yield a started ``MockTTSServer``; its ``url`` is ready to use."""
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    server = MockTTSServer(**options)
+    asyncio.run_coroutine_threadsafe(server.start(), loop).result(10)
+    try:
+        yield server
+    finally:
+        asyncio.run_coroutine_threadsafe(server.stop(), loop).result(10)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(10)
+        loop.close()
+
+
+@pytest.fixture(scope="session")
+def mock_server():
+    with running_mock() as server:
+        yield server
+
+
+@pytest.fixture
+def mock_endpoint(mock_server, monkeypatch):
+    """Route ``tts.client`` requests to the shared mock, with a fresh
+    circuit breaker so one test's failures cannot trip another's."""
+    from tts import client
+
+    monkeypatch.setattr(client, "ENDPOINT", mock_server.url)
+    monkeypatch.setattr(client, "BREAKER", client.CircuitBreaker())
+    return mock_server.url
@@ -0,0 +1,109 @@
+import json
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from conftest import running_mock
+from tts import voices
+from tts.api import ApiServer
+
+
+@pytest.fixture(scope="module")
+def api(tmp_path_factory):
+    """One worker, one unfinished job per client and one queued job in
+    total, synthesizing against a slow mock so jobs stay running a while."""
+    directory = tmp_path_factory.mktemp("api")
+    with running_mock(latency=1.0) as mock, pytest.MonkeyPatch.context() as patch:
+        # Spawned workers read the endpoint from the environment.
+        patch.setenv("TTS_ENDPOINT", mock.url)
+        patch.setattr(voices, "_catalog", voices.VoiceCatalog(voices._read(voices.SNAPSHOT), source="snapshot"))
+        server = ApiServer(
+            port=0, workers=1, client_limit=1, max_queued=1,
+            directory=str(directory / "jobs"),
+            pronunciations=str(directory / "pronunciations.json"),
+            cache_dir=str(directory / "cache"),
+        )
+        try:
+            yield server.url
+        finally:
+            server.shutdown()
+
+
+def request(url, method="GET", payload=None, client="tests", headers=None):
+    """Return (status, headers, body) without raising for error statuses."""
+    data = json.dumps(payload).encode("utf-8") if payload is not None else None
+    headers = {"X-Client-Id": client, **(headers or {})}
+    if data is not None:
+        headers["Content-Type"] = "application/json"
+    req = urllib.request.Request(url, data, headers, method=method)
+    try:
+        with urllib.request.urlopen(req, timeout=60) as response:
+            return response.status, response.headers, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, e.read()
+
+
+def submit(api, text, client):
+    return request(f"{api}/v1/synthesize", "POST", {"text": text, "voice": "en-US-AriaNeural"}, client)
+
+
+def job(api, job_id, wait=30):
+    status, _, body = request(f"{api}/v1/jobs/{job_id}?wait={wait}")
+    assert status == 200
+    return json.loads(body)
+
+
+def test_submit_poll_and_fetch_audio(api):
+    status, headers, body = submit(api, "Hello there. This is a short test.", "first")
+    assert status == 202
+    job_id = json.loads(body)["id"]
+    assert headers["Location"] == f"/v1/jobs/{job_id}"
+
+    assert job(api, job_id)["status"] == "done"
+    status, headers, audio = request(f"{api}/v1/jobs/{job_id}/audio")
+    assert status == 200
+    assert headers["Content-Type"] == "audio/mpeg"
+    assert len(audio) == int(headers["Content-Length"]) > 0
+
+    status, headers, part = request(f"{api}/v1/jobs/{job_id}/audio", headers={"Range": "bytes=0-99"})
+    assert status == 206
+    assert part == audio[:100]
+
+
+def test_admission_answers_429_and_503(api):
+    text = " ".join(f"Sentence number {i} is here." for i in range(60))
+    status, _, body = submit(api, text, "busy")
+    assert status == 202
+    running = json.loads(body)["id"]
+
+    status, headers, _ = submit(api, "One more.", "busy")
+    assert status == 429
+    assert int(headers["Retry-After"]) >= 1
+
+    deadline = time.monotonic() + 30
+    while job(api, running, wait=0)["status"] == "queued":
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+
+    status, _, body = submit(api, "Waiting in line.", "second")
+    assert status == 202
+    queued = json.loads(body)["id"]
+    assert job(api, queued, wait=0)["status"] == "queued"
+
+    status, headers, _ = submit(api, "No room left.", "third")
+    assert status == 503
+    assert int(headers["Retry-After"]) >= 1
+
+    assert job(api, running, wait=60)["status"] == "done"
+    assert job(api, queued, wait=60)["status"] == "done"
+
+
+def test_rejects_bad_wait_values(api):
+    status, _, body = submit(api, "Hi.", "waits")
+    job_id = json.loads(body)["id"]
+    for wait in ("nan", "inf", "soon"):
+        status, _, _ = request(f"{api}/v1/jobs/{job_id}?wait={wait}")
+        assert status == 400
+    assert job(api, job_id)["status"] == "done"
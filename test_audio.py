@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+from tts import mp3, webm
+from tts.client import get_client
+from tts.formats import duration, get_format, join_audio
+from tts.synth import synthesize_chunks
+
+CHUNKS = [
+    "The first chunk is a short greeting.",
+    "The second chunk is quite a bit longer than the first one, so it lasts longer too.",
+    "Third.",
+]
+
+
+def audio_frames(path):
+    """Every MPEG audio frame header in ``path``, without Xing/Info frames."""
+    with open(path, "rb") as f:
+        return [
+            frame for frame, data in mp3._frames(f, *mp3.audio_bounds(f))
+            if not mp3._is_info_frame(frame, data)
+        ]
+
+
+def synthesize(chunks, directory, fmt):
+    directory.mkdir(exist_ok=True)
+    extension = get_format(fmt).extension
+
+    async def run():
+        try:
+            return await synthesize_chunks(
+                chunks, "en-US-AriaNeural", "+0%", lambda i: str(directory / f"{i:05d}.{extension}"), fmt=fmt
+            )
+        finally:
+            await get_client().close()
+
+    return asyncio.run(run())
+
+
+def test_mp3_join_keeps_every_frame(mock_endpoint, tmp_path):
+    paths = synthesize(CHUNKS, tmp_path, "mp3")
+    output = str(tmp_path / "joined.mp3")
+    join_audio(paths, output, "mp3")
+
+    frames = audio_frames(output)
+    assert len(frames) == sum(len(audio_frames(path)) for path in paths)
+    assert {mp3.stream_params(frame) for frame in frames} == {mp3.stream_params(mp3.probe(paths[0]))}
+    assert duration(output, "mp3") == pytest.approx(sum(duration(path, "mp3") for path in paths))
+
+
+def test_mp3_join_rejects_mixed_sample_rates(mock_endpoint, tmp_path):
+    high = synthesize(CHUNKS[:1], tmp_path / "high", "mp3")
+    low = synthesize(CHUNKS[1:2], tmp_path / "low", "mp3-32")
+    with pytest.raises(mp3.IncompatibleStreamsError):
+        mp3.concat_mp3(high + low, str(tmp_path / "mixed.mp3"))
+
+
+def test_webm_join_keeps_every_cluster(mock_endpoint, tmp_path):
+    paths = synthesize(CHUNKS, tmp_path, "opus")
+    output = str(tmp_path / "joined.webm")
+    join_audio(paths, output, "opus")
+
+    joined = webm.parse(output)
+    chunks = [webm.parse(path) for path in paths]
+    assert joined.codec == "A_OPUS"
+    assert len(joined.clusters) == sum(len(chunk.clusters) for chunk in chunks)
+    timecodes = [timecode for timecode, _ in joined.clusters]
+    assert timecodes == sorted(timecodes)
+    expected = sum(chunk.duration_ns for chunk in chunks) / 1e9
+    assert duration(output, "opus") == pytest.approx(expected, abs=0.02)
+
+
+def test_chunk_duration_follows_text_length(mock_endpoint, tmp_path):
+    short, long = synthesize(CHUNKS[:2], tmp_path, "mp3")
+    assert 0 < duration(short, "mp3") < duration(long, "mp3")
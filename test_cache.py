@@ -0,0 +1,47 @@
+import os
+
+from tts.cache import ChunkCache, chunk_key
+
+
+def write(path, size):
+    with open(path, "wb") as f:
+        f.write(b"\0" * size)
+    return str(path)
+
+
+def test_overwrite_keeps_the_size_exact(tmp_path):
+    cache = ChunkCache(str(tmp_path / "cache"), max_bytes=10_000)
+    key = chunk_key("Hello.", "en-US-AriaNeural", "+0%")
+    cache.put(key, write(tmp_path / "a", 100))
+    cache.put(key, write(tmp_path / "b", 300))
+    assert cache.stats()["bytes"] == 300
+    assert ChunkCache(cache.directory).stats()["bytes"] == 300
+
+
+def test_uncounted_lookup_neither_counts_nor_touches(tmp_path):
+    cache = ChunkCache(str(tmp_path / "cache"))
+    key = chunk_key("Hello.", "en-US-AriaNeural", "+0%")
+    cache.put(key, write(tmp_path / "a", 10))
+    path = cache.get(key, count=False)
+    os.utime(path, (1, 1))
+    assert cache.get(key, count=False) == path
+    assert cache.get(chunk_key("Other.", "en-US-AriaNeural", "+0%"), count=False) is None
+    assert os.stat(path).st_mtime == 1
+    assert cache.stats()["hits"] == cache.stats()["misses"] == 0
+
+    assert cache.get(key) == path
+    assert os.stat(path).st_mtime > 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_eviction_drops_least_recently_used(tmp_path):
+    cache = ChunkCache(str(tmp_path / "cache"), max_bytes=1000)
+    keys = [chunk_key(f"Sentence {i}.", "en-US-AriaNeural", "+0%") for i in range(3)]
+    for i, key in enumerate(keys[:2]):
+        cache.put(key, write(tmp_path / str(i), 400))
+        os.utime(cache.get(key, count=False), (i + 1, i + 1))
+    cache.get(keys[0])  # now the most recently used
+    cache.put(keys[2], write(tmp_path / "2", 400))
+    assert cache.get(keys[1], count=False) is None
+    assert cache.get(keys[0], count=False) and cache.get(keys[2], count=False)
+    assert cache.stats()["bytes"] == 800
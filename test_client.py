@@ -0,0 +1,85 @@
+import asyncio
+import time
+
+import pytest
+
+from conftest import running_mock
+from tts import client
+from tts.client import CircuitBreaker, CircuitOpenError, get_client
+from tts.synth import ChunkSynthesisError, synthesize_chunks
+
+
+@pytest.fixture
+def flaky_mock(monkeypatch):
+    """A mock dropping every connection until its ``failure_rate`` is
+    lowered, with retries that do not back off."""
+    with running_mock(failure_rate=1.0) as mock:
+        monkeypatch.setattr(client, "ENDPOINT", mock.url)
+        monkeypatch.setattr(client, "backoff", lambda attempt, error=None: 0.01)
+        yield mock
+
+
+def synthesize(chunks, directory, **options):
+    async def run():
+        try:
+            return await synthesize_chunks(
+                chunks, "en-US-AriaNeural", "+0%", lambda i: str(directory / f"{i:05d}.mp3"), **options
+            )
+        finally:
+            await get_client().close()
+
+    return asyncio.run(run())
+
+
+def test_failed_chunk_is_retried_then_reported(flaky_mock, monkeypatch, tmp_path):
+    monkeypatch.setattr(client, "BREAKER", CircuitBreaker(threshold=10))
+    retries = []
+    with pytest.raises(ChunkSynthesisError) as error:
+        synthesize(["Hello."], tmp_path, retries=3, on_retry=lambda *args: retries.append(args[:2]))
+    assert error.value.index == 0
+    assert retries == [(1, 3), (2, 3)]
+
+    flaky_mock.failure_rate = 0.0
+    assert synthesize(["Hello."], tmp_path) == [str(tmp_path / "00000.mp3")]
+
+
+def test_open_breaker_fails_fast(flaky_mock, monkeypatch, tmp_path):
+    breaker = CircuitBreaker(threshold=2, cooldown=60)
+    monkeypatch.setattr(client, "BREAKER", breaker)
+    with pytest.raises(ChunkSynthesisError):
+        synthesize(["Hello."], tmp_path, retries=2)
+    assert breaker.state == client.OPEN
+
+    connections = flaky_mock.stats["connections"]
+    with pytest.raises(ChunkSynthesisError) as error:
+        synthesize(["Hello again."], tmp_path)
+    assert isinstance(error.value.cause, CircuitOpenError)
+    assert flaky_mock.stats["connections"] == connections
+
+
+def test_breaker_recovers_after_cooldown(flaky_mock, monkeypatch, tmp_path):
+    breaker = CircuitBreaker(threshold=1, cooldown=0.2)
+    monkeypatch.setattr(client, "BREAKER", breaker)
+    with pytest.raises(ChunkSynthesisError):
+        synthesize(["Hello."], tmp_path, retries=1)
+    assert breaker.state == client.OPEN
+
+    flaky_mock.failure_rate = 0.0
+    time.sleep(0.3)
+    # One request is the half-open trial; the others wait for it instead of
+    # failing, and all go through once it closes the breaker.
+    chunks = [f"Sentence number {i}." for i in range(6)]
+    assert len(synthesize(chunks, tmp_path, concurrency=4, retries=1)) == 6
+    assert breaker.state == client.CLOSED
+
+
+def test_cancelled_trial_reopens_the_breaker():
+    breaker = CircuitBreaker(threshold=1, cooldown=0.2)
+    breaker.failure()
+    time.sleep(0.3)
+    assert breaker.check() == 0  # the trial
+    assert breaker.check() > 0  # others wait for it
+    breaker.cancel()
+    assert breaker.state == client.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
@@ -0,0 +1,39 @@
+import asyncio
+
+from tts.jobs import FairLimiter
+
+
+def test_limiter_grants_round_robin_across_owners():
+    async def run():
+        limiter = FairLimiter(max_requests=1, max_voice_requests=1)
+        order = []
+
+        async def request(owner):
+            async with limiter.slot(owner, "en-US-AriaNeural"):
+                order.append(owner)
+                await asyncio.sleep(0.01)
+
+        tasks = [asyncio.ensure_future(request("a")) for _ in range(5)]
+        await asyncio.sleep(0)  # the first holds the slot, the others queue
+        tasks += [asyncio.ensure_future(request("b")) for _ in range(2)]
+        await asyncio.gather(*tasks)
+        assert limiter.in_use == 0 and not limiter.waiting
+        return order
+
+    assert asyncio.run(run()) == ["a", "a", "b", "a", "b", "a", "a"]
+
+
+def test_limiter_grants_a_free_voice_while_another_is_busy():
+    async def run():
+        limiter = FairLimiter(max_requests=4, max_voice_requests=1)
+        await limiter.acquire("a", "en-US-AriaNeural")
+        blocked = asyncio.ensure_future(limiter.acquire("b", "en-US-AriaNeural"))
+        await asyncio.sleep(0)
+        # Waiting for a busy voice must not hold up a request for another one.
+        await asyncio.wait_for(limiter.acquire("c", "te-IN-ShrutiNeural"), 1)
+        assert not blocked.done()
+        limiter.release("en-US-AriaNeural")
+        await asyncio.wait_for(blocked, 1)
+        assert dict(limiter.by_voice) == {"en-US-AriaNeural": 1, "te-IN-ShrutiNeural": 1}
+
+    asyncio.run(run())
@@ -0,0 +1,83 @@
+from tts.chunker import iter_chunks, iter_sentences, split_text_into_chunks
+from tts.incremental import fingerprint, plan_chunks
+from tts.pronounce import Lexicon, apply_pronunciations
+
+TEXT = (
+    "Call me Ishmael. Some years ago, never mind how long precisely, having little or no money "
+    "in my purse, I thought I would sail about a little. \"Is that so?\" she asked. It was! "
+    "Whenever I find myself growing grim about the mouth; whenever it is a damp, drizzly November "
+    "in my soul, I account it high time to get to sea as soon as I can.\n\nA new paragraph starts here. "
+) * 6
+
+
+def size(text):
+    return len(text.encode("utf-8"))
+
+
+def test_chunks_respect_byte_budgets():
+    chunks = split_text_into_chunks(TEXT, max_bytes=200, first_chunk_bytes=60)
+    assert size(chunks[0]) <= 60
+    assert all(size(chunk) <= 200 for chunk in chunks)
+    assert " ".join(chunks).split() == TEXT.split()
+
+
+def test_multibyte_text_is_cut_on_character_boundaries():
+    text = "తెలుగు భాష చాలా అందమైనది " * 40  # no sentence terminator at all
+    chunks = split_text_into_chunks(text, max_bytes=100)
+    assert all(size(chunk) <= 100 for chunk in chunks)
+    assert " ".join(chunks).split() == text.split()
+
+
+def test_long_sentence_prefers_clause_breaks():
+    sentence = "word " * 30 + "then a clause, " + "more " * 5
+    pieces = list(iter_sentences(sentence, max_bytes=180))
+    assert pieces[0].endswith(",")
+
+
+def test_sentences_split_across_pieces():
+    text = 'He said "stop." Then he left. And that was all'
+    pieces = [text[i:i + 3] for i in range(0, len(text), 3)]
+    assert list(iter_sentences(pieces)) == list(iter_sentences(text)) == [
+        'He said "stop."', "Then he left.", "And that was all",
+    ]
+
+
+def test_plan_matches_chunker_without_previous_layout():
+    sentences = list(iter_sentences(TEXT))
+    planned = list(plan_chunks(sentences, max_bytes=200, first_chunk_bytes=60))
+    assert [chunk.text for chunk in planned] == list(iter_chunks(TEXT, 200, 60))
+    assert not any(chunk.reused for chunk in planned)
+
+
+def test_plan_reuses_chunks_around_an_edit():
+    sentences = list(iter_sentences(TEXT))
+    before = list(plan_chunks(sentences, max_bytes=200))
+    edited = list(sentences)
+    middle = len(edited) // 2
+    edited[middle] = edited[middle].replace("a", "the", 1)
+
+    after = list(plan_chunks(edited, [chunk.sentences for chunk in before], max_bytes=200))
+    changed = [chunk for chunk in after if not chunk.reused]
+    assert len(changed) == 1
+    assert fingerprint(edited[middle]) in changed[0].sentences
+    assert {chunk.text for chunk in after if chunk.reused} <= {chunk.text for chunk in before}
+    assert " ".join(chunk.text for chunk in after) == " ".join(edited)
+
+
+def test_lexicon_takes_the_longest_match_once():
+    lexicon = Lexicon({"New": "Nu", "New York": "Noo Yawk", "Nu": "WRONG"})
+    assert lexicon.apply("New York and New Jersey") == "Noo Yawk and Nu Jersey"
+
+
+def test_lexicon_whole_words_and_case():
+    pronunciations = {"SQL": "sequel"}
+    assert apply_pronunciations("SQL, MySQL and sql", pronunciations) == "sequel, MySQL and sql"
+    assert apply_pronunciations("MySQL", pronunciations, whole_words=False) == "Mysequel"
+    assert apply_pronunciations("sql", pronunciations, ignore_case=True) == "sequel"
+
+
+def test_lexicon_whole_words_in_telugu():
+    # Telugu vowel signs are word characters, so a shorter entry must not
+    # match inside a longer word.
+    pronunciations = {"తెలు": "X"}
+    assert apply_pronunciations("తెలుగు తెలు", pronunciations) == "తెలుగు X"
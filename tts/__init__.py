@@ -0,0 +1 @@
+"""Core text-to-speech pipeline shared by the Streamlit app and headless tools."""
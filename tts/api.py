@@ -0,0 +1,723 @@
+"""Local HTTP synthesis API: ``python -m tts serve``.
+
+Other services submit text (a JSON body) or a document (the raw request
+body) to ``POST /v1/synthesize`` and get a job back. They can poll
+``GET /v1/jobs/<id>`` (``?wait=<s>`` long-polls until the job finishes),
+follow ``/v1/jobs/<id>/events`` (one JSON line per change) or fetch
+``/v1/jobs/<id>/audio``. The audio request waits for the job and then
+serves the file with range support. The pronunciation lexicon, the same
+``pronunciations.json`` the app edits, is read and changed under
+``/v1/pronunciations``; each job uses the lexicon as it was when the job
+was submitted.
+
+Jobs run through ``tts.pipeline.convert_document`` in a pool of worker
+processes. Each worker keeps one event loop, so its pooled TTS sockets and
+its chunk cache survive from one job to the next. Jobs that queue up while
+every worker is busy are dispatched in batches: up to ``BATCH_SIZE``
+jobs and ``BATCH_CHARS`` characters per batch, synthesized concurrently on
+one worker. This spreads the per-dispatch overhead that dominates short
+requests, and adds no latency when a worker is idle. Admission is
+bounded. A client with ``CLIENT_LIMIT`` unfinished jobs gets 429, and
+once ``MAX_QUEUED`` jobs are waiting the service answers 503. Both
+responses carry ``Retry-After``. Clients are told apart by their
+``X-Client-Id`` header, or by address when it is missing.
+"""
+
+import asyncio
+import json
+import math
+import multiprocessing
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http.server import ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from tts.cache import DEFAULT_CACHE_DIR, ChunkCache
+from tts.formats import DEFAULT_FORMAT, FORMATS
+from tts.jobs import CANCELLED, DONE, FAILED, JOB_TTL, QUEUED, RUNNING
+from tts.pipeline import SUPPORTED_TYPES, convert_document, load_pronunciations
+from tts.streaming import SWEEP_INTERVAL, StreamRegistry, _StreamHandler
+from tts.synth import DEFAULT_CONCURRENCY
+from tts.voices import DEFAULT_VOICE, get_catalog, speed_map
+
+API_HOST = os.environ.get("TTS_API_HOST", "127.0.0.1")
+API_PORT = int(os.environ.get("TTS_API_PORT", "8780"))
+API_DIR = os.environ.get("TTS_API_DIR", ".tts_api")
+API_WORKERS = int(os.environ.get("TTS_API_WORKERS", str(min(4, os.cpu_count() or 1))))
+MAX_QUEUED = int(os.environ.get("TTS_API_MAX_QUEUED", "256"))
+CLIENT_LIMIT = int(os.environ.get("TTS_API_CLIENT_LIMIT", "8"))
+MAX_BODY = int(os.environ.get("TTS_API_MAX_BODY_MB", "50")) * 1024 * 1024
+PRONUNCIATIONS = os.environ.get("TTS_PRONUNCIATIONS", "pronunciations.json")
+BATCH_SIZE = 8
+BATCH_CHARS = 20_000
+MAX_WAIT = 60  # longest long-poll, in seconds
+EVENT_KEEPALIVE = 15  # seconds between repeated event lines while nothing changes
+_RATE = re.compile(r"[+-]\d{1,3}%$")
+_JOB_PATH = re.compile(r"/v1/jobs/([0-9a-f]{32})(/audio|/events)?$")
+
+# Worker-process state, set up once per process by ``_init_worker``.
+_worker = {}
+
+
+class ApiError(Exception):
+    """A request the service refuses; becomes an HTTP error response."""
+
+    def __init__(self, status, message, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+def _init_worker(events, cache_dir):
+    _worker["events"] = events
+    _worker["loop"] = asyncio.new_event_loop()
+    _worker["cache"] = ChunkCache(cache_dir)
+
+
+def _ready():
+    return os.getpid()
+
+
+def run_batch(batch):
+    """Worker-process entry point: convert every job of ``batch`` at once
+    on the worker's event loop. Returns ``{job id: {"stats": ...}}``, or
+    ``{"error": ...}`` for jobs that failed, so one bad job does not fail
+    the batch."""
+    events = _worker["events"]
+
+    async def convert(job):
+        def progress(done, total, index):
+            events.put((job["id"], done))
+
+        try:
+            stats = await convert_document(
+                job["source"],
+                job["type"],
+                job["output"],
+                job["voice"],
+                job["rate"],
+                job["work_dir"],
+                pronunciations=job["pronunciations"],
+                concurrency=job["concurrency"],
+                cache=_worker["cache"],
+                on_progress=progress,
+                auto_voice=job["auto_voice"],
+                timing=job["timing"],
+                fmt=job["format"],
+                pdf_workers=job["pdf_workers"],
+            )
+        except Exception as e:
+            shutil.rmtree(job["work_dir"], ignore_errors=True)
+            return {"error": str(e) or type(e).__name__}
+        return {"stats": stats}
+
+    async def convert_all():
+        results = await asyncio.gather(*(convert(job) for job in batch))
+        return {job["id"]: result for job, result in zip(batch, results)}
+
+    return _worker["loop"].run_until_complete(convert_all())
+
+
+class PronunciationStore:
+    """The lexicon file, shared with the app; writes are atomic."""
+
+    def __init__(self, path=PRONUNCIATIONS):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            return load_pronunciations(self.path)
+
+    def replace(self, entries):
+        with self._lock:
+            self._write(self._validate(entries))
+            return entries
+
+    def update(self, changes):
+        """Merge ``changes``; a null value removes the word."""
+        if not isinstance(changes, dict):
+            raise ApiError(400, "Expected a JSON object of word: pronunciation")
+        with self._lock:
+            entries = load_pronunciations(self.path)
+            for word, pronunciation in changes.items():
+                if pronunciation is None:
+                    entries.pop(word, None)
+                else:
+                    entries[word] = pronunciation
+            self._write(self._validate(entries))
+            return entries
+
+    def _validate(self, entries):
+        if not isinstance(entries, dict) or not all(
+            isinstance(word, str) and word and isinstance(pronunciation, str)
+            for word, pronunciation in entries.items()
+        ):
+            raise ApiError(400, "Expected a JSON object of word: pronunciation strings")
+        return entries
+
+    def _write(self, entries):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, temp = tempfile.mkstemp(dir=directory, prefix=".tmp-pron-")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(entries, f, ensure_ascii=False, indent=4)
+            os.replace(temp, self.path)
+        except BaseException:
+            if os.path.exists(temp):
+                os.remove(temp)
+            raise
+
+
+class ApiJob:
+    def __init__(self, job_id, client, spec, chars):
+        self.id = job_id
+        self.client = client
+        self.spec = spec
+        self.chars = chars
+        self.status = QUEUED
+        self.done = 0
+        self.error = None
+        self.stats = None
+        self.stream = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.version = 0  # bumped on every change, for event streams
+
+    @property
+    def active(self):
+        return self.status in (QUEUED, RUNNING)
+
+    def to_dict(self, position=None):
+        data = {
+            "id": self.id,
+            "status": self.status,
+            "chunks_done": self.done,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "format": self.spec["format"],
+        }
+        if position is not None:
+            data["queue_position"] = position
+        if self.status == DONE:
+            data["audio"] = f"/v1/jobs/{self.id}/audio"
+            data["stats"] = {field: self.stats.get(field) for field in ("chars", "chunks", "seconds", "voices")}
+        if self.error:
+            data["error"] = self.error
+        return data
+
+
+class SynthesisService:
+    """Admission, batching and bookkeeping for jobs run in worker processes."""
+
+    def __init__(self, workers=API_WORKERS, directory=API_DIR, max_queued=MAX_QUEUED,
+                 client_limit=CLIENT_LIMIT, batch_size=BATCH_SIZE, batch_chars=BATCH_CHARS,
+                 pronunciations=PRONUNCIATIONS, ttl=JOB_TTL, cache_dir=DEFAULT_CACHE_DIR):
+        self.workers = workers
+        self.directory = directory
+        self.max_queued = max_queued
+        self.client_limit = client_limit
+        self.batch_size = batch_size
+        self.batch_chars = batch_chars
+        self.ttl = ttl
+        self.cache_dir = cache_dir
+        self.lexicon = PronunciationStore(pronunciations)
+        self.registry = StreamRegistry(os.path.join(directory, "streams"), ttl)
+        self.jobs = {}
+        self.pending = deque()
+        self.running = 0  # batches in flight
+        self.active = Counter()  # unfinished jobs per client
+        self.batches = Counter()  # batch sizes dispatched, for /v1/health
+        self.job_seconds = 5.0  # moving average, for Retry-After
+        self._cond = threading.Condition()
+        self._stop = False
+        self._restarting = False
+        os.makedirs(directory, exist_ok=True)
+        # spawn, not fork: a pool may be replaced while the HTTP, dispatch
+        # and event threads are running.
+        self._context = multiprocessing.get_context("spawn")
+        self._events = self._context.Queue()
+        self._pool = self._start_pool()
+        self._threads = [
+            threading.Thread(target=target, daemon=True)
+            for target in (self._dispatch, self._read_events, self._sweep_periodically)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _start_pool(self):
+        pool = ProcessPoolExecutor(
+            self.workers, mp_context=self._context, initializer=_init_worker, initargs=(self._events, self.cache_dir)
+        )
+        pool.submit(_ready).result()
+        return pool
+
+    def _restart_pool(self, broken):
+        # Every batch in flight on a broken pool fails; only the first one
+        # replaces it. Dispatch waits meanwhile, and requests keep being served.
+        with self._cond:
+            if self._pool is not broken or self._restarting or self._stop:
+                return
+            self._restarting = True
+        try:
+            pool = self._start_pool()
+        except Exception:
+            pool = broken  # submissions keep failing until the next restart
+        with self._cond:
+            self._pool = pool
+            self._restarting = False
+            self._cond.notify_all()
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    # Admission
+
+    def submit(self, client, data, file_type, settings):
+        """Queue ``data`` (bytes of a ``file_type`` document) for synthesis."""
+        spec = self._settings(settings)
+        if file_type not in SUPPORTED_TYPES:
+            raise ApiError(415, f"Unsupported document type {file_type!r}; use one of {', '.join(SUPPORTED_TYPES)}")
+        if not data.strip():
+            raise ApiError(400, "Nothing to synthesize")
+        self._admit(client)
+        job_id = uuid.uuid4().hex
+        job_dir = os.path.join(self.directory, job_id)
+        os.makedirs(job_dir)
+        source = os.path.join(job_dir, f"source.{file_type}")
+        with open(source, "wb") as f:
+            f.write(data)
+        spec.update(
+            id=job_id,
+            source=source,
+            type=file_type,
+            output=os.path.join(job_dir, f"speech.{FORMATS[spec['format']].extension}"),
+            work_dir=os.path.join(job_dir, "work"),
+            pronunciations=self.lexicon.get(),
+        )
+        # Text length for batching; other documents are assumed to be big.
+        chars = len(data) if file_type == "txt" else self.batch_chars
+        job = ApiJob(job_id, client, spec, chars)
+        with self._cond:
+            try:
+                self._admit(client)
+            except ApiError:
+                shutil.rmtree(job_dir, ignore_errors=True)
+                raise
+            self.jobs[job_id] = job
+            self.pending.append(job)
+            self.active[client] += 1
+            self._cond.notify_all()
+        return job
+
+    def _settings(self, settings):
+        voice = settings.get("voice") or DEFAULT_VOICE
+        if voice not in get_catalog():
+            raise ApiError(400, f"Unknown voice {voice!r}; see /v1/voices")
+        rate = speed_map.get(settings.get("rate") or "Normal", settings.get("rate"))
+        if not isinstance(rate, str) or not _RATE.match(rate):
+            raise ApiError(400, "rate must be Fast, Normal, Slow or a percentage such as +10%")
+        fmt = settings.get("format") or DEFAULT_FORMAT
+        if fmt not in FORMATS:
+            raise ApiError(400, f"Unknown format {fmt!r}; use one of {', '.join(FORMATS)}")
+        return {
+            "voice": voice,
+            "rate": rate,
+            "format": fmt,
+            "auto_voice": _flag(settings.get("auto_voice")),
+            "timing": _flag(settings.get("timing")),
+            "concurrency": DEFAULT_CONCURRENCY,
+            "pdf_workers": max(1, (os.cpu_count() or 1) // self.workers),
+        }
+
+    def _admit(self, client):
+        with self._cond:
+            if self.active[client] >= self.client_limit:
+                raise ApiError(
+                    429, f"At most {self.client_limit} unfinished jobs per client", self._retry_after(1)
+                )
+            if len(self.pending) >= self.max_queued:
+                raise ApiError(503, "The synthesis queue is full", self._retry_after(len(self.pending)))
+
+    def _retry_after(self, jobs_ahead):
+        return max(1, round(self.job_seconds * jobs_ahead / self.workers))
+
+    # Dispatch
+
+    def _dispatch(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: self._stop or (self.pending and self.running < self.workers and not self._restarting)
+                )
+                if self._stop:
+                    return
+                pool = self._pool
+                batch = self._take_batch()
+                self.running += 1
+                self.batches[len(batch)] += 1
+                now = time.time()
+                for job in batch:
+                    job.status = RUNNING
+                    job.started = now
+                    job.version += 1
+                self._cond.notify_all()
+            try:
+                future = pool.submit(run_batch, [job.spec for job in batch])
+            except (BrokenProcessPool, RuntimeError) as e:
+                self._finish_batch(batch, pool, error=e)
+                continue
+            future.add_done_callback(lambda future, batch=batch, pool=pool: self._finish_batch(batch, pool, future))
+
+    def _take_batch(self):
+        # Split what is queued evenly over the idle workers, so a burst of
+        # jobs does not all land on the first one.
+        limit = min(self.batch_size, -(-len(self.pending) // (self.workers - self.running)))
+        batch = [self.pending.popleft()]
+        chars = batch[0].chars
+        skipped = []
+        while self.pending and len(batch) < limit:
+            job = self.pending.popleft()
+            if chars + job.chars <= self.batch_chars:
+                batch.append(job)
+                chars += job.chars
+            else:
+                skipped.append(job)
+        self.pending.extendleft(reversed(skipped))
+        return batch
+
+    def _finish_batch(self, batch, pool, future=None, error=None):
+        results = {}
+        if future is not None:
+            try:
+                results = future.result()
+            except Exception as e:
+                error = e
+        if isinstance(error, BrokenProcessPool):
+            self._restart_pool(pool)
+        now = time.time()
+        finished = []
+        for job in batch:
+            result = results.get(job.id) or {"error": f"Worker failed: {error}"}
+            if "stats" in result:
+                # Registering the file is the slow part; do it outside the lock.
+                try:
+                    stream = self.registry.add(job.spec["output"], job.spec["format"])
+                except Exception as e:
+                    finished.append((job, None, f"Output could not be served: {e}"))
+                else:
+                    finished.append((job, result["stats"], stream))
+            else:
+                finished.append((job, None, result["error"]))
+        with self._cond:
+            for job, stats, outcome in finished:
+                if stats is not None:
+                    job.status, job.stats, job.stream = DONE, stats, outcome
+                else:
+                    job.status, job.error = FAILED, outcome
+                job.finished = now
+                job.version += 1
+                self.active[job.client] -= 1
+                if not self.active[job.client]:
+                    del self.active[job.client]
+                self.job_seconds = 0.8 * self.job_seconds + 0.2 * (now - job.started)
+            self.running -= 1
+            self._cond.notify_all()
+
+    def _read_events(self):
+        while True:
+            event = self._events.get()
+            if event is None:
+                return
+            job_id, done = event
+            with self._cond:
+                job = self.jobs.get(job_id)
+                if job and job.status == RUNNING and done > job.done:
+                    job.done = done
+                    job.version += 1
+                    self._cond.notify_all()
+
+    # Queries
+
+    def get(self, job_id):
+        with self._cond:
+            return self.jobs.get(job_id)
+
+    def describe(self, job):
+        with self._cond:
+            position = None
+            if job.status == QUEUED:
+                position = next((i for i, queued in enumerate(self.pending) if queued is job), None)
+            return job.to_dict(position)
+
+    def wait(self, job, timeout, version=None):
+        """Block until ``job`` has finished (or changed since ``version``)
+        or ``timeout`` seconds passed; returns its current version."""
+        with self._cond:
+            self._cond.wait_for(
+                lambda: not job.active or (version is not None and job.version != version),
+                timeout,
+            )
+            return job.version
+
+    def cancel(self, job):
+        with self._cond:
+            if job.status != QUEUED:
+                raise ApiError(409, f"Only queued jobs can be cancelled; this one is {job.status}")
+            self.pending.remove(job)
+            job.status = CANCELLED
+            job.finished = time.time()
+            job.version += 1
+            self.active[job.client] -= 1
+            if not self.active[job.client]:
+                del self.active[job.client]
+            self._cond.notify_all()
+        shutil.rmtree(os.path.join(self.directory, job.id), ignore_errors=True)
+
+    def health(self):
+        with self._cond:
+            return {
+                "workers": self.workers,
+                "running_batches": self.running,
+                "queued": len(self.pending),
+                "max_queued": self.max_queued,
+                "clients": len(self.active),
+                "jobs": Counter(job.status for job in self.jobs.values()),
+                "batch_sizes": {str(size): count for size, count in sorted(self.batches.items())},
+            }
+
+    # Cleanup
+
+    def sweep(self):
+        """Forget finished jobs older than the TTL and delete their files."""
+        cutoff = time.time() - self.ttl
+        with self._cond:
+            expired = [job for job in self.jobs.values() if not job.active and job.finished < cutoff]
+            for job in expired:
+                del self.jobs[job.id]
+        for job in expired:
+            shutil.rmtree(os.path.join(self.directory, job.id), ignore_errors=True)
+        self.registry.sweep()
+
+    def _sweep_periodically(self):
+        while True:
+            with self._cond:
+                if self._cond.wait_for(lambda: self._stop, SWEEP_INTERVAL):
+                    return
+            self.sweep()
+
+    def shutdown(self):
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        self._pool.shutdown(cancel_futures=True)
+        self._events.put(None)
+        for thread in self._threads:
+            thread.join(5)
+
+
+def _flag(value):
+    if isinstance(value, str):
+        return value.lower() in ("1", "true", "yes", "on")
+    return bool(value)
+
+
+class _ApiHandler(_StreamHandler):
+    """Routes ``/v1/...``; audio goes through ``_StreamHandler._send_file``."""
+
+    service = None
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self._route("GET")
+
+    def do_HEAD(self):
+        self._route("HEAD")
+
+    def do_POST(self):
+        self._route("POST")
+
+    def do_PUT(self):
+        self._route("PUT")
+
+    def do_PATCH(self):
+        self._route("PATCH")
+
+    def do_DELETE(self):
+        self._route("DELETE")
+
+    def _route(self, method):
+        self._body_read = False
+        url = urlsplit(self.path)
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        try:
+            self._handle(method, url.path.rstrip("/"), query)
+        except ApiError as e:
+            headers = [("Retry-After", str(e.retry_after))] if e.retry_after else []
+            if not self._body_read and self.headers.get("Content-Length", "0") != "0":
+                self.close_connection = True  # the unread body would be taken for the next request
+            self._send_json(e.status, {"error": str(e)}, headers)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+    def _handle(self, method, path, query):
+        service = self.service
+        if path == "/v1/synthesize" and method == "POST":
+            self._submit(query)
+        elif path == "/v1/pronunciations":
+            if method in ("GET", "HEAD"):
+                self._send_json(200, service.lexicon.get())
+            elif method == "PUT":
+                self._send_json(200, service.lexicon.replace(self._read_json()))
+            elif method == "PATCH":
+                self._send_json(200, service.lexicon.update(self._read_json()))
+            else:
+                raise ApiError(405, "Use GET, PUT or PATCH")
+        elif path == "/v1/voices" and method in ("GET", "HEAD"):
+            voices = get_catalog().find(query.get("locale"), query.get("language"), query.get("gender"))
+            self._send_json(200, [{"name": v.name, "locale": v.locale, "gender": v.gender} for v in voices])
+        elif path == "/v1/health" and method in ("GET", "HEAD"):
+            self._send_json(200, service.health())
+        else:
+            match = _JOB_PATH.match(path)
+            job = service.get(match.group(1)) if match else None
+            if job is None:
+                raise ApiError(404, "No such job")
+            if match.group(2) == "/audio" and method in ("GET", "HEAD"):
+                self._audio(job, query, method == "GET")
+            elif match.group(2) == "/events" and method == "GET":
+                self._events(job)
+            elif match.group(2) is None and method in ("GET", "HEAD"):
+                if "wait" in query:
+                    service.wait(job, _seconds(query["wait"]))
+                self._send_json(200, service.describe(job))
+            elif match.group(2) is None and method == "DELETE":
+                service.cancel(job)
+                self._send_json(200, service.describe(job))
+            else:
+                raise ApiError(405, "Method not allowed")
+
+    def _submit(self, query):
+        content_type = self.headers.get("Content-Type", "").split(";")[0].strip()
+        if content_type == "application/json":
+            request = self._read_json()
+            if not isinstance(request, dict) or not isinstance(request.get("text"), str):
+                raise ApiError(400, 'Expected {"text": ..., "voice": ..., "rate": ..., "format": ...}')
+            data, file_type, settings = request["text"].encode("utf-8"), "txt", request
+        else:
+            file_type = (query.get("type") or query.get("filename", "").rsplit(".", 1)[-1] or "txt").lower()
+            data, settings = self._read_body(), query
+        job = self.service.submit(self._client(), data, file_type, settings)
+        self._send_json(202, self.service.describe(job), [("Location", f"/v1/jobs/{job.id}")])
+
+    def _audio(self, job, query, body):
+        self.service.wait(job, _seconds(query.get("wait", MAX_WAIT)))
+        if job.status == DONE:
+            download = [query["download"]] if "download" in query else None
+            self._send_file(job.stream, download, body)
+        elif job.status == FAILED:
+            raise ApiError(500, f"Synthesis failed: {job.error}")
+        elif job.status == CANCELLED:
+            raise ApiError(410, "The job was cancelled")
+        else:
+            self._send_json(202, self.service.describe(job), [("Retry-After", "1")])
+
+    def _events(self, job):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Cache-Control", "no-store")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+        version = job.version
+        while True:
+            self.wfile.write(json.dumps(self.service.describe(job)).encode("utf-8") + b"\n")
+            self.wfile.flush()
+            if not job.active:
+                return
+            version = self.service.wait(job, EVENT_KEEPALIVE, version)
+
+    def _client(self):
+        return self.headers.get("X-Client-Id") or self.client_address[0]
+
+    def _read_body(self):
+        length = self.headers.get("Content-Length")
+        if length is None:
+            raise ApiError(411, "Content-Length is required")
+        if not length.strip().isdigit():
+            raise ApiError(400, "Content-Length must be a non-negative integer")
+        length = int(length)
+        if length > MAX_BODY:
+            raise ApiError(413, f"Request bodies are limited to {MAX_BODY // (1024 * 1024)} MB")
+        self._body_read = True
+        return self.rfile.read(length)
+
+    def _read_json(self):
+        try:
+            return json.loads(self._read_body())
+        except ValueError:
+            raise ApiError(400, "The request body is not valid JSON") from None
+
+    def _send_json(self, status, payload, headers=()):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for header in headers:
+            self.send_header(*header)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(data)
+
+
+def _seconds(value):
+    try:
+        seconds = float(value)
+    except ValueError:
+        seconds = math.nan
+    # NaN would slip through min/max and make the wait unbounded.
+    if not math.isfinite(seconds):
+        raise ApiError(400, "wait must be a number of seconds")
+    return min(max(seconds, 0.0), MAX_WAIT)
+
+
+class _ApiHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+
+class ApiServer:
+    """``SynthesisService`` behind a threaded HTTP server, in a background
+    thread; ``serve_forever`` blocks until interrupted."""
+
+    def __init__(self, host=API_HOST, port=API_PORT, **service_options):
+        self.service = SynthesisService(**service_options)
+        handler = type(
+            "ApiHandler", (_ApiHandler,), {"service": self.service, "registry": self.service.registry}
+        )
+        self.httpd = _ApiHTTPServer((host, port), handler)
+        self.url = f"http://{host}:{self.httpd.server_address[1]}"
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+    def serve_forever(self):
+        try:
+            while self._thread.is_alive():
+                self._thread.join(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.service.shutdown()
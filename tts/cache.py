@@ -0,0 +1,138 @@
+"""Content-addressed on-disk cache for synthesized audio chunks."""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+DEFAULT_CACHE_DIR = os.environ.get("TTS_CACHE_DIR", ".tts_cache")
+DEFAULT_MAX_BYTES = int(os.environ.get("TTS_CACHE_MAX_MB", "512")) * 1024 * 1024
+EVICT_TO = 0.9
+
+
+def chunk_key(text, voice, rate, fmt="mp3"):
+    payload = json.dumps([text, voice, rate, fmt], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ChunkCache:
+    """Size-bounded LRU store of audio files keyed by ``chunk_key()``.
+
+    Entries are written to a temp file and renamed into place, so readers in
+    other threads or processes never see a partial file. Recency is tracked
+    through the file mtime, which lets several processes share one directory.
+    """
+
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._size = sum(size for _, size, _ in self._entries())
+
+    def _path(self, key, fmt):
+        return os.path.join(self.directory, key[:2], f"{key}.{fmt}")
+
+    def _entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.startswith("."):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def record(self, hit):
+        """Count one hit or miss, for lookups made with ``count=False`` that
+        only succeed once several entries were found."""
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _touch(self, path, count):
+        # Refreshes the entry's LRU recency; False if it is not cached.
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            if count:
+                self.record(False)
+            return False
+        if count:
+            self.record(True)
+        return True
+
+    def get(self, key, fmt="mp3", count=True):
+        """Return the cached file path for ``key`` or None. A counted lookup
+        is a hit or miss and marks the entry as recently used; with
+        ``count`` False (e.g. to show what is cached) it only checks."""
+        path = self._path(key, fmt)
+        if count:
+            return path if self._touch(path, count) else None
+        return path if os.path.exists(path) else None
+
+    def fetch(self, key, output_file, fmt="mp3", count=True):
+        """Copy a cached entry to ``output_file``; returns False on a miss.
+        The entry is marked as recently used either way, but only counted
+        as a hit or miss with ``count`` (False for a sidecar of a counted
+        entry)."""
+        path = self._path(key, fmt)
+        if not self._touch(path, count):
+            return False
+        try:
+            shutil.copyfile(path, output_file)
+        except FileNotFoundError:
+            # Evicted by another process between get() and the copy.
+            return False
+        return True
+
+    def put(self, key, source_file, fmt="mp3"):
+        path = self._path(key, fmt)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as out, open(source_file, "rb") as src:
+                shutil.copyfileobj(src, out)
+            try:
+                replaced = os.path.getsize(path)  # an existing entry is overwritten
+            except FileNotFoundError:
+                replaced = 0
+            os.replace(temp, path)
+        except BaseException:
+            if os.path.exists(temp):
+                os.remove(temp)
+            raise
+        with self._lock:
+            self._size += os.path.getsize(path) - replaced
+            over_budget = self._size > self.max_bytes
+        if over_budget:
+            self.evict()
+
+    def evict(self):
+        """Drop least recently used entries until the cache is back under its
+        low-water mark, so a full cache does not rescan on every put."""
+        target = self.max_bytes * EVICT_TO
+        with self._lock:
+            entries = sorted(self._entries(), key=lambda entry: entry[2])
+            size = sum(entry[1] for entry in entries)
+            for path, entry_size, _ in entries:
+                if size <= target:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                size -= entry_size
+            self._size = size
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "bytes": self._size}
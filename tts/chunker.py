@@ -0,0 +1,121 @@
+"""Streaming sentence splitter and chunker with a UTF-8 byte budget."""
+
+import re
+
+# Edge-TTS sends at most 4096 bytes of text per request.
+DEFAULT_MAX_BYTES = 4096
+# A small first chunk keeps time-to-first-audio short in progressive mode.
+FIRST_CHUNK_BYTES = 300
+
+# Sentence terminators (Latin plus the Devanagari danda/double danda used in
+# Indic text), optional closing quotes/brackets, then whitespace; or a blank line.
+SENTENCE_END = re.compile(r"[.!?।॥]+[\"'”’)\]]*\s+|\n\s*\n")
+CLAUSE_END = re.compile(r"[,;:–—]\s")
+# How far back to rescan when new input arrives, so a terminator and its
+# trailing quotes split across two pieces are still found.
+LOOKBACK = 16
+
+
+def _hard_split(sentence, max_bytes, keep_rest=False):
+    """Split an oversized sentence into pieces of at most ``max_bytes``.
+
+    Cuts at the last clause break in a window, else the last whitespace,
+    else at a character boundary. Works on the encoded bytes with a moving
+    offset, so each byte is encoded and decoded a bounded number of times.
+    With ``keep_rest`` the final piece is returned unstripped instead of
+    yielded, so it can be continued by further input.
+    """
+    data = sentence.encode("utf-8")
+    pos = 0
+    while len(data) - pos > max_bytes:
+        # Dropping a trailing partial character keeps the window valid UTF-8.
+        window = data[pos:pos + max_bytes].decode("utf-8", errors="ignore")
+        cut = 0
+        for match in CLAUSE_END.finditer(window, len(window) // 2):
+            cut = match.end()
+        if not cut:
+            space = max(window.rfind(" "), window.rfind("\n"))
+            cut = space + 1 if space > 0 else len(window)
+        piece = window[:cut]
+        pos += len(piece.encode("utf-8"))
+        if piece.strip():
+            yield piece.strip()
+    rest = data[pos:].decode("utf-8")
+    if keep_rest:
+        return rest
+    if rest.strip():
+        yield rest.strip()
+
+
+def iter_sentences(pieces, max_bytes=DEFAULT_MAX_BYTES):
+    """Yield sentences from a string or an iterable of text pieces.
+
+    Only the unfinished tail of the input is kept between pieces, and a tail
+    that grows past ``max_bytes`` without a terminator is hard-split, so
+    memory stays bounded. No sentence yielded is longer than ``max_bytes``.
+    """
+    if isinstance(pieces, str):
+        pieces = (pieces,)
+    tail = ""
+    for piece in pieces:
+        scan_from = max(0, len(tail) - LOOKBACK)
+        tail += piece
+        start = 0
+        for match in SENTENCE_END.finditer(tail, scan_from):
+            sentence = tail[start:match.end()].strip()
+            start = match.end()
+            if sentence:
+                yield from _hard_split(sentence, max_bytes)
+        tail = tail[start:]
+        if len(tail) > max_bytes:
+            tail = yield from _hard_split(tail, max_bytes, keep_rest=True)
+    tail = tail.strip()
+    if tail:
+        yield from _hard_split(tail, max_bytes)
+
+
+def iter_prepared_sentences(pieces, max_bytes=DEFAULT_MAX_BYTES, transform=None):
+    """Sentences of ``pieces`` after ``transform`` (e.g. pronunciations and
+    cleaning); sentences the transform empties are dropped."""
+    for sentence in iter_sentences(pieces, max_bytes):
+        if transform:
+            sentence = transform(sentence).strip()
+            if not sentence:
+                continue
+        yield sentence
+
+
+def pack_sentences(sentences, max_bytes=DEFAULT_MAX_BYTES, first_chunk_bytes=None):
+    """Greedily group sentences into lists of at most ``max_bytes`` UTF-8
+    bytes once joined with spaces; ``first_chunk_bytes`` caps the first."""
+    limit = first_chunk_bytes or max_bytes
+    parts = []
+    size = 0
+    for sentence in sentences:
+        length = len(sentence.encode("utf-8"))
+        if parts and size + 1 + length > limit:
+            yield parts
+            limit = max_bytes
+            parts = []
+            size = 0
+        size += length + (1 if parts else 0)
+        parts.append(sentence)
+    if parts:
+        yield parts
+
+
+def iter_chunks(pieces, max_bytes=DEFAULT_MAX_BYTES, first_chunk_bytes=None, transform=None):
+    """Lazily pack sentences into chunks of at most ``max_bytes`` UTF-8 bytes.
+
+    ``first_chunk_bytes`` caps only the first chunk, so synthesis of the
+    opening sentence finishes quickly. ``transform`` is applied to each
+    sentence before it is measured (e.g. pronunciations and cleaning), so
+    rewriting never splits a word or overruns the budget of a later chunk.
+    """
+    sentences = iter_prepared_sentences(pieces, max_bytes, transform)
+    for parts in pack_sentences(sentences, max_bytes, first_chunk_bytes):
+        yield " ".join(parts)
+
+
+def split_text_into_chunks(text, max_bytes=DEFAULT_MAX_BYTES, first_chunk_bytes=None):
+    return list(iter_chunks(text, max_bytes, first_chunk_bytes))
@@ -0,0 +1,260 @@
+"""Command-line entry point: ``python -m tts batch <dir>``, ``python -m tts voices`` and ``python -m tts serve``."""
+
+import argparse
+import asyncio
+import hashlib
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from tts.cache import ChunkCache
+from tts.client import get_client
+from tts.formats import DEFAULT_FORMAT, FORMATS, get_format
+from tts.incremental import PlanStore
+from tts.manifest import Manifest
+from tts.pipeline import SUPPORTED_TYPES, convert_document, load_pronunciations
+from tts.pronounce import lexicon_digest
+from tts.synth import DEFAULT_CONCURRENCY
+from tts.trace import TRACE_DIR, Trace
+from tts.voices import load_catalog, speed_map
+
+WORK_DIR = ".tts-work"
+PLAN_DIR = ".tts-plans"
+
+
+def find_documents(root):
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+        for name in sorted(filenames):
+            if name.rsplit(".", 1)[-1].lower() in SUPPORTED_TYPES:
+                yield os.path.join(dirpath, name)
+
+
+def fingerprint(path, settings):
+    """Identifies a source file plus the settings it is converted with."""
+    stat = os.stat(path)
+    payload = f"{stat.st_size}:{stat.st_mtime_ns}:{settings}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def convert_file(job):
+    """Worker-process entry point: convert one document on its own event loop."""
+    cache = ChunkCache() if job["cache"] else None
+    trace = Trace(job_id=job["id"]) if job["trace_dir"] else None
+    start = time.perf_counter()
+
+    async def convert():
+        client = get_client()
+        try:
+            stats = await convert_document(
+                job["source"],
+                job["source"].rsplit(".", 1)[-1].lower(),
+                job["output"],
+                job["voice"],
+                job["rate"],
+                job["work_dir"],
+                pronunciations=job["pronunciations"],
+                concurrency=job["concurrency"],
+                cache=cache,
+                trace=trace,
+                auto_voice=job["auto_voice"],
+                timing=job["timing"],
+                fmt=job["format"],
+                plans=PlanStore(job["plan_dir"]),
+                document=job["id"],
+                pdf_workers=job["pdf_workers"],
+            )
+        finally:
+            await client.close()
+        stats["client"] = client.stats()
+        return stats
+
+    stats = asyncio.run(convert())
+    stats["elapsed"] = time.perf_counter() - start
+    if trace:
+        trace.export(job["trace_dir"])
+    return stats
+
+
+def batch(args):
+    rate = speed_map.get(args.rate, args.rate)
+    pronunciations = load_pronunciations(args.pronunciations)
+    settings = f"{args.voice}|{rate}|{lexicon_digest(pronunciations)}"
+    if args.auto_voice:
+        settings += "|auto-voice"
+    if args.timing:
+        settings += "|timing"
+    if args.format != DEFAULT_FORMAT:
+        settings += f"|{args.format}"
+    extension = get_format(args.format).extension
+    output_dir = args.output or os.path.join(args.directory, "audio")
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = Manifest(os.path.join(output_dir, "manifest.jsonl"))
+
+    jobs = []
+    skipped = 0
+    for source in find_documents(args.directory):
+        if os.path.abspath(source).startswith(os.path.abspath(output_dir) + os.sep):
+            continue
+        relative = os.path.relpath(source, args.directory)
+        output = os.path.join(output_dir, os.path.splitext(relative)[0] + "." + extension)
+        key = fingerprint(source, settings)
+        entry = manifest.get(relative)
+        if entry and entry["fingerprint"] == key and os.path.exists(output):
+            skipped += 1
+            continue
+        jobs.append({
+            "id": relative,
+            "fingerprint": key,
+            "source": source,
+            "output": output,
+            "work_dir": os.path.join(output_dir, WORK_DIR, key[:16]),
+            "voice": args.voice,
+            "rate": rate,
+            "pronunciations": pronunciations,
+            "concurrency": args.concurrency,
+            "cache": not args.no_cache,
+            "trace_dir": args.trace_dir,
+            "auto_voice": args.auto_voice,
+            "timing": args.timing,
+            "format": args.format,
+            "plan_dir": os.path.join(output_dir, PLAN_DIR),
+            # Documents already run in parallel; split the CPUs between them.
+            "pdf_workers": max(1, (os.cpu_count() or 1) // (args.workers or 1)),
+        })
+
+    print(f"{len(jobs)} document(s) to convert, {skipped} already done")
+    totals = {"chars": 0, "seconds": 0.0, "chunks": 0, "reused": 0}
+    reuse = {"chars": 0, "avoided": 0, "avoided_chars": 0, "synthesized": 0}
+    network = {"attempts": 0, "retries": 0, "throttled": 0, "connections": 0, "connect_s": 0.0}
+    failures = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futures = {pool.submit(convert_file, job): job for job in jobs}
+        for done, future in enumerate(as_completed(futures), 1):
+            job = futures[future]
+            try:
+                stats = future.result()
+            except Exception as e:
+                failures += 1
+                print(f"[{done}/{len(jobs)}] {job['id']}: FAILED ({e})", file=sys.stderr)
+                continue
+            manifest.record(
+                job["id"],
+                fingerprint=job["fingerprint"],
+                output=job["output"],
+                chars=stats["chars"],
+                seconds=stats["seconds"],
+            )
+            for field in totals:
+                totals[field] += stats[field]
+            for field in network:
+                network[field] += stats["client"][field]
+            for field in reuse:
+                reuse[field] += stats["reuse"][field]
+            print(
+                f"[{done}/{len(jobs)}] {job['id']}: {stats['chunks']} chunks"
+                f" ({stats['reused']} resumed), {stats['seconds'] / 60:.1f} min audio"
+                f" in {stats['elapsed']:.1f}s"
+            )
+            if stats["reuse"]["unchanged"]:
+                changed = stats["reuse"]["chunks"] - stats["reuse"]["unchanged"]
+                print(f"    incremental: {changed} changed chunk(s), {stats['reuse']['synthesized']} synthesized")
+            if stats.get("voices"):
+                print("    voices: " + ", ".join(f"{v} x{n}" for v, n in stats["voices"].items()))
+    elapsed = time.perf_counter() - start
+
+    if jobs and elapsed > 0:
+        print(
+            f"Converted {len(jobs) - failures} document(s) in {elapsed:.1f}s:"
+            f" {totals['chars'] / elapsed:,.0f} chars/s,"
+            f" {totals['seconds'] / elapsed:.1f} audio min/min,"
+            f" {totals['reused']}/{totals['chunks']} chunks resumed"
+        )
+    if reuse["avoided"]:
+        print(
+            f"Synthesis avoided: {reuse['avoided']} chunk(s), {reuse['avoided_chars']:,} of {reuse['chars']:,} chars"
+            f" ({reuse['avoided_chars'] / reuse['chars']:.0%}) came from earlier conversions;"
+            f" {reuse['synthesized']} chunk(s) synthesized"
+        )
+    if network["attempts"]:
+        print(
+            f"TTS requests: {network['attempts']} over {network['connections']} connection(s)"
+            f" ({network['connect_s'] / max(network['connections'], 1) * 1000:.0f} ms setup each),"
+            f" {network['retries'] / network['attempts']:.1%} retried,"
+            f" {network['throttled']} throttled"
+        )
+    return 1 if failures else 0
+
+
+def voices(args):
+    catalog = load_catalog(refresh=args.refresh)
+    matches = catalog.find(locale=args.locale, language=args.language, gender=args.gender)
+    for voice in matches:
+        print(f"{voice.name:<40} {voice.locale:<16} {voice.gender}")
+    print(f"{len(matches)} of {len(catalog)} voices (from the {catalog.source})", file=sys.stderr)
+    return 0 if matches else 1
+
+
+def serve(args):
+    from tts import api
+
+    # Options left unset fall back to tts.api's defaults (TTS_API_* variables).
+    names = ("host", "port", "workers", "max_queued", "client_limit")
+    options = {name: getattr(args, name) for name in names if getattr(args, name) is not None}
+    server = api.ApiServer(**options)
+    print(f"Synthesis API listening on {server.url} with {server.service.workers} worker(s)", flush=True)
+    server.serve_forever()
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m tts", description=__doc__)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    batch_parser = commands.add_parser("batch", help="convert every document in a directory")
+    batch_parser.add_argument("directory")
+    batch_parser.add_argument("-o", "--output", help="output directory (default: <directory>/audio)")
+    batch_parser.add_argument("--voice", default="en-US-AriaNeural")
+    batch_parser.add_argument("--auto-voice", action="store_true",
+                              help="speak each chunk with a voice matching its language (--voice is the fallback)")
+    batch_parser.add_argument("--timing", action="store_true",
+                              help="also write <name>.timing.json with word start times")
+    batch_parser.add_argument("--format", default=DEFAULT_FORMAT, choices=FORMATS,
+                              help="output format requested from the service (opus is written as .webm)")
+    batch_parser.add_argument("--rate", default="Normal", help="Fast, Normal, Slow or e.g. +10%%")
+    batch_parser.add_argument("--pronunciations", default="pronunciations.json")
+    batch_parser.add_argument("-j", "--workers", type=int, default=os.cpu_count(),
+                              help="documents converted in parallel (processes)")
+    batch_parser.add_argument("-c", "--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                              help="chunk requests in flight per worker")
+    batch_parser.add_argument("--no-cache", action="store_true", help="bypass the chunk cache")
+    batch_parser.add_argument("--trace-dir", default=TRACE_DIR,
+                              help="write per-document timing traces here (JSON lines + Chrome trace)")
+    batch_parser.set_defaults(func=batch)
+
+    voices_parser = commands.add_parser("voices", help="list the available voices")
+    voices_parser.add_argument("--locale", help="e.g. te-IN")
+    voices_parser.add_argument("--language", help="ISO 639-1 code, e.g. te")
+    voices_parser.add_argument("--gender", help="Female or Male")
+    voices_parser.add_argument("--refresh", action="store_true",
+                               help="fetch the list from the service even if the cached copy is fresh")
+    voices_parser.set_defaults(func=voices)
+
+    serve_parser = commands.add_parser("serve", help="run the local HTTP synthesis API")
+    serve_parser.add_argument("--host", help="default: $TTS_API_HOST or 127.0.0.1")
+    serve_parser.add_argument("--port", type=int, help="default: $TTS_API_PORT or 8780")
+    serve_parser.add_argument("-j", "--workers", type=int,
+                              help="worker processes running conversions (default: $TTS_API_WORKERS or up to 4)")
+    serve_parser.add_argument("--max-queued", type=int,
+                              help="jobs allowed to wait before new ones get 503 (default: 256)")
+    serve_parser.add_argument("--client-limit", type=int,
+                              help="unfinished jobs per client before new ones get 429 (default: 8)")
+    serve_parser.set_defaults(func=serve)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
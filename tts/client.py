@@ -0,0 +1,581 @@
+"""Edge-TTS client with pooled connections, backoff and a circuit breaker.
+
+``edge_tts.Communicate`` opens a new websocket (TCP, TLS and HTTP upgrade)
+for every request. The service accepts any number of ``speech.config`` /
+``ssml`` turns on one socket, so ``TTSClient`` keeps idle sockets in a
+small pool and reuses them; a pooled socket the service closed while it
+sat idle is replaced transparently. TLS is verified against certifi's CA
+bundle through one shared ``ssl.SSLContext``. Requests are framed with
+edge-tts helpers that are not part of its public API, which is why
+requirements.txt pins edge-tts to the tested 7.3 series.
+
+Failed requests are retried with exponential backoff and full jitter, so
+chunks that failed together do not retry in lockstep. A throttled
+handshake (HTTP 429) waits at least its ``Retry-After`` and caps the
+client at the sockets the service did accept; further requests queue for
+those, and the cap grows back by one socket per window of successful
+requests. Other consecutive failures open a process-wide
+``CircuitBreaker`` that fails requests fast until a cool-down has passed
+and a trial request succeeds. Connection setup times, reuse and retry
+counts are kept per client (``stats()``).
+"""
+
+import asyncio
+import contextlib
+import functools
+import json
+import os
+import random
+import ssl
+import threading
+import time
+import weakref
+from collections import deque
+from email.utils import parsedate_to_datetime
+
+from tts.formats import DEFAULT_FORMAT, duration, get_format, join_audio
+
+ENDPOINT = os.environ.get("TTS_ENDPOINT")  # None means the Edge service
+POOL_SIZE = int(os.environ.get("TTS_POOL_SIZE", "8"))
+IDLE_TIMEOUT = 30  # seconds a pooled socket is trusted to still be open
+CONNECT_TIMEOUT = 10
+RECEIVE_TIMEOUT = 60
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+BREAKER_THRESHOLD = int(os.environ.get("TTS_BREAKER_THRESHOLD", "5"))
+BREAKER_COOLDOWN = float(os.environ.get("TTS_BREAKER_COOLDOWN", "30"))
+TRIAL_POLL = 0.1  # seconds between looks at a half-open breaker's trial
+TEXT_BYTES = 4096  # escaped text per ssml request, as in edge-tts
+TICKS_PER_SECOND = 10_000_000
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+def use_endpoint(url):
+    """Send synthesis requests to ``url`` instead of the Edge service.
+
+    Used to select the offline mock (``tts.mockserver``).
+    """
+    global ENDPOINT
+    ENDPOINT = url
+
+
+@functools.lru_cache(maxsize=None)
+def ssl_context():
+    """Certificate-verifying context shared by every connection."""
+    import certifi
+
+    return ssl.create_default_context(cafile=certifi.where())
+
+
+def retry_after(headers):
+    """Seconds asked for by a ``Retry-After`` header, or None."""
+    value = headers.get("Retry-After") if headers else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff(attempt, error=None, base=BACKOFF_BASE, cap=BACKOFF_MAX):
+    """Delay before retrying after failed ``attempt`` (0-based): a random
+    point in an exponentially growing window, never shorter than the
+    ``retry_after`` of a throttled response."""
+    delay = random.uniform(0, min(cap, base * 2 ** attempt))
+    wait = getattr(error, "retry_after", None)
+    if wait is not None:
+        delay = max(delay, wait + random.uniform(0, base))
+    return delay
+
+
+class ThrottledError(Exception):
+    """The service refused the connection with HTTP 429."""
+
+    def __init__(self, retry_after=None):
+        super().__init__(
+            "TTS service is throttling requests"
+            + (f" (retry after {retry_after:.0f}s)" if retry_after is not None else "")
+        )
+        self.retry_after = retry_after
+
+    def __reduce__(self):
+        return type(self), (self.retry_after,)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of sending a request while the breaker is open."""
+
+    def __init__(self, retry_in):
+        super().__init__(
+            f"TTS service unavailable after repeated failures; trying again in {retry_in:.0f}s"
+        )
+        self.retry_in = retry_in
+
+    def __reduce__(self):
+        return type(self), (self.retry_in,)
+
+
+class ConnectionLost(Exception):
+    """The socket closed before the turn finished."""
+
+
+class CircuitBreaker:
+    """Fails requests fast after ``threshold`` consecutive failures.
+
+    Once ``cooldown`` seconds have passed a single trial request is let
+    through (half-open) while other requests wait for its outcome; its
+    success closes the breaker, a failure or cancellation opens it for
+    another cool-down.
+    """
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.failures = 0
+        self.trips = 0
+        self.opened = 0.0
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def retry_in(self):
+        """Seconds until requests are let through again (0 when closed)."""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.opened + self.cooldown - time.monotonic())
+
+    def check(self):
+        """Return 0 when a request may be sent now, or the seconds to wait
+        before checking again while a half-open trial is in flight. Raise
+        ``CircuitOpenError`` while the breaker is open."""
+        with self._lock:
+            if self.state == OPEN:
+                wait = self.opened + self.cooldown - time.monotonic()
+                if wait > 0:
+                    raise CircuitOpenError(wait)
+                self.state = HALF_OPEN
+                self._trial = False
+            if self.state == HALF_OPEN:
+                if self._trial:
+                    return TRIAL_POLL
+                self._trial = True
+            return 0.0
+
+    def success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self._trial = False
+
+    def abandon(self):
+        """The request was throttled, which tells nothing about the service's
+        health: let another trial through."""
+        with self._lock:
+            self._trial = False
+
+    def cancel(self):
+        """The request was cancelled. A cancelled trial leaves the breaker
+        open for another cool-down rather than half-open with no trial."""
+        with self._lock:
+            if self.state == HALF_OPEN and self._trial:
+                self.state = OPEN
+                self.opened = time.monotonic()
+                self._trial = False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.threshold):
+                self.state = OPEN
+                self.opened = time.monotonic()
+                self.trips += 1
+                self._trial = False
+
+
+BREAKER = CircuitBreaker()
+
+
+class ClientMetrics:
+    def __init__(self):
+        self.requests = 0  # synthesize() calls
+        self.attempts = 0
+        self.retries = 0
+        self.throttled = 0
+        self.failed = 0  # requests that ran out of retries
+        self.rejected = 0  # failed fast by the open breaker
+        self.connections = 0
+        self.reused = 0
+        self.stale = 0  # pooled sockets the service had closed
+        self.connect_s = 0.0
+        self.connect_times = deque(maxlen=1000)
+
+    def connected(self, seconds):
+        self.connections += 1
+        self.connect_s += seconds
+        self.connect_times.append(seconds)
+
+    def snapshot(self):
+        times = sorted(self.connect_times)
+        sockets = self.connections + self.reused
+        return {
+            "requests": self.requests,
+            "attempts": self.attempts,
+            "retries": self.retries,
+            "retry_rate": self.retries / self.attempts if self.attempts else 0.0,
+            "throttled": self.throttled,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "connections": self.connections,
+            "reused": self.reused,
+            "reuse_rate": self.reused / sockets if sockets else 0.0,
+            "stale": self.stale,
+            "connect_s": self.connect_s,
+            "connect_p50_s": times[len(times) // 2] if times else 0.0,
+            "connect_p95_s": times[min(len(times) - 1, int(len(times) * 0.95))] if times else 0.0,
+        }
+
+
+class _Socket:
+    def __init__(self, ws):
+        self.ws = ws
+        self.config = None  # (boundary type, output format) of the last speech.config
+        self.last_used = time.monotonic()
+        self.reused = False
+
+    async def close(self):
+        with contextlib.suppress(Exception):
+            await self.ws.close()
+
+
+class TTSClient:
+    """Synthesizes text over pooled websockets. Sockets belong to the event
+    loop they were opened on; use ``get_client()`` for the running loop's
+    client."""
+
+    def __init__(self, url=None, pool_size=POOL_SIZE, breaker=None):
+        self.url = url
+        self.pool_size = pool_size
+        self.breaker = breaker or BREAKER
+        self.metrics = ClientMetrics()
+        self.cap = None  # max open sockets, set once the service throttles
+        self._open = 0  # sockets open or being opened
+        self._successes = 0
+        self._idle = deque()
+        self._waiters = deque()
+        self._closing = set()
+        self._session = None
+
+    def stats(self):
+        stats = self.metrics.snapshot()
+        stats["open_sockets"] = self._open
+        stats["socket_cap"] = self.cap
+        stats["breaker"] = self.breaker.state
+        stats["breaker_trips"] = self.breaker.trips
+        return stats
+
+    async def synthesize(self, text, voice, rate, output_file, words_file=None,
+                         retries=3, on_retry=None, slot=None, on_connect=None, fmt=DEFAULT_FORMAT):
+        """Save the speech for ``text`` to ``output_file`` in ``fmt`` (a
+        ``tts.formats.FORMATS`` key).
+
+        With ``words_file``, word boundaries are requested and written there
+        as edge-tts metadata JSON lines. ``on_retry(attempt, retries, error)``
+        fires before each backoff; ``slot()`` may return an async context
+        manager held around every attempt (not while backing off);
+        ``on_connect(start, seconds)`` fires for every new connection.
+        Invalid voices or rates, or ``retries`` below 1, raise ``ValueError``
+        without a request.
+        """
+        from edge_tts.data_classes import TTSConfig
+
+        get_format(fmt)  # unknown formats fail before any request
+        if retries < 1:
+            raise ValueError(f"retries must be at least 1, got {retries}")
+        config = TTSConfig(voice, rate, "+0%", "+0Hz", "WordBoundary" if words_file else "SentenceBoundary")
+        self.metrics.requests += 1
+        for attempt in range(retries):
+            try:
+                # Wait out a half-open trial, then go ahead or fail with it.
+                wait = self.breaker.check()
+                while wait:
+                    await asyncio.sleep(wait)
+                    wait = self.breaker.check()
+            except CircuitOpenError:
+                self.metrics.rejected += 1
+                raise
+            self.metrics.attempts += 1
+            try:
+                async with slot() if slot else contextlib.nullcontext():
+                    events = await self._request(config, fmt, text, output_file, on_connect)
+            except Exception as e:
+                if isinstance(e, ThrottledError):
+                    self.metrics.throttled += 1
+                    self.breaker.abandon()
+                else:
+                    self.breaker.failure()
+                if attempt == retries - 1:
+                    self.metrics.failed += 1
+                    raise
+                self.metrics.retries += 1
+                if on_retry:
+                    on_retry(attempt + 1, retries, e)
+                await asyncio.sleep(backoff(attempt, e))
+                continue
+            except BaseException:
+                self.breaker.cancel()
+                raise
+            self.breaker.success()
+            self._grow()
+            break
+        if words_file:
+            with open(words_file, "w", encoding="utf-8") as f:
+                for event in events:
+                    f.write(json.dumps(event) + "\n")
+
+    async def close(self):
+        while self._idle:
+            self._discard(self._idle.pop())
+        if self._closing:
+            await asyncio.gather(*self._closing)
+        if self._session:
+            await self._session.close()
+            self._session = None
+
+    async def _request(self, config, fmt, text, output_file, on_connect):
+        from edge_tts import communicate as edge
+
+        output_format = get_format(fmt)
+        parts = list(edge.split_text_by_byte_length(edge.escape(edge.remove_incompatible_characters(text)), TEXT_BYTES))
+        # MP3 frames can be appended as they arrive; any other container is
+        # received per part and joined afterwards.
+        files = [output_file] if output_format.bitrate or len(parts) == 1 else [
+            f"{output_file}.{index}.part" for index in range(len(parts))
+        ]
+        events = []
+        offset = 0
+        socket = await self._checkout(on_connect)
+        try:
+            for index, part in enumerate(parts):
+                path = files[min(index, len(files) - 1)]
+                with open(path, "ab" if index and len(files) == 1 else "wb") as audio:
+                    if output_format.bitrate:
+                        # Offsets restart with every request; shift them by the
+                        # audio already received (constant bitrate, so exact).
+                        offset = audio.tell() * 8 * TICKS_PER_SECOND // output_format.bitrate
+                    while True:
+                        try:
+                            await self._turn(socket, config, output_format, part, offset, events, audio)
+                            break
+                        except ConnectionLost:
+                            if not socket.reused:
+                                raise
+                            # Closed by the service while idle in the pool.
+                            self.metrics.stale += 1
+                            self._close(socket)  # its slot goes to the new socket
+                            socket = await self._connect(on_connect)
+                    socket.reused = False
+                if not output_format.bitrate and len(files) > 1:
+                    offset += round(duration(path, fmt) * TICKS_PER_SECOND)
+        except BaseException:
+            self._discard(socket)  # possibly mid-turn: never reuse it
+            if len(files) > 1:
+                for path in files:
+                    with contextlib.suppress(OSError):
+                        os.remove(path)
+            raise
+        self._checkin(socket)
+        if len(files) > 1:
+            try:
+                join_audio(files, output_file, fmt)
+            finally:
+                for path in files:
+                    os.remove(path)
+        return events
+
+    async def _turn(self, socket, config, output_format, part, offset, events, audio):
+        """Speak ``part`` on ``socket``, writing its audio to the ``audio`` file."""
+        import aiohttp
+        from edge_tts import communicate as edge
+        from edge_tts.exceptions import NoAudioReceived, UnexpectedResponse, UnknownResponse
+
+        ws = socket.ws
+        try:
+            if socket.config != (config.boundary, output_format.service):
+                word_boundary = config.boundary == "WordBoundary"
+                await ws.send_str(
+                    f"X-Timestamp:{edge.date_to_string()}\r\n"
+                    "Content-Type:application/json; charset=utf-8\r\n"
+                    "Path:speech.config\r\n\r\n"
+                    '{"context":{"synthesis":{"audio":{"metadataoptions":{'
+                    f'"sentenceBoundaryEnabled":"{str(not word_boundary).lower()}",'
+                    f'"wordBoundaryEnabled":"{str(word_boundary).lower()}"'
+                    '},"outputFormat":"' + output_format.service + '"}}}}\r\n'
+                )
+                socket.config = (config.boundary, output_format.service)
+            await ws.send_str(
+                edge.ssml_headers_plus_data(edge.connect_id(), edge.date_to_string(), edge.mkssml(config, part))
+            )
+        except (ConnectionError, aiohttp.ClientConnectionError) as e:
+            raise ConnectionLost(str(e)) from e
+
+        received = 0
+        while True:
+            message = await ws.receive(timeout=RECEIVE_TIMEOUT)
+            if message.type == aiohttp.WSMsgType.TEXT:
+                data = message.data.encode("utf-8")
+                headers, body = edge.get_headers_and_data(data, data.find(b"\r\n\r\n"))
+                path = headers.get(b"Path")
+                if path == b"audio.metadata":
+                    for meta in json.loads(body)["Metadata"]:
+                        if meta["Type"] in ("WordBoundary", "SentenceBoundary"):
+                            events.append({
+                                "type": meta["Type"],
+                                "offset": meta["Data"]["Offset"] + offset,
+                                "duration": meta["Data"]["Duration"],
+                                "text": edge.unescape(meta["Data"]["text"]["Text"]),
+                            })
+                elif path == b"turn.end":
+                    break
+                elif path not in (b"response", b"turn.start"):
+                    raise UnknownResponse(f"Unknown path received: {path!r}")
+            elif message.type == aiohttp.WSMsgType.BINARY:
+                if len(message.data) < 2:
+                    raise UnexpectedResponse("Binary message is missing the header length.")
+                headers, body = edge.get_headers_and_data(message.data, int.from_bytes(message.data[:2], "big"))
+                if headers.get(b"Path") != b"audio":
+                    raise UnexpectedResponse("Received binary message, but the path is not audio.")
+                if body:
+                    audio.write(body)
+                    received += len(body)
+            elif message.type == aiohttp.WSMsgType.ERROR:
+                raise ConnectionLost(str(message.data or "websocket error"))
+            else:  # CLOSE, CLOSING, CLOSED
+                raise ConnectionLost("connection closed by the service")
+            if socket.reused and received:
+                socket.reused = False  # no longer a stale socket: failures are real
+        if not received:
+            raise NoAudioReceived("No audio was received. Please verify that your parameters are correct.")
+
+    async def _checkout(self, on_connect):
+        while True:
+            while self._idle:
+                socket = self._idle.pop()  # most recently used first
+                if not socket.ws.closed and time.monotonic() - socket.last_used < IDLE_TIMEOUT:
+                    self.metrics.reused += 1
+                    socket.reused = True
+                    return socket
+                self._discard(socket)
+            if self.cap is None or self._open < self.cap:
+                break
+            # Throttled before: wait for a socket instead of opening one.
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    self._wake()  # pass the wake-up on
+                raise
+        self._open += 1
+        try:
+            return await self._connect(on_connect)
+        except BaseException:
+            self._open -= 1
+            self._wake()
+            raise
+
+    def _checkin(self, socket):
+        socket.last_used = time.monotonic()
+        if len(self._idle) < self.pool_size and not socket.ws.closed:
+            self._idle.append(socket)
+            self._wake()
+        else:
+            self._discard(socket)
+
+    def _discard(self, socket):
+        self._close(socket)
+        self._open -= 1
+        self._wake()
+
+    def _close(self, socket):
+        # Closing waits for the service's close frame; don't make the
+        # caller (possibly a cancelled task) wait for it.
+        task = asyncio.ensure_future(socket.close())
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    def _wake(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+
+    def _grow(self):
+        # Additive increase: one more socket per ``cap`` successes.
+        if self.cap is not None:
+            self._successes += 1
+            if self._successes >= self.cap:
+                self._successes = 0
+                self.cap += 1
+                self._wake()
+
+    async def _connect(self, on_connect):
+        import aiohttp
+        from edge_tts import communicate as edge
+        from edge_tts.constants import SEC_MS_GEC_VERSION, WSS_HEADERS, WSS_URL
+        from edge_tts.drm import DRM
+
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(ssl=ssl_context(), ttl_dns_cache=300),
+                timeout=aiohttp.ClientTimeout(total=None, sock_connect=CONNECT_TIMEOUT),
+                trust_env=True,
+            )
+        url = self.url or ENDPOINT or WSS_URL
+        url += ("&" if "?" in url else "?") + (
+            f"ConnectionId={edge.connect_id()}"
+            f"&Sec-MS-GEC={DRM.generate_sec_ms_gec()}"
+            f"&Sec-MS-GEC-Version={SEC_MS_GEC_VERSION}"
+        )
+        start = time.perf_counter()
+        try:
+            ws = await self._session.ws_connect(
+                url, compress=15, headers=DRM.headers_with_muid(WSS_HEADERS), ssl=ssl_context(),
+            )
+        except aiohttp.WSServerHandshakeError as e:
+            if e.status == 429:
+                # Stay at the sockets that were accepted until requests succeed again.
+                self.cap = max(1, self._open - 1)
+                self._successes = 0
+                raise ThrottledError(retry_after(e.headers)) from e
+            if e.status == 403:
+                DRM.handle_client_response_error(e)  # fixes clock skew for the retry
+            raise
+        seconds = time.perf_counter() - start
+        self.metrics.connected(seconds)
+        if on_connect:
+            on_connect(start, seconds)
+        return _Socket(ws)
+
+
+_clients = weakref.WeakKeyDictionary()
+_clients_lock = threading.Lock()
+
+
+def get_client(loop=None):
+    """The client for ``loop`` (default: the running loop)."""
+    loop = loop or asyncio.get_running_loop()
+    with _clients_lock:
+        client = _clients.get(loop)
+        if client is None:
+            client = _clients[loop] = TTSClient()
+        return client
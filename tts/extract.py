@@ -0,0 +1,153 @@
+"""Incremental text extraction from uploaded documents.
+
+Each format yields text as soon as it is available: PDF page by page, DOCX
+paragraph by paragraph, plain-text formats in blocks. Format libraries are
+imported on first use.
+"""
+
+import codecs
+import io
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+BLOCK_SIZE = 64 * 1024
+# PDFs with fewer pages are parsed in-process; the pool start-up costs more.
+PARALLEL_MIN_PAGES = 32
+PAGES_PER_TASK = 8
+
+_worker_reader = None
+
+
+def _init_pdf_worker(source):
+    global _worker_reader
+    from PyPDF2 import PdfReader
+
+    _worker_reader = PdfReader(io.BytesIO(source) if isinstance(source, bytes) else source)
+
+
+def _extract_pages(start, stop):
+    return [_worker_reader.pages[i].extract_text() or "" for i in range(start, stop)]
+
+
+def _page_text(text):
+    return text + "\n" if text else ""
+
+
+def iter_pdf(source, workers=None):
+    """Yield PDF text page by page, fanning large files out to a process pool.
+
+    The first batch of pages is extracted in this process while the pool
+    starts, so the first page arrives without waiting for worker start-up.
+    At most ``2 * workers`` batches are in flight, which bounds memory when
+    the consumer is slower than the parser.
+    """
+    from PyPDF2 import PdfReader
+
+    if not isinstance(source, (str, os.PathLike)):
+        source = source.read()
+    reader = PdfReader(io.BytesIO(source) if isinstance(source, bytes) else source)
+    page_count = len(reader.pages)
+    workers = workers or os.cpu_count() or 1
+    if page_count < PARALLEL_MIN_PAGES or workers < 2:
+        for page in reader.pages:
+            yield _page_text(page.extract_text())
+        return
+
+    ranges = deque(
+        (start, min(start + PAGES_PER_TASK, page_count))
+        for start in range(PAGES_PER_TASK, page_count, PAGES_PER_TASK)
+    )
+    # spawn, not fork: the Streamlit server is multi-threaded.
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_pdf_worker,
+        initargs=(source,),
+    ) as pool:
+        pending = deque()
+        while ranges and len(pending) < 2 * workers:
+            pending.append(pool.submit(_extract_pages, *ranges.popleft()))
+        for i in range(min(PAGES_PER_TASK, page_count)):
+            yield _page_text(reader.pages[i].extract_text())
+        while pending:
+            pages = pending.popleft().result()
+            if ranges:
+                pending.append(pool.submit(_extract_pages, *ranges.popleft()))
+            for text in pages:
+                yield _page_text(text)
+
+
+def iter_docx(source):
+    import docx
+
+    for para in docx.Document(source).paragraphs:
+        yield para.text + "\n"
+
+
+def iter_decoded(source):
+    """Decode a binary file object as UTF-8 in fixed-size blocks."""
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    while True:
+        block = source.read(BLOCK_SIZE)
+        if not block:
+            break
+        text = decoder.decode(block)
+        if text:
+            yield text
+    tail = decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+def iter_markdown(source):
+    """Render Markdown to HTML one group of blank-line separated blocks at a time."""
+    import markdown
+
+    pending = ""
+    for text in iter_decoded(source):
+        pending += text
+        cut = pending.rfind("\n\n")
+        if cut != -1:
+            yield markdown.markdown(pending[:cut]) + "\n"
+            pending = pending[cut + 2:]
+    if pending.strip():
+        yield markdown.markdown(pending)
+
+
+def _blocks(text):
+    for start in range(0, len(text), BLOCK_SIZE):
+        yield text[start:start + BLOCK_SIZE]
+
+
+def iter_text(source, file_type, workers=None):
+    """Yield the text of ``source`` (a path or binary file object) in pieces.
+
+    Pieces can be fed straight to ``tts.chunker.iter_chunks``. Unsupported
+    types yield nothing. ``workers`` caps the PDF extraction pool.
+    """
+    if isinstance(source, (str, os.PathLike)) and file_type != "pdf":
+        with open(source, "rb") as f:
+            yield from iter_text(f, file_type, workers)
+        return
+    if file_type == "txt":
+        yield from iter_decoded(source)
+    elif file_type == "pdf":
+        yield from iter_pdf(source, workers)
+    elif file_type == "docx":
+        yield from iter_docx(source)
+    elif file_type == "doc":
+        import mammoth
+
+        yield from _blocks(mammoth.convert_to_markdown(source).value)
+    elif file_type == "md":
+        yield from iter_markdown(source)
+    elif file_type == "rtf":
+        from striprtf.striprtf import rtf_to_text
+
+        yield from _blocks(rtf_to_text(source.read().decode("utf-8")))
+
+
+def extract_text(source, file_type, workers=None):
+    return "".join(iter_text(source, file_type, workers))
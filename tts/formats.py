@@ -0,0 +1,72 @@
+"""Output formats the TTS service can deliver directly.
+
+Every format is requested from the service as-is, so chunks arrive in the
+final encoding and are joined without transcoding: MP3 frame by frame
+(``tts.mp3``), Opus in WebM cluster by cluster (``tts.webm``).
+"""
+
+import re
+from collections import namedtuple
+
+OutputFormat = namedtuple("OutputFormat", "label service extension mime bitrate")
+
+FORMATS = {
+    "mp3": OutputFormat("MP3 48 kbps", "audio-24khz-48kbitrate-mono-mp3", "mp3", "audio/mpeg", 48_000),
+    "mp3-96": OutputFormat("MP3 96 kbps", "audio-24khz-96kbitrate-mono-mp3", "mp3", "audio/mpeg", 96_000),
+    "mp3-32": OutputFormat("MP3 32 kbps (smallest MP3)", "audio-16khz-32kbitrate-mono-mp3", "mp3", "audio/mpeg", 32_000),
+    # Variable bitrate; about a third of the size of the default MP3.
+    "opus": OutputFormat("Opus (WebM, most compact)", "webm-24khz-16bit-mono-opus", "webm", "audio/webm", None),
+}
+DEFAULT_FORMAT = "mp3"
+
+
+def get_format(fmt):
+    """The ``OutputFormat`` for a ``FORMATS`` key; ``ValueError`` otherwise."""
+    try:
+        return FORMATS[fmt or DEFAULT_FORMAT]
+    except KeyError:
+        raise ValueError(f"Unknown output format {fmt!r}; choose from {', '.join(FORMATS)}") from None
+
+
+def is_mp3(fmt):
+    return get_format(fmt).extension == "mp3"
+
+
+def sample_rate(fmt):
+    """Sample rate in Hz the service encodes ``fmt`` at (``24khz`` -> 24000)."""
+    return int(re.search(r"(\d+)khz", get_format(fmt).service).group(1)) * 1000
+
+
+def writer(fmt):
+    """A fresh writer appending chunk files of ``fmt`` to one open output
+    file: ``append(path, out)`` then ``finish(out)``."""
+    if is_mp3(fmt):
+        from tts.mp3 import FrameWriter
+
+        return FrameWriter()
+    from tts.webm import ClusterWriter
+
+    return ClusterWriter()
+
+
+def join_audio(paths, output_file, fmt=DEFAULT_FORMAT):
+    """Join same-format chunk files into ``output_file``."""
+    if is_mp3(fmt):
+        from tts.mp3 import join_audio as join_mp3
+
+        join_mp3(paths, output_file)
+    else:
+        from tts.webm import concat_webm
+
+        concat_webm(paths, output_file)
+
+
+def duration(path, fmt=DEFAULT_FORMAT):
+    """Duration of an audio file of ``fmt`` in seconds."""
+    if is_mp3(fmt):
+        from tts.mp3 import duration as mp3_duration
+
+        return mp3_duration(path)
+    from tts.webm import duration as webm_duration
+
+    return webm_duration(path)
@@ -0,0 +1,149 @@
+"""Saved texts, kept in SQLite instead of one rewritten JSON list.
+
+Each entry is keyed by the SHA-256 of its text and listed from a small
+metadata table (title, preview, size, timestamps), so paging and searching
+never read full texts; a text is loaded only when its entry is picked.
+An entry can remember the chunk-cache keys of the audio last generated
+for it, so the app can tell whether converting it again will be instant.
+A legacy ``history.json`` is imported once, then renamed.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_HISTORY_DB = os.environ.get("TTS_HISTORY_DB", "history.db")
+LEGACY_HISTORY_FILE = "history.json"
+TITLE_CHARS = 60
+PREVIEW_CHARS = 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    preview TEXT NOT NULL,
+    chars INTEGER NOT NULL,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    audio TEXT
+);
+CREATE INDEX IF NOT EXISTS entries_updated ON entries (updated);
+CREATE TABLE IF NOT EXISTS texts (
+    id TEXT PRIMARY KEY,
+    body TEXT NOT NULL
+);
+"""
+
+
+def text_id(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def describe(text):
+    """Title (first non-empty line) and whitespace-collapsed preview."""
+    first_line = next((line.strip() for line in text.splitlines() if line.strip()), "")
+    title = first_line[:TITLE_CHARS] + ("…" if len(first_line) > TITLE_CHARS else "")
+    preview = " ".join(text[:PREVIEW_CHARS * 2].split())[:PREVIEW_CHARS]
+    return title or "(untitled)", preview
+
+
+class HistoryStore:
+    def __init__(self, path=DEFAULT_HISTORY_DB, legacy_file=LEGACY_HISTORY_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        # One connection shared by Streamlit's script threads, behind a lock.
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        with self._lock, self._db:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(SCHEMA)
+        if legacy_file and os.path.exists(legacy_file):
+            self._import_legacy(legacy_file)
+
+    def _import_legacy(self, legacy_file):
+        with open(legacy_file, "r", encoding="utf-8") as f:
+            texts = json.load(f)
+        now = time.time()
+        # Keep the old list order: later entries are newer.
+        for age, text in enumerate(reversed(texts)):
+            if isinstance(text, str) and text:
+                self.add(text, now=now - age * 1e-3)
+        os.replace(legacy_file, legacy_file + ".migrated")
+
+    def add(self, text, now=None):
+        """Save ``text``; returns ``(id, created)``. Saving an existing text
+        only moves it to the top of the list."""
+        entry_id = text_id(text)
+        now = now or time.time()
+        title, preview = describe(text)
+        with self._lock, self._db:
+            cursor = self._db.execute(
+                "INSERT OR IGNORE INTO entries (id, title, preview, chars, created, updated)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (entry_id, title, preview, len(text), now, now),
+            )
+            created = cursor.rowcount == 1
+            if created:
+                self._db.execute("INSERT INTO texts (id, body) VALUES (?, ?)", (entry_id, text))
+            else:
+                self._db.execute("UPDATE entries SET updated = ? WHERE id = ?", (now, entry_id))
+        return entry_id, created
+
+    def __contains__(self, text):
+        return self.get(text_id(text)) is not None
+
+    def _where(self, query):
+        if not query:
+            return "", ()
+        pattern = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        return " WHERE title LIKE ? ESCAPE '\\' OR preview LIKE ? ESCAPE '\\'", (pattern, pattern)
+
+    def count(self, query=None):
+        where, params = self._where(query)
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM entries" + where, params).fetchone()[0]
+
+    def list(self, query=None, limit=20, offset=0):
+        """Newest first; ``query`` matches titles and previews."""
+        where, params = self._where(query)
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT * FROM entries" + where + " ORDER BY updated DESC LIMIT ? OFFSET ?",
+                params + (limit, offset),
+            ).fetchall()
+        return [self._entry(row) for row in rows]
+
+    def get(self, entry_id):
+        with self._lock:
+            row = self._db.execute("SELECT * FROM entries WHERE id = ?", (entry_id,)).fetchone()
+        return self._entry(row) if row else None
+
+    def text(self, entry_id):
+        with self._lock:
+            row = self._db.execute("SELECT body FROM texts WHERE id = ?", (entry_id,)).fetchone()
+        return row[0] if row else None
+
+    def link_audio(self, text, voice, rate, chunk_keys, fmt="mp3"):
+        """Remember which cached chunks hold the audio of a saved ``text``."""
+        audio = json.dumps({"voice": voice, "rate": rate, "format": fmt, "chunks": list(chunk_keys)})
+        with self._lock, self._db:
+            self._db.execute("UPDATE entries SET audio = ? WHERE id = ?", (audio, text_id(text)))
+
+    def delete(self, entry_id):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM entries WHERE id = ?", (entry_id,))
+            self._db.execute("DELETE FROM texts WHERE id = ?", (entry_id,))
+
+    def clear(self):
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM entries")
+            self._db.execute("DELETE FROM texts")
+
+    @staticmethod
+    def _entry(row):
+        entry = dict(row)
+        entry["audio"] = json.loads(entry["audio"]) if entry["audio"] else None
+        return entry
@@ -0,0 +1,194 @@
+"""Incremental re-synthesis: only chunks whose sentences changed are new.
+
+Greedy packing moves every chunk boundary after an edited sentence, so a
+fixed typo on page 2 used to change (and re-synthesize) every later chunk.
+``plan_chunks`` fingerprints each prepared sentence and keeps the grouping
+of the document's previous conversion wherever a previous chunk's
+sentences appear again unchanged; only the runs in between are packed into
+new chunks. Unchanged chunks then have the same text, and so the same
+``tts.cache.chunk_key``, as before: their audio comes from the chunk cache
+and is spliced into the output by the usual join, and only the edited
+chunks reach the TTS service. ``PlanStore`` keeps each document's chunk
+layout (sentence fingerprints only, no text) between conversions.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from collections import deque, namedtuple
+
+from tts.chunker import DEFAULT_MAX_BYTES, pack_sentences
+
+PLAN_DIR = os.environ.get("TTS_PLAN_DIR", ".tts_plans")
+MAX_PLANS = 500
+
+# ``sentences`` holds the fingerprints of the chunk's sentences; ``reused``
+# tells whether the chunk repeats a chunk of the previous layout.
+PlannedChunk = namedtuple("PlannedChunk", "text sentences reused")
+
+
+def fingerprint(sentence):
+    return hashlib.blake2b(sentence.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def plan_chunks(sentences, previous=(), max_bytes=DEFAULT_MAX_BYTES, first_chunk_bytes=None):
+    """Lazily group prepared ``sentences`` into ``PlannedChunk``s.
+
+    ``previous`` is the layout of the last conversion: one sequence of
+    sentence fingerprints per chunk. Wherever the upcoming sentences repeat
+    one of those chunks exactly, that chunk is reused as is; everything
+    else is packed greedily like ``tts.chunker.iter_chunks`` (which this
+    matches exactly when there is no previous layout). Look-ahead is bounded
+    by the longest previous chunk, so sentences can come from a lazy source.
+    """
+    starts = {}
+    for layout in previous:
+        if layout:
+            starts.setdefault(layout[0], []).append(tuple(layout))
+    source = iter(sentences)
+    ahead = deque()  # (sentence, fingerprint) not yet planned
+    pending = []  # changed sentences waiting to be packed
+    pending_bytes = 0
+    first = True
+
+    def fill(count):
+        while len(ahead) < count:
+            sentence = next(source, None)
+            if sentence is None:
+                return False
+            ahead.append((sentence, fingerprint(sentence)))
+        return True
+
+    def pack(keep_last):
+        # Packing a prefix of the pending run gives the same groups as packing
+        # all of it, as long as the last (still growing) group is held back.
+        nonlocal pending, pending_bytes, first
+        groups = list(pack_sentences([s for s, _ in pending], max_bytes, first_chunk_bytes if first else None))
+        if keep_last:
+            groups = groups[:-1]
+        position = 0
+        for group in groups:
+            items = pending[position:position + len(group)]
+            position += len(group)
+            first = False
+            yield PlannedChunk(" ".join(group), tuple(f for _, f in items), False)
+        pending = pending[position:]
+        pending_bytes = sum(len(s.encode("utf-8")) + 1 for s, _ in pending)
+
+    while fill(1):
+        match = None
+        for layout in starts.get(ahead[0][1], ()):
+            if fill(len(layout)) and all(ahead[i][1] == f for i, f in enumerate(layout)):
+                match = layout
+                break
+        if match:
+            text = " ".join(ahead[i][0] for i in range(len(match)))
+            if len(text.encode("utf-8")) <= max_bytes:
+                if pending:
+                    yield from pack(keep_last=False)
+                for _ in match:
+                    ahead.popleft()
+                first = False
+                yield PlannedChunk(text, match, True)
+                continue
+        pending.append(ahead.popleft())
+        pending_bytes += len(pending[-1][0].encode("utf-8")) + 1
+        if pending_bytes > 2 * max_bytes:
+            yield from pack(keep_last=True)
+    if pending:
+        yield from pack(keep_last=False)
+
+
+class ReuseReport:
+    """How much synthesis a conversion avoided by reusing unchanged chunks."""
+
+    def __init__(self):
+        self.chunks = 0
+        self.chars = 0
+        self.unchanged = 0  # chunks repeating the previous layout
+        self.avoided = 0  # chunks whose audio needed no request
+        self.avoided_chars = 0
+        self.synthesized = 0
+        self.synthesized_chars = 0
+
+    def record(self, chunk, source, unchanged=False):
+        """Count a chunk once its audio came from ``source`` (see
+        ``tts.synth.synthesize_chunks``); ``unchanged`` if it was planned as
+        a repeat of the previous layout."""
+        self.chunks += 1
+        self.chars += len(chunk)
+        self.unchanged += bool(unchanged)
+        if source == "network":
+            self.synthesized += 1
+            self.synthesized_chars += len(chunk)
+        elif source in ("cache", "resumed"):
+            self.avoided += 1
+            self.avoided_chars += len(chunk)
+
+    def to_dict(self):
+        return {
+            "chunks": self.chunks,
+            "chars": self.chars,
+            "unchanged": self.unchanged,
+            "avoided": self.avoided,
+            "avoided_chars": self.avoided_chars,
+            "synthesized": self.synthesized,
+            "synthesized_chars": self.synthesized_chars,
+        }
+
+    def summary(self):
+        share = self.avoided_chars / self.chars if self.chars else 0.0
+        return (
+            f"{self.chunks - self.unchanged} of {self.chunks} chunks changed;"
+            f" synthesized {self.synthesized} ({self.synthesized_chars:,} chars),"
+            f" reused {self.avoided} ({self.avoided_chars:,} chars, {share:.0%} of the text)"
+        )
+
+
+class PlanStore:
+    """Chunk layouts of recent conversions, one small JSON file per
+    document; the least recently written are dropped past ``max_plans``."""
+
+    def __init__(self, directory=PLAN_DIR, max_plans=MAX_PLANS):
+        self.directory = directory
+        self.max_plans = max_plans
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, document):
+        name = hashlib.sha256(document.encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.directory, f"{name}.json")
+
+    def get(self, document):
+        """The layout saved for ``document``: a list of fingerprint lists."""
+        try:
+            with open(self._path(document), "r", encoding="utf-8") as f:
+                return json.load(f)["chunks"]
+        except (FileNotFoundError, ValueError, KeyError):
+            return []
+
+    def put(self, document, layout):
+        fd, temp = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"chunks": [list(chunk) for chunk in layout]}, f, separators=(",", ":"))
+            os.replace(temp, self._path(document))
+        except BaseException:
+            if os.path.exists(temp):
+                os.remove(temp)
+            raise
+        self._evict()
+
+    def _evict(self):
+        plans = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".json"):
+                try:
+                    plans.append((entry.stat().st_mtime, entry.path))
+                except FileNotFoundError:
+                    continue
+        for _, path in sorted(plans)[:-self.max_plans or None]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
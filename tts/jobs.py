@@ -0,0 +1,258 @@
+"""Process-wide background queue for conversions.
+
+Jobs are coroutines run on one event loop in a daemon thread, so they keep
+going when the Streamlit script run that submitted them ends, and every
+session can look them up by ID on later reruns. At most ``max_jobs`` run at
+once; the next job to start is the oldest one of the owner (session) with
+the fewest running jobs. Finished jobs and their files are deleted once
+they are ``JOB_TTL`` seconds old (checked every ``SWEEP_INTERVAL``).
+
+All jobs share one ``FairLimiter`` for requests to the TTS service: a
+global cap plus a cap per voice, with free slots handed out round-robin
+across owners, so one user's 300-page PDF cannot starve everyone else.
+"""
+
+import asyncio
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict, deque
+from contextlib import asynccontextmanager
+
+MAX_JOBS = int(os.environ.get("TTS_MAX_JOBS", "4"))
+MAX_REQUESTS = int(os.environ.get("TTS_MAX_REQUESTS", "16"))
+MAX_VOICE_REQUESTS = int(os.environ.get("TTS_MAX_VOICE_REQUESTS", "8"))
+JOB_DIR = os.environ.get("TTS_JOB_DIR", ".tts_jobs")
+JOB_TTL = int(os.environ.get("TTS_JOB_TTL", "3600"))
+SWEEP_INTERVAL = 60  # seconds between background sweeps of expired jobs
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+class FairLimiter:
+    """Request slots capped in total and per voice, granted round-robin
+    across owners. Only used from the queue's event loop thread."""
+
+    def __init__(self, max_requests=MAX_REQUESTS, max_voice_requests=MAX_VOICE_REQUESTS):
+        self.max_requests = max_requests
+        self.max_voice_requests = max_voice_requests
+        self.in_use = 0
+        self.by_voice = Counter()
+        self.waiting = OrderedDict()  # owner -> deque of (voice, future)
+
+    def _free(self, voice):
+        return self.in_use < self.max_requests and self.by_voice[voice] < self.max_voice_requests
+
+    def _take(self, voice):
+        self.in_use += 1
+        self.by_voice[voice] += 1
+
+    async def acquire(self, owner, voice):
+        if not self.waiting and self._free(voice):
+            self._take(voice)
+            return
+        future = asyncio.get_running_loop().create_future()
+        self.waiting.setdefault(owner, deque()).append((voice, future))
+        # Others may only be waiting for a busy voice; this one can still
+        # be granted right away if its own voice has room.
+        self._grant()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release(voice)  # granted just as we were cancelled
+            else:
+                self._forget(owner, future)
+            raise
+
+    def _forget(self, owner, future):
+        queue = self.waiting.get(owner)
+        if queue is None:
+            return
+        for item in queue:
+            if item[1] is future:
+                queue.remove(item)
+                break
+        if not queue:
+            del self.waiting[owner]
+        self._grant()
+
+    def release(self, voice):
+        self.in_use -= 1
+        self.by_voice[voice] -= 1
+        self._grant()
+
+    def _grant(self):
+        granted = True
+        while granted and self.waiting and self.in_use < self.max_requests:
+            granted = False
+            for owner in list(self.waiting):
+                # A waiter cancelled a moment ago may not have removed itself yet.
+                queue = deque(item for item in self.waiting[owner] if not item[1].cancelled())
+                self.waiting[owner] = queue
+                item = next((item for item in queue if self._free(item[0])), None)
+                if item is None:
+                    if not queue:
+                        del self.waiting[owner]
+                    continue
+                queue.remove(item)
+                if queue:
+                    self.waiting.move_to_end(owner)  # next turn goes to someone else
+                else:
+                    del self.waiting[owner]
+                self._take(item[0])
+                item[1].set_result(None)
+                granted = True
+                break
+
+    @asynccontextmanager
+    async def slot(self, owner, voice):
+        await self.acquire(owner, voice)
+        try:
+            yield
+        finally:
+            self.release(voice)
+
+
+class Job:
+    """One submitted conversion. ``work(job)`` is the coroutine doing it; it
+    reports through ``job.progress()`` and ``job.log()`` and its return
+    value becomes ``job.result``. ``meta`` holds whatever the submitter
+    wants to find again on later reruns (e.g. the audio stream)."""
+
+    def __init__(self, work, owner=None, label="", meta=None):
+        self.id = uuid.uuid4().hex
+        self.owner = owner or self.id
+        self.label = label
+        self.meta = meta or {}
+        self.work = work
+        self.status = QUEUED
+        self.done = 0
+        self.total = None
+        self.messages = []
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.dir = os.path.join(JOB_DIR, self.id)
+        self._task = None
+
+    @property
+    def active(self):
+        return self.status in (QUEUED, RUNNING)
+
+    @property
+    def fraction(self):
+        return self.done / self.total if self.total else 0.0
+
+    def progress(self, done, total):
+        self.done = done
+        self.total = total
+
+    def log(self, message):
+        self.messages.append(message)
+
+
+class JobQueue:
+    def __init__(self, max_jobs=MAX_JOBS, limiter=None):
+        self.max_jobs = max_jobs
+        self.limiter = limiter or FairLimiter()
+        self.loop = asyncio.new_event_loop()
+        self._jobs = {}
+        self._pending = []
+        self._running = Counter()  # owner -> running jobs
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="tts-jobs", daemon=True)
+        self._thread.start()
+        self.loop.call_soon_threadsafe(self._schedule_sweep)
+
+    def submit(self, work, owner=None, label="", **meta):
+        self.sweep()
+        job = Job(work, owner, label, meta)
+        with self._lock:
+            self._jobs[job.id] = job
+        self.loop.call_soon_threadsafe(self._enqueue, job)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self, owner=None):
+        """Newest first."""
+        with self._lock:
+            jobs = [job for job in self._jobs.values() if owner is None or job.owner == owner]
+        return sorted(jobs, key=lambda job: job.created, reverse=True)
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job:
+            self.loop.call_soon_threadsafe(self._cancel, job)
+
+    def slot(self, job, voice):
+        """Async context manager holding one TTS request slot for ``job``."""
+        return self.limiter.slot(job.owner, voice)
+
+    def sweep(self, ttl=JOB_TTL):
+        """Forget finished jobs older than ``ttl`` and delete their files."""
+        cutoff = time.time() - ttl
+        with self._lock:
+            expired = [job for job in self._jobs.values()
+                       if not job.active and job.finished and job.finished < cutoff]
+            for job in expired:
+                del self._jobs[job.id]
+        for job in expired:
+            shutil.rmtree(job.dir, ignore_errors=True)
+
+    # The methods below run on the queue's event loop.
+
+    def _schedule_sweep(self):
+        # Deleting files blocks, so it happens off the loop.
+        self.loop.run_in_executor(None, self.sweep)
+        self.loop.call_later(SWEEP_INTERVAL, self._schedule_sweep)
+
+    def _enqueue(self, job):
+        self._pending.append(job)
+        self._start_next()
+
+    def _start_next(self):
+        while self._pending and sum(self._running.values()) < self.max_jobs:
+            # Oldest job of the owner with the fewest running jobs.
+            job = min(self._pending, key=lambda job: (self._running[job.owner], job.created))
+            self._pending.remove(job)
+            self._running[job.owner] += 1
+            job._task = self.loop.create_task(self._run(job))
+
+    async def _run(self, job):
+        job.status = RUNNING
+        job.started = time.time()
+        try:
+            os.makedirs(job.dir, exist_ok=True)
+            job.result = await job.work(job)
+            job.status = DONE
+        except asyncio.CancelledError:
+            job.status = CANCELLED
+        except Exception as e:
+            job.error = e
+            job.status = FAILED
+        finally:
+            job.finished = time.time()
+            self._running[job.owner] -= 1
+            if not self._running[job.owner]:
+                del self._running[job.owner]
+            self._start_next()
+
+    def _cancel(self, job):
+        if job in self._pending:
+            self._pending.remove(job)
+            job.status = CANCELLED
+            job.finished = time.time()
+        elif job._task:
+            job._task.cancel()
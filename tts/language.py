@@ -0,0 +1,126 @@
+"""Language detection on bounded text samples, and per-chunk voice routing.
+
+Detection never looks at more than ``SAMPLE_CHARS`` characters: long texts
+are sampled in evenly spaced windows so a document is judged by its whole
+body rather than its first page. Text written mostly in one of the Indic
+scripts is identified from its Unicode block directly, which is faster and
+more reliable than n-gram detection; everything else goes to langdetect.
+Results are memoized by a hash of the text, so Streamlit reruns and
+repeated chunks cost one hash.
+"""
+
+import hashlib
+import threading
+from collections import Counter, OrderedDict
+
+SAMPLE_CHARS = 2000
+SAMPLE_WINDOWS = 4
+# Chunks are at most a few KB; a shorter sample is enough to route a voice.
+CHUNK_SAMPLE_CHARS = 400
+MAX_CACHED = 1024
+
+# 128-code-point Unicode blocks of scripts that name a single language.
+SCRIPT_LANGUAGES = {
+    0x0980 >> 7: "bn",
+    0x0A00 >> 7: "pa",
+    0x0A80 >> 7: "gu",
+    0x0B00 >> 7: "or",
+    0x0B80 >> 7: "ta",
+    0x0C00 >> 7: "te",
+    0x0C80 >> 7: "kn",
+    0x0D00 >> 7: "ml",
+}
+
+_detected = OrderedDict()
+# Script threads and the job queue's thread detect concurrently.
+_detected_lock = threading.Lock()
+
+
+def sample_text(text, max_chars=SAMPLE_CHARS, windows=SAMPLE_WINDOWS):
+    """Up to ``max_chars`` of ``text`` taken from ``windows`` evenly spaced
+    places, each trimmed to whole words."""
+    if len(text) <= max_chars:
+        return text
+    width = max_chars // windows
+    step = (len(text) - width) / max(1, windows - 1)
+    parts = []
+    for i in range(windows):
+        start = round(i * step)
+        window = text[start:start + width]
+        if start:
+            window = window.partition(" ")[2] or window
+        if start + width < len(text):
+            window = window.rpartition(" ")[0] or window
+        parts.append(window)
+    return "\n".join(parts)
+
+
+def script_language(text):
+    """The language of the Indic script most letters are written in, if any."""
+    blocks = Counter(ord(c) >> 7 for c in text if c.isalpha())
+    letters = sum(blocks.values())
+    if not letters:
+        return None
+    block, count = blocks.most_common(1)[0]
+    if count * 2 > letters:
+        return SCRIPT_LANGUAGES.get(block)
+    return None
+
+
+def _langdetect(text):
+    from langdetect import DetectorFactory, LangDetectException, detect
+
+    DetectorFactory.seed = 0  # langdetect is randomized; keep results stable
+    try:
+        lang = detect(text)
+    except LangDetectException:
+        return None
+    # Region-tagged codes ("zh-cn", "zh-tw") match voices by language only.
+    return lang.split("-", 1)[0]
+
+
+def detect_language(text, max_chars=SAMPLE_CHARS):
+    """ISO 639-1 code of ``text`` (e.g. ``"en"``, ``"te"``), or None."""
+    key = (hashlib.sha1(text.encode("utf-8")).digest(), max_chars)
+    with _detected_lock:
+        if key in _detected:
+            _detected.move_to_end(key)
+            return _detected[key]
+    sample = sample_text(text, max_chars)
+    lang = script_language(sample) or _langdetect(sample)
+    with _detected_lock:
+        _detected[key] = lang
+        if len(_detected) > MAX_CACHED:
+            _detected.popitem(last=False)
+    return lang
+
+
+def voice_language(voice):
+    """``"te-IN-MohanNeural"`` -> ``"te"``."""
+    return voice.split("-", 1)[0].lower()
+
+
+class VoiceRouter:
+    """Picks the voice for each chunk from the language it is written in.
+
+    ``default_voice`` speaks its own language and anything no voice in
+    ``voices`` matches; otherwise the first voice of the detected language
+    is used. ``routed`` counts chunks per voice.
+    """
+
+    def __init__(self, default_voice, voices):
+        self.default_voice = default_voice
+        self.by_language = {}
+        for voice in voices:
+            self.by_language.setdefault(voice_language(voice), voice)
+        self.by_language[voice_language(default_voice)] = default_voice
+        self.routed = Counter()
+
+    def voice_for(self, chunk):
+        lang = detect_language(chunk, CHUNK_SAMPLE_CHARS)
+        return self.by_language.get(lang, self.default_voice)
+
+    def __call__(self, chunk):
+        voice = self.voice_for(chunk)
+        self.routed[voice] += 1
+        return voice
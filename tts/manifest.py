@@ -0,0 +1,39 @@
+"""Append-only JSON-lines manifests used to resume interrupted batch runs."""
+
+import json
+import os
+import threading
+
+
+class Manifest:
+    """Records keyed by ``id``; the latest record for an id wins.
+
+    Each record is one line appended and flushed immediately, so a run that
+    is killed loses at most the line being written. A torn final line is
+    ignored on load.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self.entries[entry["id"]] = entry
+
+    def get(self, entry_id):
+        return self.entries.get(entry_id)
+
+    def record(self, entry_id, **fields):
+        entry = dict(fields, id=entry_id)
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            self.entries[entry_id] = entry
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
@@ -0,0 +1,288 @@
+"""Offline stand-in for the Edge-TTS websocket service.
+
+Speaks the same protocol as the real service (``speech.config`` and
+``ssml`` requests; ``turn.start``, binary ``audio``, ``audio.metadata`` and
+``turn.end`` responses) and returns deterministic silent audio whose
+length follows the text, as MP3 frames or a WebM Opus stream depending on
+the requested ``outputFormat``, so the pipeline can be measured and regression
+tested without network access. Latency, jitter, failures and throttling are
+configurable and seeded.
+
+Run standalone and point the app or CLI at it with ``TTS_ENDPOINT``::
+
+    python -m tts.mockserver --port 8900 --latency 0.3 --jitter 0.1
+    TTS_ENDPOINT=ws://127.0.0.1:8900/edge/v1 python -m tts batch docs/
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import struct
+import uuid
+from xml.sax.saxutils import unescape
+
+from aiohttp import WSMsgType, web
+
+from tts import webm
+
+DEFAULT_OUTPUT_FORMAT = "audio-24khz-48kbitrate-mono-mp3"
+# MPEG-2 layer III mono frames: a header followed by zeroed side info
+# decodes as 576 samples of silence. Keyed by outputFormat:
+# (header, frame length, sample rate).
+MP3_FRAMES = {
+    "audio-24khz-48kbitrate-mono-mp3": (bytes([0xFF, 0xF3, 0x64, 0xC0]), 144, 24000),
+    "audio-24khz-96kbitrate-mono-mp3": (bytes([0xFF, 0xF3, 0xA4, 0xC0]), 288, 24000),
+    "audio-16khz-32kbitrate-mono-mp3": (bytes([0xFF, 0xF3, 0x48, 0xC0]), 144, 16000),
+}
+# A 20 ms CELT packet that decodes as silence.
+SILENT_OPUS_PACKET = bytes([0xF8, 0xFF, 0xFE])
+OPUS_PACKET_SECONDS = 0.02
+TICKS_PER_SECOND = 10_000_000
+# Speaking speed used to turn text length into audio duration.
+CHARS_PER_SECOND = 15
+AUDIO_MESSAGE_FRAMES = 32
+
+_PROSODY = re.compile(r"<prosody[^>]*>(.*?)</prosody>", re.S)
+
+
+def _headers_and_body(message):
+    head, _, body = message.partition("\r\n\r\n")
+    headers = dict(line.split(":", 1) for line in head.split("\r\n") if ":" in line)
+    return headers, body
+
+
+def _webm_header():
+    """EBML header, a live (unknown-size) segment, info and an Opus track."""
+    opus_head = b"OpusHead" + bytes([1, 1]) + (312).to_bytes(2, "little") + (24000).to_bytes(4, "little") + bytes(3)
+    track = webm.ebml_element(webm.TRACK_ENTRY, b"".join([
+        webm.ebml_uint(webm.TRACK_NUMBER, 1),
+        webm.ebml_uint(0x73C5, 1),  # TrackUID
+        webm.ebml_uint(0x83, 2),  # TrackType: audio
+        webm.ebml_element(webm.CODEC_ID, b"A_OPUS", size_length=1),
+        webm.ebml_element(0x63A2, opus_head, size_length=1),  # CodecPrivate
+        webm.ebml_element(0xE1, b"".join([  # Audio
+            webm.ebml_element(0xB5, struct.pack(">d", 48000.0), size_length=1),  # SamplingFrequency
+            webm.ebml_uint(0x9F, 1),  # Channels
+        ])),
+    ]))
+    return b"".join([
+        webm.ebml_element(webm.EBML, b"".join([
+            webm.ebml_uint(0x4286, 1),  # EBMLVersion
+            webm.ebml_element(0x4282, b"webm", size_length=1),  # DocType
+            webm.ebml_uint(0x4287, 4),  # DocTypeVersion
+        ])),
+        webm.encode_id(webm.SEGMENT) + b"\x01\xff\xff\xff\xff\xff\xff\xff",
+        webm.ebml_element(webm.INFO, b"".join([
+            webm.ebml_uint(webm.TIMECODE_SCALE, webm.DEFAULT_TIMECODE_SCALE),
+            webm.ebml_element(0x4D80, b"tts.mockserver", size_length=1),  # MuxingApp
+        ])),
+        webm.ebml_element(webm.TRACKS, track),
+    ])
+
+
+def _webm_cluster(timecode_ms, packets):
+    """A cluster of ``packets`` silent 20 ms Opus blocks."""
+    step = round(OPUS_PACKET_SECONDS * 1000)
+    blocks = b"".join(
+        webm.ebml_element(webm.SIMPLE_BLOCK, b"\x81" + struct.pack(">h", index * step) + b"\x80" + SILENT_OPUS_PACKET)
+        for index in range(packets)
+    )
+    return webm.ebml_element(webm.CLUSTER, webm.ebml_uint(webm.TIMECODE, timecode_ms) + blocks)
+
+
+class MockTTSServer:
+    """aiohttp application emulating the Edge read-aloud websocket.
+
+    ``latency`` (+/- ``jitter``) delays the first response of each turn;
+    ``realtime_factor`` adds synthesis time per second of audio produced;
+    ``failure_rate`` drops that fraction of connections without audio; at
+    most ``max_connections`` websockets are accepted at once, later ones
+    get HTTP 429 like a throttled client.
+    """
+
+    def __init__(
+        self,
+        latency=0.0,
+        jitter=0.0,
+        realtime_factor=0.0,
+        failure_rate=0.0,
+        max_connections=None,
+        seed=0,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.realtime_factor = realtime_factor
+        self.failure_rate = failure_rate
+        self.max_connections = max_connections
+        self.random = random.Random(seed)
+        self.active = 0
+        self.sockets = set()
+        self.stats = {"connections": 0, "turns": 0, "throttled": 0, "failed": 0}
+        self.app = web.Application()
+        self.app.router.add_get("/{tail:.*}", self.handle)
+        self._runner = None
+        self.url = None
+
+    async def start(self, host="127.0.0.1", port=0):
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"ws://{host}:{port}/edge/v1"
+        return self
+
+    async def stop(self):
+        # Clients may keep idle sockets open (tts.client pools them).
+        for ws in list(self.sockets):
+            await ws.close()
+        if self._runner:
+            await self._runner.cleanup()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    async def handle(self, request):
+        if self.max_connections is not None and self.active >= self.max_connections:
+            self.stats["throttled"] += 1
+            return web.Response(status=429, text="Too Many Requests")
+        ws = web.WebSocketResponse(compress=True)
+        await ws.prepare(request)
+        self.sockets.add(ws)
+        self.active += 1
+        self.stats["connections"] += 1
+        word_boundary = False
+        output_format = DEFAULT_OUTPUT_FORMAT
+        try:
+            async for message in ws:
+                if message.type != WSMsgType.TEXT:
+                    continue
+                headers, body = _headers_and_body(message.data)
+                path = headers.get("Path")
+                if path == "speech.config":
+                    options = json.loads(body)["context"]["synthesis"]["audio"]
+                    word_boundary = options["metadataoptions"]["wordBoundaryEnabled"] == "true"
+                    output_format = options.get("outputFormat", DEFAULT_OUTPUT_FORMAT)
+                elif path == "ssml":
+                    if self.random.random() < self.failure_rate:
+                        self.stats["failed"] += 1
+                        await ws.close()
+                        break
+                    await self._turn(
+                        ws, headers.get("X-RequestId", uuid.uuid4().hex), body, word_boundary, output_format
+                    )
+        except ConnectionResetError:
+            pass  # client went away mid-turn (cancelled or timed out)
+        finally:
+            self.sockets.discard(ws)
+            self.active -= 1
+        return ws
+
+    async def _turn(self, ws, request_id, ssml, word_boundary, output_format=DEFAULT_OUTPUT_FORMAT):
+        self.stats["turns"] += 1
+        match = _PROSODY.search(ssml)
+        text = unescape(match.group(1)).strip() if match else ""
+        if output_format in MP3_FRAMES:
+            header, length, sample_rate = MP3_FRAMES[output_format]
+            frame_seconds = 576 / sample_rate
+            content_type = "audio/mpeg"
+        elif output_format == "webm-24khz-16bit-mono-opus":
+            frame_seconds = OPUS_PACKET_SECONDS
+            content_type = "audio/webm; codec=opus"
+        else:
+            await ws.close()  # the real service drops unsupported formats
+            return
+        seconds = max(frame_seconds, len(text) / CHARS_PER_SECOND)
+        frames = round(seconds / frame_seconds)
+        delay = self.latency + self.random.uniform(-self.jitter, self.jitter)
+        await asyncio.sleep(max(0.0, delay))
+
+        await ws.send_str(
+            f"X-RequestId:{request_id}\r\nContent-Type:application/json; charset=utf-8\r\n"
+            f"Path:turn.start\r\n\r\n{{}}"
+        )
+        audio_headers = (
+            f"X-RequestId:{request_id}\r\nContent-Type:{content_type}\r\nPath:audio\r\n"
+        ).encode()
+        prefix = len(audio_headers).to_bytes(2, "big") + audio_headers
+        if content_type == "audio/mpeg":
+            silent = header + bytes(length - 4)
+        else:
+            await ws.send_bytes(prefix + _webm_header())
+        for start in range(0, frames, AUDIO_MESSAGE_FRAMES):
+            count = min(AUDIO_MESSAGE_FRAMES, frames - start)
+            if self.realtime_factor:
+                await asyncio.sleep(count * frame_seconds * self.realtime_factor)
+            if content_type == "audio/mpeg":
+                await ws.send_bytes(prefix + silent * count)
+            else:
+                await ws.send_bytes(prefix + _webm_cluster(round(start * OPUS_PACKET_SECONDS * 1000), count))
+        for boundary in self._boundaries(text, seconds, word_boundary):
+            await ws.send_str(
+                f"X-RequestId:{request_id}\r\nContent-Type:application/json; charset=utf-8\r\n"
+                f"Path:audio.metadata\r\n\r\n{json.dumps({'Metadata': [boundary]})}"
+            )
+        await ws.send_str(
+            f"X-RequestId:{request_id}\r\nContent-Type:application/json; charset=utf-8\r\n"
+            f"Path:turn.end\r\n\r\n{{}}"
+        )
+
+    @staticmethod
+    def _boundaries(text, seconds, word_boundary):
+        """Spread word (or one sentence) boundaries evenly over the audio."""
+        units = text.split() if word_boundary else [text]
+        kind = "WordBoundary" if word_boundary else "SentenceBoundary"
+        total = sum(len(unit) for unit in units) or 1
+        offset = 0
+        for unit in units:
+            duration = int(seconds * TICKS_PER_SECOND * len(unit) / total)
+            yield {
+                "Type": kind,
+                "Data": {
+                    "Offset": offset,
+                    "Duration": duration,
+                    "text": {"Text": unit, "Length": len(unit), "BoundaryType": kind},
+                },
+            }
+            offset += duration
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m tts.mockserver", description=__doc__.split("\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before each turn starts")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- seconds added to the latency")
+    parser.add_argument("--realtime-factor", type=float, default=0.0,
+                        help="synthesis seconds per second of audio")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--max-connections", type=int, help="answer 429 above this many sockets")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    server = MockTTSServer(
+        latency=args.latency,
+        jitter=args.jitter,
+        realtime_factor=args.realtime_factor,
+        failure_rate=args.failure_rate,
+        max_connections=args.max_connections,
+        seed=args.seed,
+    )
+
+    async def serve():
+        await server.start(args.host, args.port)
+        print(f"Mock Edge-TTS listening on {server.url}", flush=True)
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""Frame-level MP3 handling: parse headers, strip tags, join without re-encoding."""
+
+import os
+from collections import namedtuple
+
+BLOCK_SIZE = 64 * 1024
+# Longest possible frame (MPEG1 layer II, 384 kbps at 32 kHz, padded)
+MAX_FRAME_LENGTH = 1729
+
+# Bitrates in kbps indexed by [version is MPEG1][layer][bitrate index]
+_BITRATES = {
+    (True, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (True, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (True, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (False, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (False, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (False, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+# Sample rates indexed by the 2-bit version id (0 = MPEG2.5, 2 = MPEG2, 3 = MPEG1)
+_SAMPLE_RATES = {0: (11025, 12000, 8000), 2: (22050, 24000, 16000), 3: (44100, 48000, 32000)}
+
+Frame = namedtuple(
+    "Frame", "version layer sample_rate channels bitrate length samples protected"
+)
+
+
+class Mp3FormatError(Exception):
+    """Raised when a file is not a frame stream we can copy verbatim."""
+
+
+class IncompatibleStreamsError(Mp3FormatError):
+    """Raised when the inputs differ in version, layer, sample rate or channels."""
+
+
+def parse_header(header):
+    """Decode a 4-byte frame header, or return None if it is not one."""
+    if len(header) < 4 or header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+        return None
+    version = (header[1] >> 3) & 0x03
+    layer = 4 - ((header[1] >> 1) & 0x03)
+    bitrate_index = header[2] >> 4
+    rate_index = (header[2] >> 2) & 0x03
+    if version == 1 or layer == 4 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    mpeg1 = version == 3
+    bitrate = _BITRATES[(mpeg1, layer)][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    padding = (header[2] >> 1) & 0x01
+    if layer == 1:
+        samples = 384
+        length = (12 * bitrate // sample_rate + padding) * 4
+    else:
+        samples = 1152 if mpeg1 or layer == 2 else 576
+        length = samples // 8 * bitrate // sample_rate + padding
+    channels = 1 if header[3] >> 6 == 3 else 2
+    protected = not header[1] & 0x01
+    return Frame(version, layer, sample_rate, channels, bitrate, length, samples, protected)
+
+
+def stream_params(frame):
+    """The parts of a frame header that must agree for a verbatim join."""
+    return frame.version, frame.layer, frame.sample_rate, frame.channels
+
+
+def _is_info_frame(frame, data):
+    """True for the Xing/Info/VBRI header frame encoders prepend to a file."""
+    if frame.version == 3:
+        side_info = 17 if frame.channels == 1 else 32
+    else:
+        side_info = 9 if frame.channels == 1 else 17
+    offset = 4 + side_info
+    return (
+        data[offset:offset + 4] in (b"Xing", b"Info")
+        or data[offset + 2:offset + 6] in (b"Xing", b"Info")
+        or data[36:40] == b"VBRI"
+    )
+
+
+def audio_bounds(f):
+    """Return (start, end) of the frame data, skipping ID3v2, ID3v1 and APE tags."""
+    f.seek(0, os.SEEK_END)
+    end = f.tell()
+    f.seek(0)
+    start = 0
+    # ID3v2 tags may be stacked; each has a 10-byte header with a synchsafe size.
+    while True:
+        f.seek(start)
+        header = f.read(10)
+        if len(header) < 10 or header[:3] != b"ID3":
+            break
+        size = (header[6] << 21) | (header[7] << 14) | (header[8] << 7) | header[9]
+        start += 10 + size + (10 if header[5] & 0x10 else 0)
+    if end - start >= 128:
+        f.seek(end - 128)
+        if f.read(3) == b"TAG":
+            end -= 128
+    if end - start >= 32:
+        f.seek(end - 32)
+        footer = f.read(32)
+        if footer[:8] == b"APETAGEX":
+            size = int.from_bytes(footer[12:16], "little")
+            has_header = footer[23] & 0x80
+            end -= size + (32 if has_header else 0)
+    f.seek(start)
+    return start, max(start, end)
+
+
+def _frames(f, start, end):
+    """Yield (frame, memoryview) for every audio frame between start and end.
+
+    Reads in fixed-size blocks so memory stays bounded regardless of file
+    length. Once in sync, headers matching the stream are trusted; after
+    garbage we resync on the next header whose successor is also valid.
+    """
+    f.seek(start)
+    synced = None
+    remaining = end - start
+    buffer = b""
+    pos = 0
+    eof = False
+    while True:
+        if len(buffer) - pos < 2 * MAX_FRAME_LENGTH + 4 and not eof:
+            block = f.read(min(BLOCK_SIZE, remaining))
+            remaining -= len(block)
+            eof = not block or remaining <= 0
+            buffer = buffer[pos:] + block
+            pos = 0
+        if len(buffer) - pos < 4:
+            return
+        frame = parse_header(buffer[pos:pos + 4])
+        if frame and pos + frame.length <= len(buffer):
+            following = buffer[pos + frame.length:pos + frame.length + 4]
+            in_sync = synced is not None and stream_params(frame) == synced
+            if in_sync or len(following) < 4 or parse_header(following):
+                synced = stream_params(frame)
+                yield frame, memoryview(buffer)[pos:pos + frame.length]
+                pos += frame.length
+                continue
+        synced = None
+        if frame and pos + frame.length > len(buffer) and eof:
+            return  # truncated final frame
+        next_sync = buffer.find(b"\xff", pos + 1)
+        if next_sync == -1:
+            pos = len(buffer)
+            if eof:
+                return
+        else:
+            pos = next_sync
+
+
+def probe(path):
+    """Return the first audio frame of ``path`` (skipping any Xing/Info frame)."""
+    with open(path, "rb") as f:
+        start, end = audio_bounds(f)
+        for frame, data in _frames(f, start, end):
+            if not _is_info_frame(frame, data):
+                return frame
+    raise Mp3FormatError(f"No MPEG audio frames found in {path}")
+
+
+def copy_frames(path, out, expected=None):
+    """Append the audio frames of ``path`` to the open file ``out``.
+
+    Tags and the Xing/Info header frame are dropped. ``expected`` is the
+    ``stream_params()`` tuple every frame must match. Returns that tuple and
+    the number of samples copied.
+    """
+    samples = 0
+    first = True
+    with open(path, "rb") as f:
+        start, end = audio_bounds(f)
+        for frame, data in _frames(f, start, end):
+            if first:
+                first = False
+                if _is_info_frame(frame, data):
+                    continue
+            params = stream_params(frame)
+            if expected is None:
+                expected = params
+            elif params != expected:
+                raise IncompatibleStreamsError(
+                    f"{path}: {params} does not match {expected}"
+                )
+            out.write(data)
+            samples += frame.samples
+    if expected is None:
+        raise Mp3FormatError(f"No MPEG audio frames found in {path}")
+    return expected, samples
+
+
+def concat_mp3(paths, output_file):
+    """Join MP3 files frame by frame into ``output_file`` without decoding.
+
+    Every input is probed first so incompatible inputs are rejected before
+    anything is written. Returns the total duration in seconds.
+    """
+    expected = None
+    for path in paths:
+        params = stream_params(probe(path))
+        if expected is None:
+            expected = params
+        elif params != expected:
+            raise IncompatibleStreamsError(f"{path}: {params} does not match {expected}")
+    samples = 0
+    with open(output_file, "wb") as out:
+        for path in paths:
+            expected, copied = copy_frames(path, out, expected)
+            samples += copied
+    return samples / expected[2] if expected else 0.0
+
+
+class FrameWriter:
+    """Appends MP3 chunk files to one growing file, one chunk at a time
+    (the same interface as ``tts.webm.ClusterWriter``)."""
+
+    def __init__(self):
+        self.params = None
+
+    def append(self, path, out):
+        """Append the frames of ``path``; returns its duration in seconds."""
+        self.params, samples = copy_frames(path, out, self.params)
+        return samples / self.params[2]
+
+    def finish(self, out):
+        out.seek(0, os.SEEK_END)  # a frame stream needs no trailer
+
+
+def duration(path):
+    """Duration of an MP3 file in seconds, counted from its frame headers."""
+    samples = 0
+    sample_rate = None
+    with open(path, "rb") as f:
+        start, end = audio_bounds(f)
+        for index, (frame, data) in enumerate(_frames(f, start, end)):
+            if index == 0 and _is_info_frame(frame, data):
+                continue
+            samples += frame.samples
+            sample_rate = frame.sample_rate
+    return samples / sample_rate if sample_rate else 0.0
+
+
+def join_audio(paths, output_file):
+    """Concatenate chunk files, falling back to a pydub re-encode when the
+    chunks cannot be joined frame by frame."""
+    try:
+        concat_mp3(paths, output_file)
+    except Mp3FormatError:
+        from pydub import AudioSegment
+
+        combined = AudioSegment.empty()
+        for path in paths:
+            combined += AudioSegment.from_file(path)
+        combined.export(output_file, format="mp3")
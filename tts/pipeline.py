@@ -0,0 +1,164 @@
+"""Headless conversion of one document: extract, prepare, chunk, synthesize, join."""
+
+import json
+import os
+import re
+import shutil
+
+from tts.cache import chunk_key
+from tts.chunker import iter_prepared_sentences
+from tts.extract import iter_text
+from tts.language import VoiceRouter
+from tts.manifest import Manifest
+from tts.formats import DEFAULT_FORMAT, duration, get_format, join_audio
+from tts.incremental import ReuseReport, plan_chunks
+from tts.pronounce import compile_lexicon
+from tts.synth import DEFAULT_CONCURRENCY, synthesize_chunks
+from tts.timing import build_index
+from tts.voices import get_catalog
+
+SUPPORTED_TYPES = ("txt", "pdf", "docx", "doc", "md", "rtf")
+
+
+def clean_text(text):
+    # Keep letters, numbers, spaces, basic punctuation, and specific symbols (-, +)
+    # Remove #, *, and other unwanted symbols
+    text = re.sub(r'[#*]', '', text)
+    return text
+
+
+def timing_path(output_file):
+    return os.path.splitext(output_file)[0] + ".timing.json"
+
+
+def load_pronunciations(path):
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+async def convert_document(
+    source,
+    file_type,
+    output_file,
+    voice,
+    rate,
+    work_dir,
+    pronunciations=None,
+    concurrency=DEFAULT_CONCURRENCY,
+    cache=None,
+    on_progress=None,
+    trace=None,
+    auto_voice=False,
+    timing=False,
+    fmt=DEFAULT_FORMAT,
+    plans=None,
+    document=None,
+    pdf_workers=None,
+):
+    """Convert ``source`` to ``output_file``, resuming from ``work_dir``.
+
+    Text flows lazily from extraction through pronunciation, cleaning and
+    chunking into synthesis. Every finished chunk is kept in ``work_dir``
+    and recorded in its manifest; a rerun after an interruption reuses
+    chunks whose text, voice and rate are unchanged. The work directory is
+    removed once the output is written. Returns a stats dict. With a
+    ``tts.trace.Trace``, extraction and pronunciation time are recorded as
+    one span each, alongside per-chunk synthesis and the final join.
+    With ``auto_voice``, each chunk is spoken by the catalog's default voice
+    for its language (``tts.voices``), falling back to ``voice``.
+    With ``timing``, a word timing index (``tts.timing.TimingIndex``) is
+    saved next to the output as ``<name>.timing.json``. ``fmt`` picks the
+    ``tts.formats.FORMATS`` output format; chunks are requested in it and
+    joined without transcoding. With a ``tts.incremental.PlanStore``, the
+    chunk layout of the previous conversion of ``document`` is reused
+    wherever its sentences are unchanged, so after an edit only the edited
+    chunks miss the cache; ``stats["reuse"]`` reports the avoided work.
+    ``pdf_workers`` caps the PDF extraction pool (``tts.extract.iter_pdf``);
+    callers that already run documents in parallel pass their share.
+    """
+    os.makedirs(work_dir, exist_ok=True)
+    manifest = Manifest(os.path.join(work_dir, "manifest.jsonl"))
+    lexicon = compile_lexicon(pronunciations or {})
+    stats = {"chars": 0, "chunks": 0, "reused": 0, "seconds": 0.0}
+    keys = {}
+    texts = {}
+    layout = []
+    report = ReuseReport()
+    router = VoiceRouter(voice, get_catalog().defaults.values()) if auto_voice else None
+    extension = get_format(fmt).extension
+
+    def prepare(sentence):
+        return clean_text(lexicon.apply(sentence))
+
+    def counted(planned):
+        for chunk in planned:
+            stats["chars"] += len(chunk.text)
+            stats["chunks"] += 1
+            layout.append(chunk)
+            yield chunk.text
+
+    def chunk_path(index):
+        return os.path.join(work_dir, f"{index:05d}.{extension}")
+
+    def already_done(index, chunk, path):
+        if timing:
+            texts[index] = chunk
+        keys[index] = chunk_key(chunk, router.voice_for(chunk) if router else voice, rate, fmt)
+        entry = manifest.get(index)
+        if entry and entry["key"] == keys[index] and os.path.exists(path):
+            stats["reused"] += 1
+            return True
+        return False
+
+    def count_source(index, chunk, source):
+        report.record(chunk, source, layout[index].reused)
+
+    def record(done, total, index):
+        manifest.record(index, key=keys[index])
+        if on_progress:
+            on_progress(done, total, index)
+
+    pieces = iter_text(source, file_type, pdf_workers)
+    if trace:
+        pieces = trace.timed_iter("extract", pieces)
+        prepare = trace.timed_calls("pronunciations", prepare)
+    previous = plans.get(document) if plans else ()
+    chunks = counted(plan_chunks(iter_prepared_sentences(pieces, transform=prepare), previous))
+    paths = await synthesize_chunks(
+        chunks,
+        voice,
+        rate,
+        chunk_path,
+        concurrency=concurrency,
+        on_progress=record,
+        cache=cache,
+        skip=already_done,
+        trace=trace,
+        voice_for=router,
+        timing=timing,
+        fmt=fmt,
+        on_source=count_source,
+    )
+    if trace:
+        prepare.close()
+    if not paths:
+        raise ValueError("No text could be extracted")
+    os.makedirs(os.path.dirname(os.path.abspath(output_file)), exist_ok=True)
+    if trace:
+        with trace.span("concat", bytes_out=0) as span:
+            join_audio(paths, output_file, fmt)
+            span["bytes_out"] = os.path.getsize(output_file)
+    else:
+        join_audio(paths, output_file, fmt)
+    stats["seconds"] = duration(output_file, fmt)
+    if timing:
+        build_index([texts[i] for i in range(len(paths))], paths, fmt).save(timing_path(output_file))
+    if router:
+        stats["voices"] = dict(router.routed)
+    if plans:
+        plans.put(document, [chunk.sentences for chunk in layout])
+    stats["reuse"] = report.to_dict()
+    shutil.rmtree(work_dir, ignore_errors=True)
+    return stats
@@ -0,0 +1,262 @@
+"""Optional clean-up of joined speech: even loudness and tight joins.
+
+Chunks are synthesized separately, so they come back at different levels
+and with their own leading and trailing silence; joined verbatim, the
+output jumps in level and has dead air at every seam. ``level_audio``
+decodes each chunk to 16-bit mono PCM (ffmpeg, or the ``wave`` module for
+WAV files) and works on ``BLOCK_WINDOWS`` loudness windows at a time with
+NumPy. One pass measures the chunk's gated loudness, its peak and where
+speech starts and ends while spooling the PCM to a temp file; a second
+pass over that file applies the chunk's gain, caps the silence on each
+side of a join at ``max_silence`` and, optionally, crossfades into the
+next chunk, streaming the result into one encoder. Only a few blocks and
+one chunk's temp file exist at a time, so memory does not grow with the
+length of the output.
+
+Loudness is the mean square of 400 ms windows gated like ITU-R BS.1770
+(absolute gate at -70 dBFS, relative gate 10 dB below the ungated mean),
+without its K-weighting filter: all chunks come from the same voice, so
+only the relative level matters.
+"""
+
+import os
+import subprocess
+import tempfile
+import wave
+from collections import namedtuple
+
+from tts.formats import get_format, is_mp3, sample_rate
+
+TARGET_DB = -20.0  # gated loudness every chunk is brought to, in dBFS
+PEAK_CEILING_DB = -1.0
+MAX_GAIN_DB = 12.0
+SILENCE_DB = -50.0  # 10 ms frames quieter than this count as silence
+MAX_SILENCE = 0.3  # seconds of silence kept on each side of a join
+WINDOW_SECONDS = 0.4
+FRAME_SECONDS = 0.01
+BLOCK_WINDOWS = 10  # 4 s of audio per block
+ABSOLUTE_GATE_DB = -70.0
+RELATIVE_GATE_DB = -10.0
+FULL_SCALE = 32768.0
+
+# Loudness and peak in dBFS (None for a silent chunk); ``first`` and
+# ``last`` are the first and last samples of speech (None if there is none).
+ChunkStats = namedtuple("ChunkStats", "samples loudness peak first last")
+# Where a chunk ended up: add ``offset_ms`` to a time inside the chunk to get
+# the time in the output. ``trimmed_ms`` is the silence cut from the chunk.
+Placement = namedtuple("Placement", "offset_ms gain_db trimmed_ms")
+
+
+class PostprocessError(Exception):
+    """Raised when a chunk cannot be decoded or the output encoded."""
+
+
+def _db(mean_square):
+    import numpy as np
+
+    return 10 * np.log10(np.maximum(mean_square, 1e-20) / FULL_SCALE ** 2)
+
+
+def read_pcm(path, rate, block_samples):
+    """Yield ``path`` as int16 mono NumPy blocks of ``block_samples`` (the
+    last one may be shorter), decoded at ``rate`` Hz."""
+    import numpy as np
+
+    if path.endswith(".wav"):
+        with wave.open(path, "rb") as f:
+            if f.getsampwidth() != 2 or f.getframerate() != rate:
+                raise PostprocessError(f"{path}: expected 16-bit audio at {rate} Hz")
+            channels = f.getnchannels()
+            while True:
+                data = f.readframes(block_samples)
+                if not data:
+                    return
+                block = np.frombuffer(data, dtype="<i2")
+                if channels > 1:
+                    block = block.reshape(-1, channels).mean(axis=1).astype(np.int16)
+                yield block
+    command = ["ffmpeg", "-v", "error", "-i", path, "-f", "s16le", "-ac", "1", "-ar", str(rate), "-"]
+    try:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except FileNotFoundError:
+        raise PostprocessError("ffmpeg is needed to decode compressed audio") from None
+    try:
+        while True:
+            data = process.stdout.read(block_samples * 2)
+            if not data:
+                break
+            yield np.frombuffer(data[:len(data) // 2 * 2], dtype="<i2")
+    finally:
+        process.stdout.close()
+        error = process.stderr.read().decode("utf-8", "replace").strip()
+        process.stderr.close()
+        if process.wait() and error:
+            raise PostprocessError(f"{path}: {error}")
+
+
+class _WaveEncoder:
+    def __init__(self, output_file, rate):
+        self.file = wave.open(output_file, "wb")
+        self.file.setnchannels(1)
+        self.file.setsampwidth(2)
+        self.file.setframerate(rate)
+
+    def write(self, block):
+        self.file.writeframes(block.astype("<i2").tobytes())
+
+    def close(self):
+        self.file.close()
+
+
+class _FfmpegEncoder:
+    def __init__(self, output_file, rate, fmt):
+        if is_mp3(fmt):
+            codec = ["-c:a", "libmp3lame", "-b:a", f"{get_format(fmt).bitrate // 1000}k", "-f", "mp3"]
+        else:
+            codec = ["-c:a", "libopus", "-b:a", "32k", "-f", "webm"]
+        command = [
+            "ffmpeg", "-v", "error", "-y", "-f", "s16le", "-ar", str(rate), "-ac", "1", "-i", "-",
+            *codec, output_file,
+        ]
+        try:
+            self.process = subprocess.Popen(command, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+        except FileNotFoundError:
+            raise PostprocessError("ffmpeg is needed to encode compressed audio") from None
+
+    def write(self, block):
+        self.process.stdin.write(block.astype("<i2").tobytes())
+
+    def close(self):
+        self.process.stdin.close()
+        error = self.process.stderr.read().decode("utf-8", "replace").strip()
+        if self.process.wait():
+            raise PostprocessError(f"Encoding failed: {error}")
+
+
+def open_encoder(output_file, rate, fmt=None):
+    """A writer taking int16 blocks: WAV for ``.wav`` files, else ffmpeg
+    encoding to ``fmt``."""
+    if output_file.endswith(".wav"):
+        return _WaveEncoder(output_file, rate)
+    return _FfmpegEncoder(output_file, rate, fmt)
+
+
+def measure(blocks, rate, spool=None):
+    """``ChunkStats`` of a stream of int16 blocks, in one pass. Each block
+    must be a whole number of loudness windows except the last. Blocks are
+    also written to the open binary file ``spool`` if given."""
+    import numpy as np
+
+    window = round(WINDOW_SECONDS * rate)
+    frame = round(FRAME_SECONDS * rate)
+    silence = FULL_SCALE ** 2 * 10 ** (SILENCE_DB / 10)
+    window_power = []
+    samples = 0
+    peak = 0
+    first = last = None
+    for block in blocks:
+        if spool is not None:
+            spool.write(block.astype("<i2").tobytes())
+        squares = block.astype(np.float64) ** 2
+        count = len(block) // window * window
+        if count:
+            window_power.append(squares[:count].reshape(-1, window).mean(axis=1))
+        if count < len(block):
+            window_power.append(squares[count:].mean(keepdims=True))
+        frames = len(block) // frame
+        if frames:
+            voiced = np.flatnonzero(squares[:frames * frame].reshape(frames, frame).mean(axis=1) > silence)
+            if len(voiced):
+                if first is None:
+                    first = samples + int(voiced[0]) * frame
+                last = samples + (int(voiced[-1]) + 1) * frame - 1
+        if len(block):
+            peak = max(peak, int(block.max()), -int(block.min()))
+        samples += len(block)
+    if not window_power or first is None:
+        return ChunkStats(samples, None, None, first, last)
+    power = np.concatenate(window_power)
+    gated = power[_db(power) > ABSOLUTE_GATE_DB]
+    if len(gated):
+        gated = gated[_db(gated) > _db(gated.mean()) + RELATIVE_GATE_DB]
+    loudness = float(_db(gated.mean())) if len(gated) else None
+    return ChunkStats(samples, loudness, float(_db(float(peak) ** 2)), first, last)
+
+
+def chunk_gain(stats, target=TARGET_DB):
+    """Gain in dB bringing a chunk to ``target`` without clipping."""
+    if stats.loudness is None:
+        return 0.0
+    gain = min(target - stats.loudness, PEAK_CEILING_DB - stats.peak)
+    return max(-MAX_GAIN_DB, min(MAX_GAIN_DB, gain))
+
+
+def process_chunks(paths, encoder, rate, target=TARGET_DB, max_silence=MAX_SILENCE, crossfade=0.0, work_dir=None):
+    """Level, trim and join ``paths`` into ``encoder``; returns a
+    ``Placement`` per chunk."""
+    import numpy as np
+
+    block_samples = round(WINDOW_SECONDS * rate) * BLOCK_WINDOWS
+    keep = round(max_silence * rate)
+    fade = round(crossfade * rate)
+    held = np.zeros(0, dtype=np.float32)  # output not yet written: the crossfade tail
+    written = 0
+    placements = []
+    for number, path in enumerate(paths):
+        spool, spool_path = tempfile.mkstemp(dir=work_dir, suffix=".pcm")
+        try:
+            with os.fdopen(spool, "wb") as f:
+                stats = measure(read_pcm(path, rate, block_samples), rate, f)
+            gain_db = chunk_gain(stats, target)
+            gain = np.float32(10 ** (gain_db / 20))
+            if stats.first is None:
+                start, end = 0, min(stats.samples, keep)
+            else:
+                start = max(0, stats.first - keep)
+                end = min(stats.samples, stats.last + 1 + keep)
+            placement = None
+            with open(spool_path, "rb") as f:
+                f.seek(start * 2)
+                remaining = end - start
+                while remaining > 0:
+                    block = np.fromfile(f, dtype="<i2", count=min(block_samples, remaining))
+                    if not len(block):
+                        break
+                    remaining -= len(block)
+                    block = block.astype(np.float32) * gain
+                    if placement is None:
+                        if len(held):
+                            # Crossfade the previous chunk's tail into this head.
+                            overlap = min(len(held), len(block))
+                            ramp = np.linspace(0.0, 1.0, overlap, endpoint=False, dtype=np.float32)
+                            block[:overlap] = held[len(held) - overlap:] * (1 - ramp) + block[:overlap] * ramp
+                            held = held[:len(held) - overlap]
+                        placement = (written + len(held) - start) * 1000 / rate
+                    combined = np.concatenate((held, block)) if len(held) else block
+                    cut = max(0, len(combined) - fade)
+                    if cut:
+                        encoder.write(np.clip(combined[:cut], -FULL_SCALE, FULL_SCALE - 1))
+                        written += cut
+                    held = combined[cut:]
+            if placement is None:  # the chunk kept no samples
+                placement = (written + len(held)) * 1000 / rate
+            placements.append(Placement(
+                round(placement), round(gain_db, 2), round((stats.samples - (end - start)) * 1000 / rate)
+            ))
+        finally:
+            os.remove(spool_path)
+    if len(held):
+        encoder.write(np.clip(held, -FULL_SCALE, FULL_SCALE - 1))
+    return placements
+
+
+def level_audio(paths, output_file, fmt, target=TARGET_DB, max_silence=MAX_SILENCE, crossfade=0.0, work_dir=None):
+    """Join chunk files of ``fmt`` into ``output_file`` with even loudness
+    and capped pauses (see the module docstring); returns a ``Placement``
+    per chunk for shifting word timings."""
+    rate = sample_rate(fmt)
+    encoder = open_encoder(output_file, rate, fmt)
+    try:
+        return process_chunks(paths, encoder, rate, target, max_silence, crossfade, work_dir)
+    finally:
+        encoder.close()
@@ -0,0 +1,103 @@
+"""Pronunciation lexicon: single-pass, longest-match substitution."""
+
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+
+# Characters treated as part of a word for whole-word matching. Python's \w
+# leaves out Indic vowel signs and viramas, so the Devanagari..Malayalam
+# blocks (which include Telugu and Kannada) are added explicitly.
+WORD_CHARS = r"\w\u0900-\u0DFF"
+MAX_COMPILED = 16
+
+_compiled = OrderedDict()
+_compiled_lock = threading.Lock()
+
+
+def lexicon_digest(pronunciations):
+    payload = json.dumps(pronunciations, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _trie_pattern(words):
+    """Build a regex whose alternation is factored through a prefix trie.
+
+    Shared prefixes are matched once, and a word that is a prefix of a
+    longer one becomes a greedy optional group, so the regex engine tries
+    the longest entry first and backs off only if it (or the word-boundary
+    check) fails.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = None
+
+    def pattern(node):
+        branches = [re.escape(char) + pattern(child) for char, child in node.items() if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return pattern(trie)
+
+
+class Lexicon:
+    """A compiled pronunciation table; ``apply()`` rewrites text in one pass.
+
+    Matching runs left to right and always takes the longest entry at a
+    position. Replacements are never re-scanned, so one entry cannot rewrite
+    another's output. With ``whole_words`` an entry only matches when it is
+    not glued to other word characters; with ``ignore_case`` entries match
+    regardless of case.
+    """
+
+    def __init__(self, pronunciations, whole_words=True, ignore_case=False):
+        self.digest = lexicon_digest(pronunciations)
+        self.whole_words = whole_words
+        self.ignore_case = ignore_case
+        self._table = {
+            (word.lower() if ignore_case else word): pron
+            for word, pron in pronunciations.items()
+            if word
+        }
+        self._regex = None
+        if self._table:
+            body = _trie_pattern(self._table)
+            if whole_words:
+                body = f"(?<![{WORD_CHARS}])(?:{body})(?![{WORD_CHARS}])"
+            self._regex = re.compile(body, re.IGNORECASE if ignore_case else 0)
+
+    def _replace(self, match):
+        word = match.group(0)
+        return self._table[word.lower() if self.ignore_case else word]
+
+    def apply(self, text):
+        if self._regex is None:
+            return text
+        return self._regex.sub(self._replace, text)
+
+
+def compile_lexicon(pronunciations, whole_words=True, ignore_case=False):
+    """Return a ``Lexicon``, reusing a compiled one for identical content."""
+    key = (lexicon_digest(pronunciations), whole_words, ignore_case)
+    with _compiled_lock:
+        lexicon = _compiled.get(key)
+        if lexicon is not None:
+            _compiled.move_to_end(key)
+            return lexicon
+    lexicon = Lexicon(pronunciations, whole_words, ignore_case)
+    with _compiled_lock:
+        _compiled[key] = lexicon
+        while len(_compiled) > MAX_COMPILED:
+            _compiled.popitem(last=False)
+    return lexicon
+
+
+# Apply pronunciations once
+def apply_pronunciations(text, pronunciations, whole_words=True, ignore_case=False):
+    return compile_lexicon(pronunciations, whole_words, ignore_case).apply(text)
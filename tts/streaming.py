@@ -0,0 +1,264 @@
+"""Audio delivery from disk: a job's audio is served to the browser while it
+is still being synthesized, and finished files are served with HTTP range
+support (seeking, resumable downloads). Files are read in fixed-size blocks,
+so server memory does not grow with the length of the audio. Finished
+entries and their files are deleted after a TTL.
+"""
+
+import os
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlsplit
+
+from tts.formats import DEFAULT_FORMAT, get_format, writer
+
+STREAM_DIR = os.environ.get("TTS_STREAM_DIR", ".tts_streams")
+STREAM_HOST = os.environ.get("TTS_STREAM_HOST", "0.0.0.0")
+STREAM_PORT = int(os.environ.get("TTS_STREAM_PORT", "8765"))
+# Address the browser uses to reach the stream server (differs behind a proxy)
+STREAM_BASE_URL = os.environ.get("TTS_STREAM_BASE_URL", f"http://localhost:{STREAM_PORT}")
+STREAM_TTL = int(os.environ.get("TTS_STREAM_TTL", "3600"))
+SWEEP_INTERVAL = 60  # seconds between background sweeps of expired files
+READ_SIZE = 64 * 1024
+_RANGE = re.compile(r"bytes=(\d*)-(\d*)$")
+_SAFE_FILENAME = re.compile(r"[^A-Za-z0-9._-]")
+
+
+class AudioStream:
+    """One growing audio file fed with chunks that may finish out of order.
+
+    ``publish()`` buffers finished chunk files and appends their audio to
+    the output strictly in chunk order, so readers tailing the file always
+    see a playable prefix of the document. With ``finished``, ``path`` is
+    an existing, complete file that is only served.
+    """
+
+    def __init__(self, stream_id, path, fmt=DEFAULT_FORMAT, finished=False):
+        self.id = stream_id
+        self.path = path
+        self.format = get_format(fmt)
+        self.size = 0
+        self.done = False
+        self.error = None
+        self.finished_at = None
+        self._writer = writer(fmt)
+        self._pending = {}
+        self._next = 0
+        self._cond = threading.Condition()
+        if finished:
+            self.size = os.path.getsize(path)
+            self.done = True
+            self.finished_at = time.time()
+        else:
+            open(path, "wb").close()
+
+    def publish(self, index, chunk_path):
+        with self._cond:
+            self._pending[index] = chunk_path
+            if self._next not in self._pending:
+                return
+            with open(self.path, "ab") as out:
+                while self._next in self._pending:
+                    chunk = self._pending.pop(self._next)
+                    self._writer.append(chunk, out)
+                    self._next += 1
+                self.size = out.tell()
+            self._cond.notify_all()
+
+    def finish(self, error=None):
+        with self._cond:
+            if error is None and self.size:
+                with open(self.path, "r+b") as out:
+                    self._writer.finish(out)
+                    self.size = out.tell()
+            self.done = True
+            self.error = error
+            self.finished_at = time.time()
+            self._cond.notify_all()
+
+    def wait_for(self, offset, timeout=30):
+        """Block until bytes past ``offset`` exist; returns the readable size,
+        or None once the stream is finished and fully read."""
+        with self._cond:
+            self._cond.wait_for(lambda: self.size > offset or self.done, timeout)
+            if self.size > offset:
+                return self.size
+            return None if self.done else offset
+
+
+class StreamRegistry:
+    def __init__(self, directory=STREAM_DIR, ttl=STREAM_TTL):
+        self.directory = directory
+        self.ttl = ttl
+        self._streams = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def create(self, fmt=DEFAULT_FORMAT):
+        self.sweep()
+        stream_id = uuid.uuid4().hex
+        extension = get_format(fmt).extension
+        stream = AudioStream(stream_id, os.path.join(self.directory, f"{stream_id}.{extension}"), fmt)
+        with self._lock:
+            self._streams[stream_id] = stream
+        return stream
+
+    def add(self, path, fmt=DEFAULT_FORMAT):
+        """Serve an already finished file; it is deleted with the entry
+        once the TTL has passed."""
+        self.sweep()
+        stream = AudioStream(uuid.uuid4().hex, path, fmt, finished=True)
+        with self._lock:
+            self._streams[stream.id] = stream
+        return stream
+
+    def get(self, stream_id):
+        with self._lock:
+            return self._streams.get(stream_id)
+
+    def sweep(self):
+        """Forget finished streams older than the TTL and delete their files."""
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            expired = [
+                s for s in self._streams.values() if s.done and s.finished_at < cutoff
+            ]
+            for stream in expired:
+                del self._streams[stream.id]
+        for stream in expired:
+            if os.path.exists(stream.path):
+                os.remove(stream.path)
+
+
+class _StreamHandler(BaseHTTPRequestHandler):
+    registry = None
+
+    def do_GET(self):
+        self._serve(body=True)
+
+    def do_HEAD(self):
+        self._serve(body=False)
+
+    def _serve(self, body):
+        url = urlsplit(self.path)
+        parts = url.path.strip("/").split("/")
+        stream = None
+        if len(parts) == 2 and parts[0] == "stream":
+            stream = self.registry.get(parts[1].rsplit(".", 1)[0])
+        if stream is None or not os.path.exists(stream.path):
+            self.send_error(404)
+            return
+        download = parse_qs(url.query).get("download")
+        try:
+            if stream.done:
+                self._send_file(stream, download, body)
+            else:
+                self._send_growing(stream, download, body)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def _send_headers(self, status, stream, download, headers=()):
+        self.send_response(status)
+        self.send_header("Content-Type", stream.format.mime)
+        if download:
+            name = _SAFE_FILENAME.sub("_", download[0]) or f"audio.{stream.format.extension}"
+            self.send_header("Content-Disposition", f"attachment; filename=\"{name}\"; filename*=UTF-8''{quote(name)}")
+        for header in headers:
+            self.send_header(*header)
+        self.end_headers()
+
+    def _send_file(self, stream, download, body):
+        """A finished file: Content-Length, and single byte ranges for
+        seeking and resumed downloads."""
+        size = stream.size
+        start, end = 0, size - 1
+        status = 200
+        match = _RANGE.match(self.headers.get("Range", "").strip())
+        if match and match.group(1) + match.group(2):
+            first, last = match.groups()
+            if first:
+                start = int(first)
+                end = min(int(last), size - 1) if last else size - 1
+            else:
+                start = max(0, size - int(last))
+            if start > end or start >= size:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            status = 206
+        headers = [
+            ("Accept-Ranges", "bytes"),
+            ("Content-Length", str(end - start + 1)),
+            ("Cache-Control", f"private, max-age={self.registry.ttl}"),
+        ]
+        if status == 206:
+            headers.append(("Content-Range", f"bytes {start}-{end}/{size}"))
+        self._send_headers(status, stream, download, headers)
+        if not body:
+            return
+        with open(stream.path, "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                data = f.read(min(READ_SIZE, remaining))
+                if not data:
+                    break
+                self.wfile.write(data)
+                remaining -= len(data)
+
+    def _send_growing(self, stream, download, body):
+        # No Content-Length: the body ends when the connection closes, which
+        # lets the browser start playing before the total size is known.
+        self._send_headers(200, stream, download, [("Cache-Control", "no-store"), ("Connection", "close")])
+        if not body:
+            return
+        offset = 0
+        with open(stream.path, "rb") as f:
+            while True:
+                size = stream.wait_for(offset)
+                if size is None:
+                    break
+                f.seek(offset)
+                while offset < size:
+                    data = f.read(min(READ_SIZE, size - offset))
+                    self.wfile.write(data)
+                    offset += len(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StreamServer:
+    """Background HTTP server exposing ``GET /stream/<id>.<extension>``;
+    ``?download=<name>`` serves the file as an attachment named ``name``.
+    Expired entries are swept every ``SWEEP_INTERVAL`` seconds."""
+
+    def __init__(self, host=STREAM_HOST, port=STREAM_PORT, base_url=STREAM_BASE_URL):
+        self.registry = StreamRegistry()
+        self.base_url = base_url.rstrip("/")
+        handler = type("StreamHandler", (_StreamHandler,), {"registry": self.registry})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        self._sweeper = threading.Thread(target=self._sweep_periodically, daemon=True)
+        self._sweeper.start()
+
+    def url(self, stream, download=None):
+        url = f"{self.base_url}/stream/{stream.id}.{stream.format.extension}"
+        return f"{url}?download={quote(download)}" if download else url
+
+    def _sweep_periodically(self):
+        while not self._stop.wait(SWEEP_INTERVAL):
+            self.registry.sweep()
+
+    def shutdown(self):
+        self._stop.set()
+        self.httpd.shutdown()
+        self.httpd.server_close()
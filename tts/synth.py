@@ -0,0 +1,194 @@
+"""Edge-TTS synthesis: single chunks and pipelined, order-preserving jobs."""
+
+import asyncio
+import os
+import time
+
+from tts.cache import chunk_key
+from tts.client import get_client, use_endpoint  # noqa: F401 (re-exported)
+from tts.formats import DEFAULT_FORMAT, get_format
+from tts.timing import words_path
+
+DEFAULT_CONCURRENCY = 4
+_END = object()
+
+
+class ChunkSynthesisError(Exception):
+    """Raised when a chunk still fails after all retries."""
+
+    def __init__(self, index, text, voice, rate, cause):
+        super().__init__(f"Failed to generate audio chunk {index}: {cause}")
+        self.index = index
+        self.text = text
+        self.voice = voice
+        self.rate = rate
+        self.cause = cause
+
+    def __reduce__(self):
+        # Keep the error picklable so it can cross process-pool boundaries.
+        return type(self), (self.index, self.text, self.voice, self.rate, self.cause)
+
+
+# Async TTS Generation for a single chunk
+async def generate_speech_chunk(text, voice, rate, output_file, retries=3, on_retry=None, words_file=None,
+                                slot=None, on_connect=None, fmt=DEFAULT_FORMAT):
+    # Word boundaries are only requested when they are saved.
+    await get_client().synthesize(
+        text, voice, rate, output_file, words_file,
+        retries=retries, on_retry=on_retry, slot=slot, on_connect=on_connect, fmt=fmt,
+    )
+
+
+async def synthesize_chunks(
+    chunks,
+    voice,
+    rate,
+    output_path,
+    concurrency=DEFAULT_CONCURRENCY,
+    on_progress=None,
+    on_retry=None,
+    retries=3,
+    cache=None,
+    skip=None,
+    trace=None,
+    voice_for=None,
+    timing=False,
+    limiter=None,
+    fmt=DEFAULT_FORMAT,
+    on_source=None,
+):
+    """Synthesize ``chunks`` concurrently on the running loop.
+
+    ``output_path(index)`` names the file for each chunk. At most
+    ``concurrency`` requests are in flight; the next chunk is only pulled
+    from ``chunks`` (a list or any iterator) once a slot frees up.
+    ``on_progress(done, total, index)`` fires as each chunk lands (``total``
+    is None for plain iterators).
+    Returns the output paths in chunk order; the first failure cancels the
+    remaining work and is raised as ``ChunkSynthesisError``. With a
+    ``ChunkCache``, cached chunks are copied out without a network request
+    and fresh ones are stored after synthesis. ``skip(index, chunk, path)``
+    may return True when ``path`` already holds the chunk's audio (e.g. from
+    an interrupted run); such chunks only report progress. With a
+    ``tts.trace.Trace`` every chunk is recorded as a ``synthesize_chunk``
+    span with its byte sizes, retries and where the audio came from.
+    ``voice_for(chunk)`` may pick a voice per chunk (see
+    ``tts.language.VoiceRouter``); ``voice`` is used otherwise. With
+    ``timing``, each chunk's word boundaries are saved (and cached) next
+    to its audio in ``tts.timing.words_path(path)``. ``limiter(voice)``
+    may return an async context manager held around each request attempt
+    to the service (e.g. a shared per-voice slot from
+    ``tts.jobs.JobQueue``). Requests go through the running loop's
+    ``tts.client.TTSClient``; with a trace, every new connection it opens
+    is recorded as a ``connect`` span. ``fmt`` is the
+    ``tts.formats.FORMATS`` key every chunk is requested in.
+    ``on_source(index, chunk, source)`` fires once per chunk with where its
+    audio came from: ``"network"``, ``"cache"``, ``"resumed"`` or
+    ``"failed"``.
+    """
+    total = len(chunks) if hasattr(chunks, "__len__") else None
+    iterator = iter(chunks)
+    if total is None:
+        # A lazy source (e.g. extraction still parsing a PDF) is advanced in
+        # a worker thread so in-flight requests keep running meanwhile.
+        loop = asyncio.get_running_loop()
+
+        async def next_chunk():
+            return await loop.run_in_executor(None, next, iterator, _END)
+    else:
+        async def next_chunk():
+            return next(iterator, _END)
+
+    extension = get_format(fmt).extension
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    paths = []
+    tasks = []
+    done = 0
+
+    async def run(index, chunk, path):
+        nonlocal done
+        start = time.perf_counter()
+        attempts = 0
+        source = "resumed"
+        chunk_voice = voice_for(chunk) if voice_for else voice
+
+        def count_retry(attempt, retries, error):
+            nonlocal attempts
+            attempts = attempt
+            if on_retry:
+                on_retry(attempt, retries, error)
+
+        def record_connect(connect_start, seconds):
+            trace.add("connect", connect_start, seconds, index=index, voice=chunk_voice)
+
+        try:
+            if not (skip and skip(index, chunk, path)):
+                source = "cache"
+                key = chunk_key(chunk, chunk_voice, rate, fmt) if cache else None
+                words = words_path(path) if timing else None
+                # A hit needs the audio and, with timing, its words sidecar.
+                cached = bool(cache) and cache.fetch(key, path, extension, count=False) and (
+                    not words or cache.fetch(key, words, "words", count=False)
+                )
+                if cache:
+                    cache.record(cached)
+                if not cached:
+                    source = "network"
+                    await generate_speech_chunk(
+                        chunk, chunk_voice, rate, path, retries, count_retry, words,
+                        slot=(lambda: limiter(chunk_voice)) if limiter else None,
+                        on_connect=record_connect if trace else None, fmt=fmt,
+                    )
+                    if cache:
+                        cache.put(key, path, extension)
+                        if words:
+                            cache.put(key, words, "words")
+        except Exception as e:
+            source = "failed"
+            raise ChunkSynthesisError(index, chunk, chunk_voice, rate, e) from e
+        finally:
+            semaphore.release()
+            if on_source:
+                on_source(index, chunk, source)
+            if trace:
+                trace.add(
+                    "synthesize_chunk", start, time.perf_counter() - start,
+                    index=index, source=source, voice=chunk_voice, retries=attempts,
+                    bytes_in=len(chunk.encode("utf-8")),
+                    bytes_out=os.path.getsize(path) if os.path.exists(path) else 0,
+                )
+        done += 1
+        if on_progress:
+            on_progress(done, total, index)
+
+    try:
+        index = 0
+        while True:
+            await semaphore.acquire()
+            failed = any(t.done() and t.exception() for t in tasks)
+            chunk = _END if failed else await next_chunk()
+            if chunk is _END:
+                semaphore.release()
+                break
+            path = output_path(index)
+            paths.append(path)
+            tasks.append(asyncio.ensure_future(run(index, chunk, path)))
+            index += 1
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    return paths
+
+
+# Helper function to run async code safely in Streamlit
+def run_async(coro):
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(coro)
+    finally:
+        loop.run_until_complete(get_client(loop).close())
+        loop.close()
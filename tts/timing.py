@@ -0,0 +1,132 @@
+"""Word timing for synthesized audio, built from Edge-TTS word boundaries.
+
+Synthesis can save each chunk's ``WordBoundary`` events next to its audio
+(see ``words_path``). Once the chunks are joined, ``build_index`` shifts
+every chunk's offsets by the duration of the audio before it and packs the
+result into a ``TimingIndex``: parallel arrays of word start times and
+durations in milliseconds plus the index of the first word of each
+sentence, searchable with ``bisect``.
+"""
+
+import json
+from array import array
+from bisect import bisect_right
+
+from tts.chunker import SENTENCE_END
+from tts.formats import DEFAULT_FORMAT, duration
+
+TICKS_PER_MS = 10_000  # Edge-TTS offsets are in 100 ns ticks
+
+
+def words_path(audio_path):
+    """Sidecar file holding the word boundaries of ``audio_path``."""
+    return audio_path + ".words.jsonl"
+
+
+def read_boundaries(path):
+    """``[(offset_ms, duration_ms, word), ...]`` from an edge-tts metadata file."""
+    boundaries = []
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                event = json.loads(line)
+                if event.get("type") == "WordBoundary":
+                    boundaries.append((
+                        event["offset"] // TICKS_PER_MS,
+                        event["duration"] // TICKS_PER_MS,
+                        event["text"],
+                    ))
+    except FileNotFoundError:
+        pass
+    return boundaries
+
+
+class TimingIndex:
+    """Sorted word start times (ms) for one audio file.
+
+    ``starts``, ``durations`` and ``words`` are parallel; ``sentences`` holds
+    the index of the first word of every sentence, in order.
+    """
+
+    def __init__(self, words=(), starts=(), durations=(), sentences=()):
+        self.words = list(words)
+        self.starts = array("L", starts)
+        self.durations = array("L", durations)
+        self.sentences = array("L", sentences)
+
+    def __len__(self):
+        return len(self.words)
+
+    def add_chunk(self, text, boundaries, audio_start_ms):
+        """Append one chunk's words, shifted to where its audio begins.
+
+        Words are matched to ``text`` in order to find which ones open a
+        sentence; the first word of every chunk always does.
+        """
+        sentence_starts = [0] + [m.end() for m in SENTENCE_END.finditer(text)]
+        next_sentence = 0
+        cursor = 0
+        for offset, length, word in sorted(boundaries):
+            found = text.find(word, cursor)
+            position = found if found >= 0 else cursor
+            if next_sentence < len(sentence_starts) and position >= sentence_starts[next_sentence]:
+                self.sentences.append(len(self.words))
+                while next_sentence < len(sentence_starts) and position >= sentence_starts[next_sentence]:
+                    next_sentence += 1
+            if found >= 0:
+                cursor = found + len(word)
+            start = max(0, audio_start_ms + offset)
+            if self.starts and start < self.starts[-1]:
+                start = self.starts[-1]  # keep the array sorted
+            self.words.append(word)
+            self.starts.append(start)
+            self.durations.append(length)
+
+    def word_at(self, ms):
+        """Index of the word being spoken at ``ms``, or -1 before the first."""
+        return bisect_right(self.starts, ms) - 1
+
+    def sentence_at(self, ms):
+        """Index (into ``sentences``) of the sentence being spoken at ``ms``."""
+        return bisect_right(self.sentences, max(self.word_at(ms), 0)) - 1
+
+    def sentence_start(self, sentence):
+        """Millisecond offset to seek to for ``sentence``."""
+        return self.starts[self.sentences[sentence]]
+
+    def to_dict(self):
+        return {
+            "words": self.words,
+            "starts": self.starts.tolist(),
+            "durations": self.durations.tolist(),
+            "sentences": self.sentences.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["words"], data["starts"], data["durations"], data["sentences"])
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, separators=(",", ":"))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+def build_index(texts, paths, fmt=DEFAULT_FORMAT, offsets=None):
+    """Index for the concatenation of ``paths`` (chunk audio of ``fmt``, in
+    order) whose texts are ``texts``, reading each chunk's ``words_path``
+    sidecar. ``offsets`` gives where each chunk starts in the output (ms)
+    when that is not simply the sum of the durations before it, e.g. after
+    ``tts.postprocess`` trimmed silence."""
+    index = TimingIndex()
+    elapsed_ms = 0
+    for number, (text, path) in enumerate(zip(texts, paths)):
+        start_ms = offsets[number] if offsets is not None else elapsed_ms
+        index.add_chunk(text, read_boundaries(words_path(path)), start_ms)
+        if offsets is None:
+            elapsed_ms += round(duration(path, fmt) * 1000)
+    return index
@@ -0,0 +1,218 @@
+"""Per-stage pipeline instrumentation with JSON-lines and Chrome trace export.
+
+A ``Trace`` collects spans (stage name, wall time, bytes in/out, retries
+and any other fields) for one conversion. ``summary()`` aggregates them per
+stage for the UI; ``write_jsonl()`` appends one line per span for offline
+aggregation and ``write_chrome()`` produces a file that loads in
+chrome://tracing or Perfetto. Aggregate JSON-lines files from many
+sessions with::
+
+    python -m tts.trace traces/*.jsonl
+
+Set ``TTS_TRACE_DIR`` to export every conversion automatically.
+"""
+
+import json
+import math
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# When set, every traced conversion is exported here (see Trace.export).
+TRACE_DIR = os.environ.get("TTS_TRACE_DIR")
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return 0.0
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+class Trace:
+    def __init__(self, job_id=None):
+        self.job_id = job_id or uuid.uuid4().hex
+        self.started = time.time()
+        self._origin = time.perf_counter()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, name, start, duration, **fields):
+        """Record a span; ``start`` is a ``time.perf_counter()`` value."""
+        span = dict(fields, name=name, start=start - self._origin, duration=duration)
+        with self._lock:
+            self.spans.append(span)
+        return span
+
+    @contextmanager
+    def span(self, name, **fields):
+        """Time a block. The yielded dict can be updated with e.g. ``bytes_out``."""
+        start = time.perf_counter()
+        fields = dict(fields)
+        try:
+            yield fields
+        finally:
+            self.add(name, start, time.perf_counter() - start, **fields)
+
+    def timed_iter(self, name, iterable, **fields):
+        """Yield from ``iterable``, recording the time spent producing items
+        (not consuming them) as a single span once it is exhausted."""
+        iterator = iter(iterable)
+        first = None
+        busy = 0.0
+        items = 0
+        size = 0
+        try:
+            while True:
+                start = time.perf_counter()
+                first = first or start
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    busy += time.perf_counter() - start
+                items += 1
+                size += len(item.encode("utf-8")) if isinstance(item, str) else 0
+                yield item
+        finally:
+            if first is not None:
+                self.add(name, first, busy, items=items, bytes_out=size, **fields)
+
+    def timed_calls(self, name, func):
+        """Wrap a function called many times (e.g. per sentence); its total
+        time and text sizes go into one span when ``.close()`` is called."""
+        return _CallTimer(self, name, func)
+
+    def export(self, directory=None):
+        """Append to ``<dir>/traces-<date>.jsonl`` and write ``<dir>/<job>.trace.json``."""
+        directory = directory or TRACE_DIR
+        if not directory:
+            return
+        self.write_jsonl(os.path.join(directory, time.strftime("traces-%Y%m%d.jsonl")))
+        safe_id = "".join(c if c.isalnum() or c in "-_." else "_" for c in self.job_id)
+        self.write_chrome(os.path.join(directory, f"{safe_id}.trace.json"))
+
+    def summary(self):
+        """Per-stage rows in first-seen order: count, total/p50/p95/max seconds,
+        bytes in/out and retries."""
+        stages = {}
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            stage = stages.setdefault(span["name"], {
+                "stage": span["name"], "count": 0, "durations": [],
+                "bytes_in": 0, "bytes_out": 0, "retries": 0,
+            })
+            stage["count"] += 1
+            stage["durations"].append(span["duration"])
+            for field in ("bytes_in", "bytes_out", "retries"):
+                stage[field] += span.get(field, 0) or 0
+        rows = []
+        for stage in stages.values():
+            durations = sorted(stage.pop("durations"))
+            stage.update(
+                total_s=round(sum(durations), 4),
+                p50_s=round(percentile(durations, 0.5), 4),
+                p95_s=round(percentile(durations, 0.95), 4),
+                max_s=round(durations[-1], 4),
+            )
+            rows.append(stage)
+        return rows
+
+    def write_jsonl(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._lock:
+            lines = [
+                json.dumps(dict(span, job=self.job_id, ts=self.started + span["start"]),
+                           ensure_ascii=False)
+                for span in self.spans
+            ]
+        with open(path, "a", encoding="utf-8") as f:
+            f.write("".join(line + "\n" for line in lines))
+
+    def chrome_events(self):
+        """Complete ("X") events; overlapping spans are spread over lanes
+        (thread ids) so concurrent chunks render side by side."""
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span["start"])
+        lane_ends = []
+        events = []
+        for span in spans:
+            end = span["start"] + span["duration"]
+            lane = next((i for i, busy in enumerate(lane_ends) if busy <= span["start"]), None)
+            if lane is None:
+                lane = len(lane_ends)
+                lane_ends.append(end)
+            else:
+                lane_ends[lane] = end
+            args = {k: v for k, v in span.items() if k not in ("name", "start", "duration")}
+            events.append({
+                "name": span["name"], "cat": "tts", "ph": "X", "pid": 1, "tid": lane,
+                "ts": round(span["start"] * 1e6), "dur": round(span["duration"] * 1e6),
+                "args": args,
+            })
+        return events
+
+    def chrome_json(self):
+        return json.dumps({"traceEvents": self.chrome_events(), "otherData": {"job": self.job_id}})
+
+    def write_chrome(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.chrome_json())
+
+
+class _CallTimer:
+    def __init__(self, trace, name, func):
+        self.trace = trace
+        self.name = name
+        self.func = func
+        self.first = None
+        self.busy = 0.0
+        self.calls = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def __call__(self, text):
+        start = time.perf_counter()
+        self.first = self.first or start
+        result = self.func(text)
+        self.busy += time.perf_counter() - start
+        self.calls += 1
+        self.bytes_in += len(text.encode("utf-8"))
+        self.bytes_out += len(result.encode("utf-8"))
+        return result
+
+    def close(self):
+        if self.first is not None:
+            self.trace.add(self.name, self.first, self.busy, calls=self.calls,
+                           bytes_in=self.bytes_in, bytes_out=self.bytes_out)
+
+
+def summarize(paths):
+    """Print latency percentiles per stage across JSON-lines trace files."""
+    durations = {}
+    jobs = set()
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    span = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                jobs.add(span.get("job"))
+                durations.setdefault(span["name"], []).append(span["duration"])
+    print(f"{len(jobs)} job(s)")
+    print(f"{'stage':<24} {'count':>7} {'p50 s':>8} {'p90 s':>8} {'p99 s':>8} {'max s':>8}")
+    for name, values in durations.items():
+        values.sort()
+        print(f"{name:<24} {len(values):>7} {percentile(values, 0.5):>8.3f}"
+              f" {percentile(values, 0.9):>8.3f} {percentile(values, 0.99):>8.3f} {values[-1]:>8.3f}")
+
+
+if __name__ == "__main__":
+    summarize(sys.argv[1:])
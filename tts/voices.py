@@ -0,0 +1,197 @@
+"""Edge voice catalog and the speaking rates offered by the app and the headless tools.
+
+The service offers a few hundred voices. ``load_catalog`` fetches that list
+at most once per ``VOICE_TTL`` and keeps it in a small JSON file on disk;
+when the service cannot be reached it falls back to the stale file, then to
+the snapshot bundled with the package, so the app starts offline and a
+Streamlit rerun never lists voices over the network. ``VoiceCatalog``
+indexes the voices by short name, locale, language and gender when it is
+built, so every lookup is a dict access.
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+VOICE_CACHE = os.environ.get("TTS_VOICE_CACHE", ".tts_voices.json")
+VOICE_TTL = float(os.environ.get("TTS_VOICE_TTL", str(24 * 3600)))
+FETCH_TIMEOUT = 10
+SNAPSHOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "voices.json")
+
+# The voices the app used to offer: listed first for their languages, so
+# they stay the defaults for language matching and auto voice routing.
+FEATURED = (
+    "en-US-DavisNeural",
+    "en-US-AriaNeural",
+    "te-IN-MohanNeural",
+    "te-IN-ShrutiNeural",
+    "kn-IN-SapnaNeural",
+    "kn-IN-GaganNeural",
+)
+DEFAULT_VOICE = FEATURED[0]
+
+# ``name`` is the short name the service expects (``"te-IN-MohanNeural"``),
+# ``language`` the ISO 639-1 code of its locale and ``label`` what the
+# sidebar shows (``"MohanNeural - Male"``).
+Voice = namedtuple("Voice", "name locale language gender label")
+
+
+def make_voice(entry):
+    """A ``Voice`` from one entry of the service's voice list."""
+    name = entry["ShortName"]
+    locale = entry["Locale"]
+    gender = entry.get("Gender", "")
+    label = name[len(locale) + 1:] if name.startswith(locale + "-") else name
+    return Voice(name, locale, locale.split("-", 1)[0].lower(), gender, f"{label} - {gender}")
+
+
+class VoiceCatalog:
+    """All voices, indexed once for O(1) lookups."""
+
+    def __init__(self, voices, source="snapshot"):
+        featured = {name: i for i, name in enumerate(FEATURED)}
+        self.voices = tuple(sorted(voices, key=lambda v: (v.locale, featured.get(v.name, len(featured)), v.name)))
+        self.source = source
+        self.by_name = {}
+        self.by_locale = {}
+        self.by_language = {}
+        self.by_gender = {}
+        for voice in self.voices:
+            self.by_name[voice.name] = voice
+            self.by_locale.setdefault(voice.locale, []).append(voice)
+            self.by_language.setdefault(voice.language, []).append(voice)
+            self.by_gender.setdefault(voice.gender.lower(), []).append(voice)
+        # One voice per language for matching text to a voice: a featured
+        # voice where there is one, else the first voice of the locale with
+        # the most voices (en-US over en-GB, zh-CN over zh-TW).
+        self.defaults = {}
+        for language, voices in self.by_language.items():
+            chosen = next((v for v in voices if v.name in featured), None)
+            if chosen is None:
+                locale = max(
+                    {v.locale for v in voices},
+                    key=lambda locale: (len(self.by_locale[locale]), locale == f"{language}-{language.upper()}"),
+                )
+                chosen = self.by_locale[locale][0]
+            self.defaults[language] = chosen.name
+
+    def __len__(self):
+        return len(self.voices)
+
+    def __contains__(self, name):
+        return name in self.by_name
+
+    def get(self, name):
+        return self.by_name.get(name)
+
+    def locales(self):
+        return list(self.by_locale)
+
+    def voice_for_language(self, language):
+        """The default voice for an ISO 639-1 code, or None."""
+        return self.defaults.get(language)
+
+    def find(self, locale=None, language=None, gender=None):
+        """Voices matching every given attribute, in catalog order."""
+        lookups = []
+        if locale is not None:
+            lookups.append(self.by_locale.get(locale, ()))
+        if language is not None:
+            lookups.append(self.by_language.get(language, ()))
+        if gender is not None:
+            lookups.append(self.by_gender.get(gender.lower(), ()))
+        if not lookups:
+            return list(self.voices)
+        smallest = min(lookups, key=len)
+        return [
+            voice for voice in smallest
+            if (locale is None or voice.locale == locale)
+            and (language is None or voice.language == language)
+            and (gender is None or voice.gender.lower() == gender.lower())
+        ]
+
+
+def fetch_voices(timeout=FETCH_TIMEOUT):
+    """The service's voice list. Runs on its own event loop in a helper
+    thread, so it can be called from async code too."""
+    from edge_tts import list_voices
+
+    async def fetch():
+        return await asyncio.wait_for(list_voices(), timeout)
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(asyncio.run, fetch()).result()
+
+
+def _read(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [make_voice(entry) for entry in json.load(f)]
+
+
+def _write(path, entries):
+    # Only the fields the catalog uses; the full list is ~100 KB of tags.
+    fields = ("ShortName", "Locale", "Gender")
+    trimmed = [{field: entry.get(field, "") for field in fields} for entry in entries]
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temp = tempfile.mkstemp(dir=directory, prefix=".tmp-voices-")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(trimmed, f, separators=(",", ":"))
+        os.replace(temp, path)
+    except BaseException:
+        if os.path.exists(temp):
+            os.remove(temp)
+        raise
+
+
+def load_catalog(path=VOICE_CACHE, ttl=VOICE_TTL, refresh=False, fetch=fetch_voices):
+    """The voice catalog from the disk cache while it is younger than
+    ``ttl`` seconds, else freshly fetched; the stale cache or the bundled
+    snapshot is used when fetching fails."""
+    try:
+        age = time.time() - os.path.getmtime(path)
+    except OSError:
+        age = None
+    if age is not None and age < ttl and not refresh:
+        try:
+            return VoiceCatalog(_read(path), source="cache")
+        except (OSError, ValueError, KeyError):
+            pass
+    try:
+        entries = fetch()
+        voices = [make_voice(entry) for entry in entries]
+    except Exception:
+        if age is not None:
+            try:
+                return VoiceCatalog(_read(path), source="cache")
+            except (OSError, ValueError, KeyError):
+                pass
+        return VoiceCatalog(_read(SNAPSHOT), source="snapshot")
+    try:
+        _write(path, entries)
+    except OSError:
+        pass  # a read-only directory only costs a fetch per process
+    return VoiceCatalog(voices, source="service")
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog():
+    """The process-wide catalog, loaded on first use."""
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = load_catalog()
+        return _catalog
+
+
+speed_map = {"Fast": "+25%", "Normal": "+0%", "Slow": "-25%"}
+rate_map = {"Fast": 1.25, "Normal": 1.0, "Slow": 0.75}
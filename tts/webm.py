@@ -0,0 +1,326 @@
+"""WebM (Matroska) Opus handling: parse clusters, join chunks without re-encoding.
+
+Each synthesized chunk is a complete WebM file. ``ClusterWriter`` copies
+the EBML header, segment info and tracks of the first chunk, then the
+clusters of every chunk with their timecodes shifted by the audio before
+them. Block payloads are copied verbatim. The segment is written with an
+unknown size and reserved space, so a file that is still growing is a
+playable live stream. ``finish()`` appends cues and patches in the
+segment size, duration and seek head so the finished file is seekable.
+"""
+
+import os
+import struct
+from collections import namedtuple
+
+EBML = 0x1A45DFA3
+SEGMENT = 0x18538067
+SEEK_HEAD = 0x114D9B74
+SEEK = 0x4DBB
+SEEK_ID = 0x53AB
+SEEK_POSITION = 0x53AC
+INFO = 0x1549A966
+TIMECODE_SCALE = 0x2AD7B1
+DURATION = 0x4489
+TRACKS = 0x1654AE6B
+TRACK_ENTRY = 0xAE
+TRACK_NUMBER = 0xD7
+CODEC_ID = 0x86
+CUES = 0x1C53BB6B
+CUE_POINT = 0xBB
+CUE_TIME = 0xB3
+CUE_TRACK_POSITIONS = 0xB7
+CUE_TRACK = 0xF7
+CUE_CLUSTER_POSITION = 0xF1
+CLUSTER = 0x1F43B675
+TIMECODE = 0xE7
+POSITION = 0xA7
+PREV_SIZE = 0xAB
+SIMPLE_BLOCK = 0xA3
+BLOCK_GROUP = 0xA0
+BLOCK = 0xA1
+VOID = 0xEC
+
+# Elements that end a cluster of unknown size.
+_TOP_LEVEL = {SEEK_HEAD, INFO, TRACKS, CUES, CLUSTER, 0x1254C367, 0x1043A770, 0x1941A469}
+_UNKNOWN_SIZE = b"\x01\xff\xff\xff\xff\xff\xff\xff"
+DEFAULT_TIMECODE_SCALE = 1_000_000  # ns per timecode unit
+# Fixed sizes of the reserved areas patched by finish().
+_SEEK_HEAD_SIZE = 68  # three seeks with 8-byte positions
+_DURATION_SIZE = 11  # float64 duration
+
+Chunk = namedtuple("Chunk", "header info tracks timecode_scale codec clusters duration_ns")
+
+
+class WebmFormatError(Exception):
+    """Raised when a file is not a WebM stream we can copy verbatim."""
+
+
+class IncompatibleStreamsError(WebmFormatError):
+    """Raised when the inputs differ in codec, tracks or timecode scale."""
+
+
+def _vint(data, pos):
+    """Decode a size vint at ``pos``: (value or None if unknown, length)."""
+    if pos >= len(data):
+        raise WebmFormatError("truncated element size")
+    first = data[pos]
+    length = 1
+    mask = 0x80
+    while length <= 8 and not first & mask:
+        mask >>= 1
+        length += 1
+    if length > 8 or pos + length > len(data):
+        raise WebmFormatError("invalid element size")
+    value = first & (mask - 1)
+    for byte in data[pos + 1:pos + length]:
+        value = value << 8 | byte
+    return (None if value == (1 << 7 * length) - 1 else value), length
+
+
+def _element_id(data, pos):
+    if pos >= len(data):
+        raise WebmFormatError("truncated element id")
+    first = data[pos]
+    length = 1
+    while length <= 4 and not first & (0x80 >> (length - 1)):
+        length += 1
+    if length > 4 or pos + length > len(data):
+        raise WebmFormatError("invalid element id")
+    return int.from_bytes(data[pos:pos + length], "big"), length
+
+
+def _elements(data, start, end):
+    """Yield ``(id, element_start, data_start, data_end)`` for the children
+    between ``start`` and ``end``. Unknown sizes (live streams) extend a
+    segment to ``end`` and a cluster up to the next top-level element."""
+    pos = start
+    while pos < end:
+        element, id_length = _element_id(data, pos)
+        size, size_length = _vint(data, pos + id_length)
+        data_start = pos + id_length + size_length
+        if size is None:
+            if element == CLUSTER:
+                data_end = data_start
+                for child, child_start, _, child_end in _elements(data, data_start, end):
+                    if child in _TOP_LEVEL:
+                        data_end = child_start
+                        break
+                    data_end = child_end
+            else:
+                data_end = end
+        else:
+            data_end = min(data_start + size, end)
+        yield element, pos, data_start, data_end
+        pos = data_end
+
+
+def _uint(data):
+    return int.from_bytes(data, "big") if data else 0
+
+
+def opus_samples(packet):
+    """Samples (at 48 kHz) in one Opus packet, from its TOC byte."""
+    if not packet:
+        return 0
+    config = packet[0] >> 3
+    if config < 12:
+        frame = (480, 960, 1920, 2880)[config % 4]
+    elif config < 16:
+        frame = (480, 960)[config % 2]
+    else:
+        frame = (120, 240, 480, 960)[config % 4]
+    code = packet[0] & 0x03
+    if code == 0:
+        frames = 1
+    elif code in (1, 2):
+        frames = 2
+    else:
+        frames = packet[1] & 0x3F if len(packet) > 1 else 0
+    return frame * frames
+
+
+def _block_payload(data, start, end):
+    """Track number, relative timecode and frame data of a (Simple)Block.
+    Laced blocks are not produced by the service and are not split."""
+    track, length = _vint(data, start)
+    timecode = struct.unpack(">h", data[start + length:start + length + 2])[0]
+    return track, timecode, data[start + length + 3:end]
+
+
+def parse(path):
+    """Read one WebM file into a ``Chunk``."""
+    with open(path, "rb") as f:
+        data = f.read()
+    header = segment = None
+    for element, element_start, data_start, data_end in _elements(data, 0, len(data)):
+        if element == EBML:
+            header = data[element_start:data_end]
+        elif element == SEGMENT:
+            segment = (data_start, data_end)
+            break
+    if header is None or segment is None:
+        raise WebmFormatError(f"No WebM segment found in {path}")
+
+    info = []
+    tracks = None
+    scale = DEFAULT_TIMECODE_SCALE
+    codec = None
+    clusters = []
+    duration_ns = 0
+    for element, element_start, data_start, data_end in _elements(data, *segment):
+        if element == INFO:
+            for child, child_start, child_data, child_end in _elements(data, data_start, data_end):
+                if child == TIMECODE_SCALE:
+                    scale = _uint(data[child_data:child_end])
+                if child not in (DURATION, VOID):
+                    info.append(data[child_start:child_end])
+        elif element == TRACKS:
+            tracks = data[element_start:data_end]
+            for entry, _, entry_data, entry_end in _elements(data, data_start, data_end):
+                if entry == TRACK_ENTRY:
+                    for child, _, child_data, child_end in _elements(data, entry_data, entry_end):
+                        if child == CODEC_ID:
+                            codec = data[child_data:child_end].rstrip(b"\0").decode("ascii", "replace")
+        elif element == CLUSTER:
+            timecode = 0
+            children = []
+            for child, child_start, child_data, child_end in _elements(data, data_start, data_end):
+                if child == TIMECODE:
+                    timecode = _uint(data[child_data:child_end])
+                    continue
+                if child in (POSITION, PREV_SIZE, VOID):
+                    continue  # positions change when the cluster is moved
+                children.append(data[child_start:child_end])
+                block = None
+                if child == SIMPLE_BLOCK:
+                    block = (child_data, child_end)
+                elif child == BLOCK_GROUP:
+                    for sub, _, sub_data, sub_end in _elements(data, child_data, child_end):
+                        if sub == BLOCK:
+                            block = (sub_data, sub_end)
+                if block:
+                    _, relative, payload = _block_payload(data, *block)
+                    start_ns = (timecode + relative) * scale
+                    end_ns = start_ns + opus_samples(payload) * 1_000_000_000 // 48000
+                    duration_ns = max(duration_ns, end_ns)
+            clusters.append((timecode, children))
+    if tracks is None or not clusters:
+        raise WebmFormatError(f"No audio clusters found in {path}")
+    return Chunk(header, b"".join(info), tracks, scale, codec, clusters, duration_ns)
+
+
+def duration(path):
+    """Duration of a WebM Opus file in seconds, counted from its blocks."""
+    return parse(path).duration_ns / 1e9
+
+
+def encode_id(element):
+    return element.to_bytes((element.bit_length() + 7) // 8, "big")
+
+
+def ebml_element(element, payload, size_length=8):
+    size = len(payload)
+    if size_length == 1:
+        header = bytes([0x80 | size])
+    else:
+        header = b"\x01" + size.to_bytes(7, "big")
+    return encode_id(element) + header + payload
+
+
+def ebml_uint(element, value):
+    return ebml_element(element, value.to_bytes(8, "big"), size_length=1)
+
+
+def _void(size):
+    """A Void element occupying exactly ``size`` bytes (3 to 128)."""
+    return ebml_element(VOID, bytes(size - 2), size_length=1)
+
+
+class ClusterWriter:
+    """Appends WebM chunk files to one growing WebM file; see the module
+    docstring. ``append()`` expects ``out`` positioned at its end."""
+
+    def __init__(self):
+        self.chunk = None  # first chunk: header, tracks and timecode scale
+        self.offset_ns = 0
+        self.cues = []  # (timecode, cluster position in the segment)
+        self._segment = None  # file offset of the segment data
+        self._info = None
+        self._tracks = None
+        self._duration = None
+        self._track_number = 1
+
+    def append(self, path, out):
+        """Append the clusters of ``path``; returns its duration in seconds."""
+        chunk = parse(path)
+        if self.chunk is None:
+            self._write_header(chunk, out)
+        elif (chunk.codec, chunk.timecode_scale, chunk.tracks) != (
+            self.chunk.codec, self.chunk.timecode_scale, self.chunk.tracks
+        ):
+            raise IncompatibleStreamsError(f"{path}: tracks do not match the first chunk")
+        shift = round(self.offset_ns / chunk.timecode_scale)
+        for timecode, children in chunk.clusters:
+            self.cues.append((timecode + shift, out.tell() - self._segment))
+            out.write(ebml_element(CLUSTER, ebml_uint(TIMECODE, timecode + shift) + b"".join(children)))
+        self.offset_ns += chunk.duration_ns
+        return chunk.duration_ns / 1e9
+
+    def _write_header(self, chunk, out):
+        self.chunk = chunk
+        _, _, data_start, data_end = next(_elements(chunk.tracks, 0, len(chunk.tracks)))
+        for entry, _, entry_data, entry_end in _elements(chunk.tracks, data_start, data_end):
+            for child, _, child_data, child_end in _elements(chunk.tracks, entry_data, entry_end):
+                if child == TRACK_NUMBER:
+                    self._track_number = _uint(chunk.tracks[child_data:child_end])
+            break
+        out.write(chunk.header)
+        out.write(encode_id(SEGMENT))
+        self._size_at = out.tell()
+        out.write(_UNKNOWN_SIZE)
+        self._segment = out.tell()
+        out.write(_void(_SEEK_HEAD_SIZE))
+        self._info = out.tell() - self._segment
+        self._duration = out.tell() + len(ebml_element(INFO, b"")) + len(chunk.info)
+        out.write(ebml_element(INFO, chunk.info + _void(_DURATION_SIZE)))
+        self._tracks = out.tell() - self._segment
+        out.write(chunk.tracks)
+
+    def finish(self, out):
+        """Append cues and patch the reserved areas; ``out`` must be open
+        for reading and writing (e.g. ``"r+b"``) and is left at its end."""
+        if self.chunk is None:
+            return
+        out.seek(0, os.SEEK_END)
+        cues = out.tell() - self._segment
+        out.write(ebml_element(CUES, b"".join(
+            ebml_element(CUE_POINT, ebml_uint(CUE_TIME, timecode) + ebml_element(
+                CUE_TRACK_POSITIONS,
+                ebml_uint(CUE_TRACK, self._track_number) + ebml_uint(CUE_CLUSTER_POSITION, position),
+            ))
+            for timecode, position in self.cues
+        )))
+        end = out.tell()
+        out.seek(self._size_at)
+        out.write(b"\x01" + (end - self._segment).to_bytes(7, "big"))
+        out.seek(self._segment)
+        out.write(ebml_element(SEEK_HEAD, b"".join(
+            ebml_element(SEEK, ebml_element(SEEK_ID, encode_id(element), size_length=1)
+                     + ebml_uint(SEEK_POSITION, position), size_length=1)
+            for element, position in ((INFO, self._info), (TRACKS, self._tracks), (CUES, cues))
+        ), size_length=1))
+        out.seek(self._duration)
+        out.write(ebml_element(DURATION, struct.pack(">d", self.offset_ns / self.chunk.timecode_scale), size_length=1))
+        out.seek(end)
+
+
+def concat_webm(paths, output_file):
+    """Join WebM files cluster by cluster into ``output_file`` without
+    decoding. Returns the total duration in seconds."""
+    writer = ClusterWriter()
+    with open(output_file, "wb+") as out:
+        for path in paths:
+            writer.append(path, out)
+        writer.finish(out)
+    return writer.offset_ns / 1e9